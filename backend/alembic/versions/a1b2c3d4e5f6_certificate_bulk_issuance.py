@@ -0,0 +1,64 @@
+"""Add certificate number sequence, active-certificate index and issuance batches
+
+Revision ID: a1b2c3d4e5f6
+Revises: ff567890123e
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1b2c3d4e5f6'
+down_revision: Union[str, None] = 'ff567890123e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('certificate_number_seq')))
+
+    # Keep only the newest active certificate per enrollment before enforcing uniqueness
+    op.execute("""
+        UPDATE certificates SET is_revoked = true
+        WHERE NOT is_revoked AND id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY enrollment_id ORDER BY issued_at DESC
+                ) AS rn
+                FROM certificates
+                WHERE NOT is_revoked AND enrollment_id IS NOT NULL
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.create_index(
+        'uq_certificates_enrollment_active', 'certificates', ['enrollment_id'],
+        unique=True, postgresql_where=sa.text('NOT is_revoked')
+    )
+
+    op.create_table('certificate_batches',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('course_id', sa.UUID(), nullable=True),
+    sa.Column('created_by', sa.UUID(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed', name='certificatebatchstatus'), nullable=True),
+    sa.Column('total_enrollments', sa.Integer(), nullable=True),
+    sa.Column('issued_count', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('certificate_batches')
+    sa.Enum(name='certificatebatchstatus').drop(op.get_bind(), checkfirst=True)
+    op.drop_index('uq_certificates_enrollment_active', table_name='certificates')
+    op.execute(sa.schema.DropSequence(sa.Sequence('certificate_number_seq')))
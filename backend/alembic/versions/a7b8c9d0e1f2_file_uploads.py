@@ -0,0 +1,50 @@
+"""Add files table for stored uploads
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-19 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7b8c9d0e1f2'
+down_revision: Union[str, None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('files',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('file_type', sa.String(length=50), nullable=False),
+    sa.Column('folder', sa.String(length=255), nullable=True),
+    sa.Column('mime_type', sa.String(length=255), nullable=True),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('storage_key', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.Enum('uploading', 'ready', 'failed', name='filestatus'), nullable=True),
+    sa.Column('chunk_size', sa.Integer(), nullable=True),
+    sa.Column('total_chunks', sa.Integer(), nullable=True),
+    sa.Column('received_chunks', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('uploaded_by', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_files_uploaded_by_type', 'files',
+        ['uploaded_by', 'file_type', 'created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_uploaded_by_type', table_name='files')
+    op.drop_table('files')
+    sa.Enum(name='filestatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,29 @@
+"""Add per-question grading and manual-grading flag to assessment attempts
+
+Revision ID: b2c3d4e5f6a7
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c3d4e5f6a7'
+down_revision: Union[str, None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assessment_attempts', sa.Column('grading', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('assessment_attempts', sa.Column('needs_manual_grading', sa.Boolean(), server_default='false', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('assessment_attempts', 'needs_manual_grading')
+    op.drop_column('assessment_attempts', 'grading')
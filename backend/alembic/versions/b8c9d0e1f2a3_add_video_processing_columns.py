@@ -0,0 +1,45 @@
+"""Add video processing columns to files
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    processing_status = sa.Enum('queued', 'processing', 'completed', 'failed', name='processingstatus')
+    processing_status.create(op.get_bind(), checkfirst=True)
+    op.add_column('files', sa.Column('processing_status', processing_status, nullable=True))
+    op.add_column('files', sa.Column('processing_progress', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('processing_error', sa.Text(), nullable=True))
+    op.add_column('files', sa.Column('processing_started_at', sa.DateTime(), nullable=True))
+    op.add_column('files', sa.Column('duration_seconds', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('media_info', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.create_index(
+        'ix_files_processing_pending', 'files', ['processing_status'], unique=False,
+        postgresql_where=sa.text("processing_status IN ('queued', 'processing')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_processing_pending', table_name='files')
+    op.drop_column('files', 'media_info')
+    op.drop_column('files', 'duration_seconds')
+    op.drop_column('files', 'processing_started_at')
+    op.drop_column('files', 'processing_error')
+    op.drop_column('files', 'processing_progress')
+    op.drop_column('files', 'processing_status')
+    sa.Enum(name='processingstatus').drop(op.get_bind(), checkfirst=True)
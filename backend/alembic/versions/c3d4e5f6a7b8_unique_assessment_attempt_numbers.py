@@ -0,0 +1,42 @@
+"""Make attempt numbers unique per assessment and user
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, None] = 'b2c3d4e5f6a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # COUNT-then-insert could hand out the same number twice; renumber in start order
+    op.execute("""
+        UPDATE assessment_attempts AS a
+        SET attempt_number = numbered.rn
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY assessment_id, user_id ORDER BY started_at, id
+            ) AS rn
+            FROM assessment_attempts
+        ) AS numbered
+        WHERE a.id = numbered.id AND a.attempt_number <> numbered.rn
+    """)
+    op.create_unique_constraint(
+        'uq_assessment_attempts_user_attempt',
+        'assessment_attempts',
+        ['assessment_id', 'user_id', 'attempt_number']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_assessment_attempts_user_attempt', 'assessment_attempts', type_='unique')
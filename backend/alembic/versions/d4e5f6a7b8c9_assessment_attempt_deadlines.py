@@ -0,0 +1,31 @@
+"""Add attempt deadlines for server-side time limits
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, None] = 'c3d4e5f6a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assessment_attempts', sa.Column('deadline_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_assessment_attempts_open_deadline', 'assessment_attempts', ['deadline_at'],
+        unique=False, postgresql_where=sa.text('submitted_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assessment_attempts_open_deadline', table_name='assessment_attempts')
+    op.drop_column('assessment_attempts', 'deadline_at')
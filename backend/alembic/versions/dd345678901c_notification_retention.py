@@ -0,0 +1,46 @@
+"""Add notification unread index and partitioned archive table
+
+Revision ID: dd345678901c
+Revises: cc234567890b
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dd345678901c'
+down_revision: Union[str, None] = 'cc234567890b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notifications_user_id_is_read', 'notifications', ['user_id', 'is_read'])
+
+    # Monthly partitions are created on demand by the retention job
+    op.create_table('notifications_archive',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_notifications_archive_user_id_created_at', 'notifications_archive', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_archive_user_id_created_at', table_name='notifications_archive')
+    op.drop_table('notifications_archive')
+    op.drop_index('ix_notifications_user_id_is_read', table_name='notifications')
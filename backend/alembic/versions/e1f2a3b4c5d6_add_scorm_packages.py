@@ -0,0 +1,48 @@
+"""Add scorm_packages table
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f2a3b4c5d6'
+down_revision: Union[str, None] = 'd0e1f2a3b4c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('scorm_packages',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('course_id', sa.UUID(), nullable=True),
+    sa.Column('content_item_id', sa.UUID(), nullable=True),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('version', sa.String(length=10), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('storage_prefix', sa.String(length=255), nullable=False),
+    sa.Column('manifest', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('file_count', sa.Integer(), nullable=True),
+    sa.Column('total_size', sa.BigInteger(), nullable=True),
+    sa.Column('uploaded_by', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['content_item_id'], ['content_items.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scorm_packages_course_id'), 'scorm_packages', ['course_id'], unique=False)
+    op.create_index(op.f('ix_scorm_packages_content_item_id'), 'scorm_packages', ['content_item_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_scorm_packages_content_item_id'), table_name='scorm_packages')
+    op.drop_index(op.f('ix_scorm_packages_course_id'), table_name='scorm_packages')
+    op.drop_table('scorm_packages')
@@ -0,0 +1,35 @@
+"""Add grading timestamp and per-question times to assessment attempts
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assessment_attempts', sa.Column('graded_at', sa.DateTime(), nullable=True))
+    op.add_column('assessment_attempts', sa.Column('question_times', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.execute("UPDATE assessment_attempts SET graded_at = submitted_at WHERE submitted_at IS NOT NULL")
+    op.create_index(
+        'ix_assessment_attempts_assessment_graded', 'assessment_attempts',
+        ['assessment_id', 'graded_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assessment_attempts_assessment_graded', table_name='assessment_attempts')
+    op.drop_column('assessment_attempts', 'question_times')
+    op.drop_column('assessment_attempts', 'graded_at')
@@ -0,0 +1,45 @@
+"""Add notification broadcasts table
+
+Revision ID: ee456789012d
+Revises: dd345678901c
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee456789012d'
+down_revision: Union[str, None] = 'dd345678901c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_broadcasts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_by', sa.UUID(), nullable=True),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('audience', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed', name='broadcaststatus'), nullable=True),
+    sa.Column('total_recipients', sa.Integer(), nullable=True),
+    sa.Column('delivered_count', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_broadcasts')
+    sa.Enum(name='broadcaststatus').drop(op.get_bind(), checkfirst=True)
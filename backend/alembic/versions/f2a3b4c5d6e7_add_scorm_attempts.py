@@ -0,0 +1,45 @@
+"""Add scorm_attempts table
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a3b4c5d6e7'
+down_revision: Union[str, None] = 'e1f2a3b4c5d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('scorm_attempts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('package_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('cmi', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('lesson_status', sa.String(length=20), nullable=True),
+    sa.Column('score_raw', sa.Numeric(precision=7, scale=2), nullable=True),
+    sa.Column('total_time_seconds', sa.Integer(), nullable=True),
+    sa.Column('launch_count', sa.Integer(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['package_id'], ['scorm_packages.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('package_id', 'user_id', name='uq_scorm_attempts_package_user')
+    )
+    op.create_index(op.f('ix_scorm_attempts_user_id'), 'scorm_attempts', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_scorm_attempts_user_id'), table_name='scorm_attempts')
+    op.drop_table('scorm_attempts')
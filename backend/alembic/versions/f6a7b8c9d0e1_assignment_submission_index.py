@@ -0,0 +1,30 @@
+"""Add covering index for assignment submission analytics
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a7b8c9d0e1'
+down_revision: Union[str, None] = 'e5f6a7b8c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_assignment_submissions_assignment_submitted', 'assignment_submissions',
+        ['assignment_id', 'submitted_at'], unique=False,
+        postgresql_include=['user_id', 'score', 'graded_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assignment_submissions_assignment_submitted', table_name='assignment_submissions')
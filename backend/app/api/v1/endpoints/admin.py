@@ -9,6 +9,7 @@ from app.core.deps import get_current_active_user
 from app.db.models.user import User
 from app.db.models.course import Course
 from app.db.models.enrollment import Enrollment
+from app.services.email import send_email
 
 router = APIRouter()
 
@@ -236,9 +237,14 @@ async def send_test_email(
     current_user: User = Depends(require_admin)
 ):
     """Send test email."""
+    if not send_email(email, "test_email", sent_by=current_user.email):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Outbound email is disabled"
+        )
     return {
-        "message": f"Test email sent to {email}",
-        "status": "sent"
+        "message": f"Test email queued for {email}",
+        "status": "queued"
     }
 
 
@@ -1,94 +1,104 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from sqlalchemy import select
 from typing import List
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta
+import redis
 from app.db.session import get_db
+from app.core.conditional import ConditionalRequest, rows_version
+from app.core.config import settings
 from app.core.deps import get_current_active_user
+from app.core.serialization import json_response
 from app.schemas.assessment import (
     AssessmentCreate, AssessmentUpdate, AssessmentResponse, AssessmentWithQuestions,
     QuestionCreate, QuestionResponse, QuestionWithAnswer,
-    AssessmentAttemptCreate, AssessmentSubmission, AssessmentAttemptResponse
+    AssessmentAttemptCreate, AssessmentSubmission, AssessmentAttemptResponse,
+    AssessmentAttemptGrading, ManualGradeSubmission, RegradeResult, AssessmentAttemptStart,
+    AutosaveRequest, AutosaveResponse, ItemAnalysisResponse
 )
 from app.db.models.assessment import Assessment, Question, AssessmentAttempt
 from app.db.models.user import User
+from app.services.assessment_delivery import (
+    get_exam, invalidate_exam, questions_for_attempt, start_attempt, AttemptLimitReached, NotAvailable
+)
+from app.services.assessment_autosave import (
+    get_open_attempt_meta, save_answers, pending_answers, discard_answers, write_answers
+)
+from app.services.assessment_deadlines import is_past_deadline
+from app.services.grading import grade_attempt, apply_manual_grades, regrade_assessment
+from app.services.item_analysis import get_item_analysis
 
 router = APIRouter()
 
 
 @router.post("/", response_model=AssessmentResponse, status_code=status.HTTP_201_CREATED)
-async def create_assessment(
+def create_assessment(
     assessment_in: AssessmentCreate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new assessment."""
     assessment = Assessment(**assessment_in.dict())
     db.add(assessment)
-    await db.commit()
-    await db.refresh(assessment)
+    db.commit()
+    db.refresh(assessment)
     return assessment
 
 
 @router.get("/", response_model=List[AssessmentResponse])
-async def get_assessments(
+def get_assessments(
     course_id: UUID = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    conditional: ConditionalRequest = Depends(),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all assessments with optional course filter."""
-    query = select(Assessment)
+    criteria = [Assessment.course_id == course_id] if course_id else []
+    conditional.check(rows_version(db, Assessment, *criteria), skip, limit, course_id)
     
-    if course_id:
-        query = query.where(Assessment.course_id == course_id)
-    
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
+    query = select(Assessment).where(*criteria).offset(skip).limit(limit)
+    result = db.execute(query)
     assessments = result.scalars().all()
     return assessments
 
 
 @router.get("/{assessment_id}", response_model=AssessmentWithQuestions)
-async def get_assessment(
+def get_assessment(
     assessment_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    conditional: ConditionalRequest = Depends(),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get assessment with questions."""
-    result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
-    assessment = result.scalar_one_or_none()
+    # Served from the per-assessment cache; correct answers are never included
+    exam = get_exam(db, assessment_id)
     
-    if not assessment:
+    if not exam:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assessment not found"
         )
     
-    # Get questions
-    questions_result = await db.execute(
-        select(Question).where(Question.assessment_id == assessment_id).order_by(Question.order_index)
-    )
-    questions = questions_result.scalars().all()
-    
-    # Don't include correct answers for learners
-    assessment_dict = AssessmentResponse.from_orm(assessment).dict()
-    assessment_dict['questions'] = [QuestionResponse.from_orm(q) for q in questions]
+    # The cached version changes with every write, so no version query is needed
+    conditional.check(exam["_version"])
     
-    return assessment_dict
+    # Already dumped through the response schemas when it was cached
+    content = {key: value for key, value in exam.items() if key != "_version"}
+    return json_response(content, headers=conditional.headers)
 
 
 @router.put("/{assessment_id}", response_model=AssessmentResponse)
-async def update_assessment(
+def update_assessment(
     assessment_id: UUID,
     assessment_update: AssessmentUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update an assessment."""
-    result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
+    result = db.execute(select(Assessment).where(Assessment.id == assessment_id))
     assessment = result.scalar_one_or_none()
     
     if not assessment:
@@ -101,19 +111,20 @@ async def update_assessment(
     for field, value in update_data.items():
         setattr(assessment, field, value)
     
-    await db.commit()
-    await db.refresh(assessment)
+    db.commit()
+    invalidate_exam(assessment_id)
+    db.refresh(assessment)
     return assessment
 
 
 @router.delete("/{assessment_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_assessment(
+def delete_assessment(
     assessment_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete an assessment."""
-    result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
+    result = db.execute(select(Assessment).where(Assessment.id == assessment_id))
     assessment = result.scalar_one_or_none()
     
     if not assessment:
@@ -122,21 +133,22 @@ async def delete_assessment(
             detail="Assessment not found"
         )
     
-    await db.delete(assessment)
-    await db.commit()
+    db.delete(assessment)
+    db.commit()
+    invalidate_exam(assessment_id)
 
 
 # Question endpoints
 @router.post("/{assessment_id}/questions", response_model=QuestionResponse, status_code=status.HTTP_201_CREATED)
-async def create_question(
+def create_question(
     assessment_id: UUID,
     question_in: QuestionCreate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Add a question to an assessment."""
     # Verify assessment exists
-    result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
+    result = db.execute(select(Assessment).where(Assessment.id == assessment_id))
     if not result.scalar_one_or_none():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,19 +157,22 @@ async def create_question(
     
     question = Question(assessment_id=assessment_id, **question_in.dict())
     db.add(question)
-    await db.commit()
-    await db.refresh(question)
+    db.commit()
+    invalidate_exam(assessment_id)
+    db.refresh(question)
     return question
 
 
 @router.get("/{assessment_id}/questions", response_model=List[QuestionResponse])
-async def get_questions(
+def get_questions(
     assessment_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    conditional: ConditionalRequest = Depends(),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all questions for an assessment."""
-    result = await db.execute(
+    conditional.check(rows_version(db, Question, Question.assessment_id == assessment_id))
+    result = db.execute(
         select(Question).where(Question.assessment_id == assessment_id).order_by(Question.order_index)
     )
     questions = result.scalars().all()
@@ -165,15 +180,15 @@ async def get_questions(
 
 
 @router.put("/{assessment_id}/questions/{question_id}", response_model=QuestionResponse)
-async def update_question(
+def update_question(
     assessment_id: UUID,
     question_id: UUID,
     question_update: QuestionCreate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update a question."""
-    result = await db.execute(
+    result = db.execute(
         select(Question).where(
             Question.id == question_id,
             Question.assessment_id == assessment_id
@@ -191,20 +206,21 @@ async def update_question(
     for field, value in update_data.items():
         setattr(question, field, value)
     
-    await db.commit()
-    await db.refresh(question)
+    db.commit()
+    invalidate_exam(assessment_id)
+    db.refresh(question)
     return question
 
 
 @router.delete("/{assessment_id}/questions/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_question(
+def delete_question(
     assessment_id: UUID,
     question_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a question."""
-    result = await db.execute(
+    result = db.execute(
         select(Question).where(
             Question.id == question_id,
             Question.assessment_id == assessment_id
@@ -218,71 +234,63 @@ async def delete_question(
             detail="Question not found"
         )
     
-    await db.delete(question)
-    await db.commit()
+    db.delete(question)
+    db.commit()
+    invalidate_exam(assessment_id)
 
 
 # Assessment attempt endpoints
-@router.post("/{assessment_id}/start", response_model=AssessmentAttemptResponse)
-async def start_assessment(
+@router.post("/{assessment_id}/start", response_model=AssessmentAttemptStart)
+def start_assessment(
     assessment_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Start a new assessment attempt."""
-    # Check if assessment exists
-    result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
-    assessment = result.scalar_one_or_none()
+    """Start a new assessment attempt, or resume the one in progress."""
+    exam = get_exam(db, assessment_id)
     
-    if not assessment:
+    if not exam:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assessment not found"
         )
     
-    # Check attempt limit
-    attempts_result = await db.execute(
-        select(func.count(AssessmentAttempt.id)).where(
-            AssessmentAttempt.assessment_id == assessment_id,
-            AssessmentAttempt.user_id == current_user.id
-        )
-    )
-    attempt_count = attempts_result.scalar()
-    
-    if attempt_count >= assessment.max_attempts:
+    try:
+        attempt = start_attempt(db, exam, current_user.id)
+    except AttemptLimitReached:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Maximum attempts ({assessment.max_attempts}) reached"
+            detail=f"Maximum attempts ({exam['max_attempts']}) reached"
+        )
+    except NotAvailable:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Assessment is not available at this time"
         )
     
-    # Create new attempt
-    attempt = AssessmentAttempt(
-        assessment_id=assessment_id,
-        user_id=current_user.id,
-        attempt_number=attempt_count + 1,
-        answers={}
-    )
-    db.add(attempt)
-    await db.commit()
-    await db.refresh(attempt)
-    return attempt
+    return {
+        **AssessmentAttemptResponse.model_validate(attempt).model_dump(),
+        "questions": questions_for_attempt(exam, attempt.id)
+    }
 
 
 @router.post("/{assessment_id}/submit", response_model=AssessmentAttemptResponse)
-async def submit_assessment(
+def submit_assessment(
     assessment_id: UUID,
     submission: AssessmentSubmission,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Submit an assessment attempt."""
     # Get the latest attempt
-    result = await db.execute(
+    result = db.execute(
         select(AssessmentAttempt).where(
             AssessmentAttempt.assessment_id == assessment_id,
             AssessmentAttempt.user_id == current_user.id,
             AssessmentAttempt.submitted_at == None
-        ).order_by(AssessmentAttempt.started_at.desc())
+        ).order_by(AssessmentAttempt.started_at.desc()).limit(1)
+        # Locked so the deadline sweep skips it (or we wait and find it already submitted)
+        .with_for_update()
     )
     attempt = result.scalar_one_or_none()
     
@@ -292,50 +300,79 @@ async def submit_assessment(
             detail="No active attempt found"
         )
     
-    # Get assessment and questions
-    assessment_result = await db.execute(select(Assessment).where(Assessment.id == assessment_id))
+    assessment_result = db.execute(select(Assessment).where(Assessment.id == assessment_id))
     assessment = assessment_result.scalar_one()
     
-    questions_result = await db.execute(select(Question).where(Question.assessment_id == assessment_id))
-    questions = questions_result.scalars().all()
-    
-    # Calculate score
-    total_points = sum(q.points for q in questions)
-    earned_points = 0
-    
-    for question in questions:
-        question_id = str(question.id)
-        if question_id in submission.answers:
-            user_answer = submission.answers[question_id]
-            correct_answer = question.correct_answer
-            
-            # Simple comparison (can be enhanced based on question type)
-            if user_answer == correct_answer:
-                earned_points += question.points
-    
-    score = (earned_points / total_points * 100) if total_points > 0 else 0
-    passed = score >= assessment.pass_percentage
-    
-    # Update attempt
-    attempt.answers = submission.answers
-    attempt.score = score
-    attempt.passed = passed
-    attempt.submitted_at = datetime.utcnow()
-    attempt.time_taken_seconds = int((datetime.utcnow() - attempt.started_at).total_seconds())
-    
-    await db.commit()
-    await db.refresh(attempt)
+    now = datetime.utcnow()
+    saved_answers, saved_times = pending_answers(attempt.id)
+    answers = {**(attempt.answers or {}), **saved_answers}
+    times = {**(attempt.question_times or {}), **saved_times}
+    if is_past_deadline(attempt, now):
+        # Too late: only answers saved before the deadline count
+        submitted_at = attempt.deadline_at
+    else:
+        answers.update(submission.answers)
+        times.update(submission.time_spent or {})
+        submitted_at = now
+    
+    grade_attempt(db, assessment, attempt, answers)
+    attempt.question_times = times
+    attempt.submitted_at = submitted_at
+    attempt.time_taken_seconds = max(0, int((submitted_at - attempt.started_at).total_seconds()))
+    
+    db.commit()
+    discard_answers([attempt.id])
+    db.refresh(attempt)
     return attempt
 
 
+@router.patch("/{assessment_id}/attempts/{attempt_id}/answers", response_model=AutosaveResponse)
+def autosave_answers(
+    assessment_id: UUID,
+    attempt_id: UUID,
+    autosave: AutosaveRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Autosave changed answers of an attempt in progress."""
+    meta = get_open_attempt_meta(db, assessment_id, attempt_id)
+    
+    if not meta or meta["user_id"] != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active attempt found"
+        )
+    
+    deadline_at = datetime.fromisoformat(meta["deadline_at"]) if meta["deadline_at"] else None
+    now = datetime.utcnow()
+    if deadline_at and now > deadline_at + timedelta(seconds=settings.ASSESSMENT_DEADLINE_GRACE_SECONDS):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Time limit reached"
+        )
+    
+    try:
+        save_answers(attempt_id, autosave.answers, autosave.time_spent)
+    except redis.RedisError:
+        # Autosave store down: write through so nothing is lost
+        write_answers(db, {str(attempt_id): (autosave.answers, autosave.time_spent or {})})
+        db.commit()
+    
+    return {
+        "saved": len(autosave.answers),
+        "deadline_at": deadline_at,
+        "seconds_remaining": max(0, int((deadline_at - now).total_seconds())) if deadline_at else None
+    }
+
+
 @router.get("/{assessment_id}/attempts", response_model=List[AssessmentAttemptResponse])
-async def get_attempts(
+def get_attempts(
     assessment_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all attempts for an assessment by current user."""
-    result = await db.execute(
+    result = db.execute(
         select(AssessmentAttempt).where(
             AssessmentAttempt.assessment_id == assessment_id,
             AssessmentAttempt.user_id == current_user.id
@@ -346,14 +383,14 @@ async def get_attempts(
 
 
 @router.get("/{assessment_id}/attempts/{attempt_id}", response_model=AssessmentAttemptResponse)
-async def get_attempt(
+def get_attempt(
     assessment_id: UUID,
     attempt_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific attempt."""
-    result = await db.execute(
+    result = db.execute(
         select(AssessmentAttempt).where(
             AssessmentAttempt.id == attempt_id,
             AssessmentAttempt.assessment_id == assessment_id,
@@ -369,3 +406,127 @@ async def get_attempt(
         )
     
     return attempt
+
+
+@router.get("/{assessment_id}/attempts/{attempt_id}/questions", response_model=List[QuestionResponse])
+def get_attempt_questions(
+    assessment_id: UUID,
+    attempt_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the questions of an attempt in the order it presents them."""
+    result = db.execute(
+        select(AssessmentAttempt.id).where(
+            AssessmentAttempt.id == attempt_id,
+            AssessmentAttempt.assessment_id == assessment_id,
+            AssessmentAttempt.user_id == current_user.id
+        )
+    )
+    
+    if not result.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attempt not found"
+        )
+    
+    exam = get_exam(db, assessment_id)
+    return questions_for_attempt(exam, attempt_id)
+
+
+@router.post("/{assessment_id}/attempts/{attempt_id}/grade", response_model=AssessmentAttemptGrading)
+def grade_attempt_manually(
+    assessment_id: UUID,
+    attempt_id: UUID,
+    grades: ManualGradeSubmission,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Record points for manually graded questions such as essays (instructor/admin only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to grade attempts"
+        )
+    
+    result = db.execute(
+        select(AssessmentAttempt).where(
+            AssessmentAttempt.id == attempt_id,
+            AssessmentAttempt.assessment_id == assessment_id,
+            AssessmentAttempt.submitted_at != None
+        )
+    )
+    attempt = result.scalar_one_or_none()
+    
+    if not attempt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submitted attempt not found"
+        )
+    
+    assessment = db.execute(select(Assessment).where(Assessment.id == assessment_id)).scalar_one()
+    
+    try:
+        apply_manual_grades(
+            db, assessment, attempt, {qid: float(points) for qid, points in grades.points.items()}
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    db.commit()
+    db.refresh(attempt)
+    return attempt
+
+
+@router.post("/{assessment_id}/regrade", response_model=RegradeResult)
+def regrade_attempts(
+    assessment_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Re-grade all submitted attempts against the current answer key (instructor/admin only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to regrade attempts"
+        )
+    
+    result = db.execute(select(Assessment).where(Assessment.id == assessment_id))
+    assessment = result.scalar_one_or_none()
+    
+    if not assessment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment not found"
+        )
+    
+    summary = regrade_assessment(db, assessment)
+    db.commit()
+    return summary
+
+
+@router.get("/{assessment_id}/analytics", response_model=ItemAnalysisResponse)
+def get_assessment_analytics(
+    assessment_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get item analysis for each question (instructor/admin only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view assessment analytics"
+        )
+    
+    result = db.execute(select(Assessment.id).where(Assessment.id == assessment_id))
+    
+    if not result.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment not found"
+        )
+    
+    return get_item_analysis(db, assessment_id)
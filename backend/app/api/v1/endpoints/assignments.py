@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from fastapi.responses import StreamingResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_
 from typing import List, Optional
@@ -6,13 +7,20 @@ from uuid import UUID
 from datetime import datetime
 from app.db.session import get_db
 from app.core.deps import get_current_active_user
+from app.core.serialization import json_response
 from app.schemas.assignment import (
     AssignmentCreate, AssignmentUpdate, AssignmentResponse,
     AssignmentSubmissionCreate, AssignmentSubmissionUpdate, AssignmentSubmissionResponse,
-    AssignmentGrade
+    AssignmentGrade, AssignmentBulkGrade, AssignmentBulkGradeResult
 )
 from app.db.models.assignment import Assignment, AssignmentSubmission
 from app.db.models.user import User
+from app.db.models.file import StoredFile, FileStatus
+from app.services.file_uploads import stored_file_id, download_url
+from app.services.assignment_submissions import (
+    InvalidCursor, submissions_query, list_submissions, stream_submissions, bulk_grade, foreign_attachments
+)
+from app.services.assignment_analytics import get_assignment_analytics as load_assignment_analytics, invalidate_assignment_analytics
 
 router = APIRouter()
 
@@ -109,6 +117,7 @@ def update_assignment(
         setattr(assignment, field, value)
     
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
     db.refresh(assignment)
     return assignment
 
@@ -131,6 +140,7 @@ def delete_assignment(
     
     db.delete(assignment)
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
 
 
 @router.post("/{assignment_id}/publish", response_model=AssignmentResponse)
@@ -192,6 +202,13 @@ def submit_assignment(
             detail="Assignment already submitted"
         )
     
+    foreign = foreign_attachments(db, submission_in.attachment_urls, current_user.id)
+    if foreign:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Attachments must be your own uploads: {', '.join(foreign)}"
+        )
+    
     # Create submission
     submission = AssignmentSubmission(
         assignment_id=assignment_id,
@@ -200,6 +217,7 @@ def submit_assignment(
     )
     db.add(submission)
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
     db.refresh(submission)
     return submission
 
@@ -207,43 +225,82 @@ def submit_assignment(
 @router.get("/{assignment_id}/submissions")
 def get_assignment_submissions(
     assignment_id: UUID,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(graded|submitted)$"),
+    late: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get all submissions for an assignment (instructor/admin only)."""
-    from sqlalchemy.orm import joinedload
+    """Get submissions for an assignment, newest first (instructor/admin only).
+    
+    Pages are keyset-paginated: pass the returned `next_cursor` as `cursor` to
+    get the next page. `format=ndjson` streams every matching submission from
+    the cursor on, one JSON object per line, ignoring `limit`.
+    """
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view submissions"
+        )
+    
+    result = db.execute(select(Assignment).where(Assignment.id == assignment_id))
+    assignment = result.scalar_one_or_none()
+    
+    if not assignment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    
+    try:
+        query = submissions_query(assignment, status=status_filter, late=late, cursor=cursor)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    if format == "ndjson":
+        return StreamingResponse(stream_submissions(query), media_type="application/x-ndjson")
+    
+    return json_response(list_submissions(db, query, limit))
 
-    result = db.execute(
-        select(AssignmentSubmission, User).join(
-            User, AssignmentSubmission.user_id == User.id
-        ).where(
-            AssignmentSubmission.assignment_id == assignment_id
-        ).order_by(AssignmentSubmission.submitted_at.desc())
-    )
 
-    submissions_data = []
-    for submission, user in result.all():
-        submission_dict = {
-            "id": str(submission.id),
-            "assignment_id": str(submission.assignment_id),
-            "user_id": str(submission.user_id),
-            "student_id": str(submission.user_id),
-            "student_name": f"{user.first_name} {user.last_name}" if user.first_name and user.last_name else user.email,
-            "student_email": user.email,
-            "submission_text": submission.submission_text,
-            "attachment_urls": submission.attachment_urls or [],
-            "attachment_url": submission.attachment_urls[0] if submission.attachment_urls else None,
-            "grade": submission.score,
-            "score": submission.score,
-            "feedback": submission.feedback,
-            "graded_by": str(submission.graded_by) if submission.graded_by else None,
-            "submitted_at": submission.submitted_at.isoformat(),
-            "graded_at": submission.graded_at.isoformat() if submission.graded_at else None,
-            "status": "graded" if submission.graded_at else "submitted"
-        }
-        submissions_data.append(submission_dict)
-
-    return {"submissions": submissions_data}
+@router.post("/{assignment_id}/submissions/grade", response_model=AssignmentBulkGradeResult)
+def bulk_grade_submissions(
+    assignment_id: UUID,
+    bulk_in: AssignmentBulkGrade,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Grade many submissions in one transaction (instructor/admin only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to grade submissions"
+        )
+    
+    grades = [grade.dict() for grade in bulk_in.grades]
+    if len({grade["submission_id"] for grade in grades}) != len(grades):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each submission may only be graded once per request"
+        )
+    
+    try:
+        graded_at = bulk_grade(db, assignment_id, grades, current_user.id)
+    except LookupError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"message": "Submissions not found", "submission_ids": e.args[0]}
+        )
+    
+    db.commit()
+    invalidate_assignment_analytics(assignment_id)
+    return {"graded": len(grades), "graded_at": graded_at}
 
 
 @router.get("/{assignment_id}/submissions/{submission_id}", response_model=AssignmentSubmissionResponse)
@@ -280,6 +337,54 @@ def get_submission(
     return submission
 
 
+@router.get("/{assignment_id}/submissions/{submission_id}/attachments/{index}")
+def download_submission_attachment(
+    assignment_id: UUID,
+    submission_id: UUID,
+    index: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download a submission attachment (redirects to a short-lived download URL)."""
+    result = db.execute(
+        select(AssignmentSubmission).where(
+            and_(
+                AssignmentSubmission.id == submission_id,
+                AssignmentSubmission.assignment_id == assignment_id
+            )
+        )
+    )
+    submission = result.scalar_one_or_none()
+    
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
+        )
+    
+    if submission.user_id != current_user.id and current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this submission"
+        )
+    
+    attachments = submission.attachment_urls or []
+    file_id = stored_file_id(attachments[index]) if 0 <= index < len(attachments) else None
+    record = db.get(StoredFile, file_id) if file_id else None
+    # Only the submitter's own uploads are served; anything else was never theirs to attach
+    if record is None or record.status != FileStatus.ready or record.uploaded_by != submission.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    
+    return RedirectResponse(
+        download_url(record),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": "private, no-store"}
+    )
+
+
 @router.post("/{assignment_id}/submissions/{submission_id}/grade", response_model=AssignmentSubmissionResponse)
 def grade_submission(
     assignment_id: UUID,
@@ -317,6 +422,7 @@ def grade_submission(
     submission.graded_at = datetime.utcnow()
     
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
     db.refresh(submission)
     return submission
 
@@ -368,6 +474,13 @@ def update_submission(
             detail="Cannot update graded submission"
         )
     
+    foreign = foreign_attachments(db, submission_update.attachment_urls, current_user.id)
+    if foreign:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Attachments must be your own uploads: {', '.join(foreign)}"
+        )
+    
     update_data = submission_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(submission, field, value)
@@ -375,6 +488,7 @@ def update_submission(
     submission.submitted_at = datetime.utcnow()
     
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
     db.refresh(submission)
     return submission
 
@@ -403,6 +517,13 @@ def resubmit_assignment(
             detail="Resubmission not allowed for this assignment"
         )
     
+    foreign = foreign_attachments(db, submission_in.attachment_urls, current_user.id)
+    if foreign:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Attachments must be your own uploads: {', '.join(foreign)}"
+        )
+    
     # Create new submission
     submission = AssignmentSubmission(
         assignment_id=assignment_id,
@@ -411,6 +532,7 @@ def resubmit_assignment(
     )
     db.add(submission)
     db.commit()
+    invalidate_assignment_analytics(assignment_id)
     db.refresh(submission)
     return submission
 
@@ -428,27 +550,13 @@ def get_assignment_analytics(
             detail="Not authorized to view analytics"
         )
     
-    # Get all submissions
-    result = db.execute(
-        select(AssignmentSubmission).where(
-            AssignmentSubmission.assignment_id == assignment_id
+    result = db.execute(select(Assignment).where(Assignment.id == assignment_id))
+    assignment = result.scalar_one_or_none()
+    
+    if not assignment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
         )
-    )
-    submissions = result.scalars().all()
     
-    total_submissions = len(submissions)
-    graded_submissions = len([s for s in submissions if s.graded_at])
-    pending_submissions = total_submissions - graded_submissions
-    
-    scores = [float(s.score) for s in submissions if s.score is not None]
-    avg_score = sum(scores) / len(scores) if scores else 0
-    
-    return {
-        "assignment_id": assignment_id,
-        "total_submissions": total_submissions,
-        "graded_submissions": graded_submissions,
-        "pending_submissions": pending_submissions,
-        "average_score": avg_score,
-        "highest_score": max(scores) if scores else 0,
-        "lowest_score": min(scores) if scores else 0
-    }
+    return load_assignment_analytics(db, assignment)
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db.session import get_db
 from app.core.deps import get_current_active_user
-from app.core.security import create_access_token, verify_password, get_password_hash, verify_token
+from app.core.security import (
+    create_access_token, verify_password, get_password_hash, verify_token,
+    create_password_reset_token, verify_password_reset_token
+)
 from app.schemas.auth import Token
 from app.schemas.user import UserCreate, UserResponse
 from app.db.models.user import User
 from datetime import timedelta, datetime
 from app.core.config import settings
-import secrets
+from app.services.email import send_email
 
 router = APIRouter()
 
@@ -162,7 +165,6 @@ def logout(
 @router.post("/forgot-password")
 def forgot_password(
     email: str,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Request password reset."""
@@ -170,13 +172,15 @@ def forgot_password(
     user = result.scalar_one_or_none()
     
     # Always return success to prevent email enumeration
-    if user:
-        # Generate reset token
-        reset_token = secrets.token_urlsafe(32)
-        # In production, save this token to database with expiry
-        # and send email with reset link
-        # background_tasks.add_task(send_reset_email, email, reset_token)
-        pass
+    if user and user.is_active:
+        reset_token = create_password_reset_token(user.id, user.password_hash)
+        send_email(
+            user.email,
+            "password_reset",
+            name=user.first_name or user.username,
+            reset_url=f"{settings.FRONTEND_URL}/reset-password?token={reset_token}",
+            expires_minutes=settings.PASSWORD_RESET_TOKEN_EXPIRE_MINUTES
+        )
     
     return {"message": "If the email exists, a password reset link has been sent"}
 
@@ -188,8 +192,21 @@ def reset_password(
     db: Session = Depends(get_db)
 ):
     """Reset password using token."""
-    # In production, verify token from database
-    # For now, just return success
+    def password_hash_lookup(user_id):
+        user = db.execute(select(User).where(User.id == user_id)).scalar_one_or_none()
+        return user.password_hash if user and user.is_active else None
+    
+    user_id = verify_password_reset_token(token, password_hash_lookup)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset token"
+        )
+    
+    user = db.execute(select(User).where(User.id == user_id)).scalar_one()
+    user.password_hash = get_password_hash(new_password)
+    db.commit()
+    
     return {"message": "Password reset successful"}
 
 
@@ -1,39 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy import select
 from typing import List
 from uuid import UUID
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.deps import get_current_active_user
+from app.core.response_cache import CachedRoute, cache_response, invalidate_tags
 from app.schemas.course import CategoryCreate, CategoryResponse
 from app.db.models.course import Category
 from app.db.models.user import User
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
-async def create_category(
+def create_category(
     category_in: CategoryCreate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new category."""
     category = Category(**category_in.dict())
     db.add(category)
-    await db.commit()
-    await db.refresh(category)
+    db.commit()
+    db.refresh(category)
+    invalidate_tags("categories")
     return category
 
 
 @router.get("/", response_model=List[CategoryResponse])
-async def get_categories(
+@cache_response(ttl=settings.CATEGORY_CACHE_TTL_SECONDS, tags=["categories"])
+def get_categories(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: Session = Depends(get_db)
 ):
     """Get all categories."""
-    result = await db.execute(
+    result = db.execute(
         select(Category).offset(skip).limit(limit)
     )
     categories = result.scalars().all()
@@ -41,12 +45,12 @@ async def get_categories(
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-async def get_category(
+def get_category(
     category_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: Session = Depends(get_db)
 ):
     """Get category by ID."""
-    result = await db.execute(select(Category).where(Category.id == category_id))
+    result = db.execute(select(Category).where(Category.id == category_id))
     category = result.scalar_one_or_none()
     
     if not category:
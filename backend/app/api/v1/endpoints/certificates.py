@@ -1,33 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Response, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_
 from typing import List, Optional
 from uuid import UUID
-import secrets
-from datetime import datetime
+from datetime import timedelta
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.deps import get_current_active_user
+from app.core.rate_limit import rate_limit
 from app.schemas.certificate import (
-    CertificateCreate, CertificateResponse, CertificateVerification
+    CertificateCreate, CertificateResponse, CertificateVerification, CertificateBatchResponse
 )
-from app.db.models.certificate import Certificate
+from app.db.models.certificate import Certificate, CertificateBatch
 from app.db.models.enrollment import Enrollment
 from app.db.models.course import Course
 from app.db.models.user import User
+from app.services.certificate_issuance import issue_certificate_for_enrollment, run_certificate_batch
+from app.services.certificate_render import (
+    TEMPLATES, get_template, certificate_fields, get_or_render
+)
+from app.services.certificate_verification import verify_code, cache_revocation
+from app.services.storage import get_storage
 
 router = APIRouter()
 
 
-def generate_certificate_number() -> str:
-    """Generate a unique certificate number with DynPro branding."""
-    return f"DYN-{datetime.utcnow().strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
-
-
-def generate_verification_code() -> str:
-    """Generate a verification code."""
-    return secrets.token_hex(8).upper()
-
-
 @router.post("/generate", response_model=CertificateResponse, status_code=status.HTTP_201_CREATED)
 def generate_certificate(
     cert_data: CertificateCreate,
@@ -54,64 +53,39 @@ def generate_certificate(
             detail="Enrollment must be completed to generate certificate"
         )
     
-    # Check if certificate already exists
-    existing_cert = db.execute(
-        select(Certificate).where(Certificate.enrollment_id == cert_data.enrollment_id)
-    ).scalar_one_or_none()
-    
-    if existing_cert and not existing_cert.is_revoked:
-        return existing_cert
-    
-    # Get course details
-    course_result = db.execute(
-        select(Course).where(Course.id == enrollment.course_id)
-    )
-    course = course_result.scalar_one()
-    
-    # Create certificate
-    certificate = Certificate(
-        user_id=enrollment.user_id,
-        course_id=enrollment.course_id,
-        enrollment_id=enrollment.id,
-        certificate_number=generate_certificate_number(),
-        verification_code=generate_verification_code(),
-        title=f"Certificate of Completion - {course.title}",
-        description=f"This certifies that the holder has successfully completed {course.title} offered by DynPro."
-    )
-    
-    db.add(certificate)
-    enrollment.certificate_issued = True
+    if cert_data.template_id and cert_data.template_id not in TEMPLATES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown certificate template"
+        )
     
+    certificate = issue_certificate_for_enrollment(db, enrollment, cert_data.template_id)
     db.commit()
     db.refresh(certificate)
     return certificate
 
 
-@router.post("/bulk-generate", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/bulk-generate",
+    response_model=CertificateBatchResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
 def bulk_generate_certificates(
     course_id: UUID,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Generate certificates for all completed enrollments in a course (admin/instructor only)."""
+    """Generate certificates for all completed enrollments in a course (admin/instructor only).
+    
+    Issuance runs in the background; poll `/batches/{id}` for progress.
+    """
     if current_user.role not in ['instructor', 'admin', 'super_admin']:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to bulk generate certificates"
         )
     
-    # Get all completed enrollments for the course
-    enrollments_result = db.execute(
-        select(Enrollment).where(
-            and_(
-                Enrollment.course_id == course_id,
-                Enrollment.status == 'completed',
-                Enrollment.certificate_issued == False
-            )
-        )
-    )
-    enrollments = enrollments_result.scalars().all()
-    
     # Get course
     course_result = db.execute(select(Course).where(Course.id == course_id))
     course = course_result.scalar_one_or_none()
@@ -122,28 +96,35 @@ def bulk_generate_certificates(
             detail="Course not found"
         )
     
-    certificates_created = 0
-    for enrollment in enrollments:
-        certificate = Certificate(
-            user_id=enrollment.user_id,
-            course_id=enrollment.course_id,
-            enrollment_id=enrollment.id,
-            certificate_number=generate_certificate_number(),
-            verification_code=generate_verification_code(),
-            title=f"Certificate of Completion - {course.title}",
-            description=f"This certifies that the holder has successfully completed {course.title} offered by DynPro."
-        )
-        db.add(certificate)
-        enrollment.certificate_issued = True
-        certificates_created += 1
-    
+    batch = CertificateBatch(course_id=course_id, created_by=current_user.id)
+    db.add(batch)
     db.commit()
+    db.refresh(batch)
     
-    return {
-        "message": f"Generated {certificates_created} certificates",
-        "course_id": course_id,
-        "certificates_created": certificates_created
-    }
+    background_tasks.add_task(run_certificate_batch, batch.id)
+    return batch
+
+
+@router.get("/batches/{batch_id}", response_model=CertificateBatchResponse)
+def get_certificate_batch(
+    batch_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get progress of a bulk certificate generation (admin/instructor only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view certificate batches"
+        )
+    
+    batch = db.get(CertificateBatch, batch_id)
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Certificate batch not found"
+        )
+    return batch
 
 
 @router.get("/", response_model=List[CertificateResponse])
@@ -218,6 +199,30 @@ def get_certificates_by_course(
     return certificates
 
 
+@router.get("/templates")
+def get_certificate_templates(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get available certificate templates (admin/instructor only)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view templates"
+        )
+    
+    return {
+        "templates": [
+            {
+                "id": template.id,
+                "name": template.name,
+                "description": template.description,
+                "version": template.version
+            }
+            for template in TEMPLATES.values()
+        ]
+    }
+
+
 @router.get("/{certificate_id}", response_model=CertificateResponse)
 def get_certificate(
     certificate_id: UUID,
@@ -244,13 +249,7 @@ def get_certificate(
     return certificate
 
 
-@router.get("/{certificate_id}/download")
-def download_certificate(
-    certificate_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Download certificate as PDF."""
+def _load_certificate_for_render(db: Session, certificate_id: UUID, current_user: User):
     result = db.execute(select(Certificate).where(Certificate.id == certificate_id))
     certificate = result.scalar_one_or_none()
     
@@ -267,99 +266,88 @@ def download_certificate(
             detail="Not authorized to download this certificate"
         )
     
-    # In production, this would generate and return a PDF
-    # For now, return certificate data
-    return {
-        "message": "Certificate download endpoint",
-        "certificate_id": certificate_id,
-        "certificate_number": certificate.certificate_number,
-        "download_url": f"/api/v1/certificates/{certificate_id}/download.pdf"
-    }
+    if certificate.is_revoked:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="This certificate has been revoked"
+        )
+    
+    user = db.execute(select(User).where(User.id == certificate.user_id)).scalar_one()
+    course = db.execute(select(Course).where(Course.id == certificate.course_id)).scalar_one()
+    holder_name = f"{user.first_name} {user.last_name}" if user.first_name else user.username
+    
+    fields = certificate_fields(certificate, holder_name, course.title)
+    template = get_template((certificate.cert_metadata or {}).get("template_id"))
+    return certificate, fields, template
+
+
+def _record_certificate_url(db: Session, certificate: Certificate, url: str) -> None:
+    if certificate.certificate_url != url:
+        certificate.certificate_url = url
+        db.commit()
+
+
+@router.get("/{certificate_id}/download")
+async def download_certificate(
+    certificate_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download certificate as PDF.
+    
+    The PDF is rendered once per certificate and template version into
+    object storage; this redirects to a short-lived presigned URL for it, so
+    the bytes never pass through the API. `certificate_url` points at this
+    endpoint with `?v=<content hash>`, which only makes the URL change with
+    the PDF.
+    """
+    certificate, fields, template = await run_in_threadpool(
+        _load_certificate_for_render, db, certificate_id, current_user
+    )
+    key, info = await get_or_render(fields, template)
+    
+    content_hash = key.rsplit("/", 1)[-1].removesuffix(".pdf")
+    await run_in_threadpool(
+        _record_certificate_url, db, certificate,
+        f"/api/v1/certificates/{certificate_id}/download?v={content_hash}"
+    )
+    
+    url = get_storage().presigned_get_url(
+        key,
+        timedelta(seconds=settings.STORAGE_PRESIGNED_GET_SECONDS),
+        filename=f"{certificate.certificate_number}.pdf",
+        content_type="application/pdf",
+        inline=True
+    )
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": "private, no-store"}
+    )
 
 
-@router.get("/verify/{verification_code}")
+@router.get(
+    "/verify/{verification_code}",
+    dependencies=[Depends(rate_limit("certificates:verify", settings.CERTIFICATE_VERIFY_RATE_LIMIT_PER_MINUTE))]
+)
 def verify_certificate_by_code(
     verification_code: str,
     db: Session = Depends(get_db)
 ):
     """Verify a certificate by verification code (public endpoint)."""
-    result = db.execute(
-        select(Certificate).where(Certificate.verification_code == verification_code)
-    )
-    certificate = result.scalar_one_or_none()
-
-    if not certificate:
-        return {
-            "valid": False,
-            "message": "Certificate not found or verification code is invalid"
-        }
-
-    if certificate.is_revoked:
-        return {
-            "valid": False,
-            "message": "This certificate has been revoked"
-        }
-
-    # Get user and course details
-    user_result = db.execute(select(User).where(User.id == certificate.user_id))
-    user = user_result.scalar_one()
+    return verify_code(db, verification_code)
 
-    course_result = db.execute(select(Course).where(Course.id == certificate.course_id))
-    course = course_result.scalar_one()
-
-    return {
-        "valid": True,
-        "certificate_number": certificate.certificate_number,
-        "issued_to": f"{user.first_name} {user.last_name}" if user.first_name else user.username,
-        "course_title": course.title,
-        "issued_at": certificate.issued_at.isoformat(),
-        "expires_at": certificate.expires_at.isoformat() if certificate.expires_at else None
-    }
-
-@router.get("/{certificate_id}/verify")
+@router.get(
+    "/{certificate_id}/verify",
+    dependencies=[Depends(rate_limit("certificates:verify", settings.CERTIFICATE_VERIFY_RATE_LIMIT_PER_MINUTE))]
+)
 def verify_certificate(
     certificate_id: UUID,
     verification_code: str,
     db: Session = Depends(get_db)
 ):
     """Verify a certificate (public endpoint) - Legacy endpoint."""
-    result = db.execute(
-        select(Certificate).where(
-            and_(
-                Certificate.id == certificate_id,
-                Certificate.verification_code == verification_code
-            )
-        )
-    )
-    certificate = result.scalar_one_or_none()
-
-    if not certificate:
-        return {
-            "valid": False,
-            "message": "Certificate not found or verification code is invalid"
-        }
-
-    if certificate.is_revoked:
-        return {
-            "valid": False,
-            "message": "This certificate has been revoked"
-        }
-
-    # Get user and course details
-    user_result = db.execute(select(User).where(User.id == certificate.user_id))
-    user = user_result.scalar_one()
-
-    course_result = db.execute(select(Course).where(Course.id == certificate.course_id))
-    course = course_result.scalar_one()
-
-    return {
-        "valid": True,
-        "certificate_number": certificate.certificate_number,
-        "issued_to": f"{user.first_name} {user.last_name}" if user.first_name else user.username,
-        "course_title": course.title,
-        "issued_at": certificate.issued_at.isoformat(),
-        "expires_at": certificate.expires_at.isoformat() if certificate.expires_at else None
-    }
+    return verify_code(db, verification_code, certificate_id)
 
 
 @router.post("/{certificate_id}/revoke", response_model=CertificateResponse)
@@ -387,40 +375,6 @@ def revoke_certificate(
     certificate.is_revoked = True
     
     db.commit()
+    cache_revocation(certificate.verification_code, certificate.id)
     db.refresh(certificate)
     return certificate
-
-
-@router.get("/templates")
-def get_certificate_templates(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Get available certificate templates (admin/instructor only)."""
-    if current_user.role not in ['instructor', 'admin', 'super_admin']:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to view templates"
-        )
-    
-    # Return default templates
-    # In production, this would fetch from database
-    return {
-        "templates": [
-            {
-                "id": "default",
-                "name": "Default Certificate",
-                "description": "Standard certificate template"
-            },
-            {
-                "id": "professional",
-                "name": "Professional Certificate",
-                "description": "Professional-looking certificate with border"
-            },
-            {
-                "id": "modern",
-                "name": "Modern Certificate",
-                "description": "Modern minimalist design"
-            }
-        ]
-    }
@@ -4,7 +4,11 @@ from sqlalchemy import select
 from typing import List
 from uuid import UUID
 from app.db.session import get_db
+from app.core.conditional import ConditionalRequest, rows_version
+from app.core.config import settings
 from app.core.deps import get_current_active_user
+from app.core.response_cache import CachedRoute, cache_response, invalidate_tags
+from app.core.serialization import json_response
 from app.schemas.course import (
     CourseCreate, CourseUpdate, CourseResponse,
     ModuleCreate, ModuleUpdate, ModuleResponse,
@@ -13,7 +17,7 @@ from app.schemas.course import (
 from app.db.models.course import Course, Module, ContentItem, CourseStatus
 from app.db.models.user import User
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.post("/", response_model=CourseResponse, status_code=status.HTTP_201_CREATED)
@@ -56,27 +60,33 @@ def create_course(
     db.add(course)
     db.commit()
     db.refresh(course)
+    invalidate_tags("courses")
     return course
 
 
 @router.get("/", response_model=List[CourseResponse])
+@cache_response(ttl=settings.COURSE_LIST_CACHE_TTL_SECONDS, tags=["courses"])
 def get_courses(
     skip: int = 0,
     limit: int = 20,
     status: CourseStatus = None,
     category_id: UUID = None,
     instructor_id: UUID = None,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db)
 ):
     """Get all courses with filters."""
-    query = select(Course).where(Course.deleted_at.is_(None))
+    criteria = [Course.deleted_at.is_(None)]
 
     if status:
-        query = query.where(Course.status == status)
+        criteria.append(Course.status == status)
     if category_id:
-        query = query.where(Course.category_id == category_id)
+        criteria.append(Course.category_id == category_id)
     if instructor_id:
-        query = query.where(Course.instructor_id == instructor_id)
+        criteria.append(Course.instructor_id == instructor_id)
+
+    conditional.check(rows_version(db, Course, *criteria), skip, limit, status, category_id, instructor_id)
+    query = select(Course).where(*criteria)
 
     query = query.offset(skip).limit(limit).order_by(Course.created_at.desc())
     result = db.execute(query)
@@ -103,11 +113,14 @@ def get_my_courses(
 
 
 @router.get("/{course_id}", response_model=CourseResponse)
+@cache_response(ttl=settings.COURSE_CACHE_TTL_SECONDS, tags=["course:{course_id}"])
 def get_course(
     course_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db)
 ):
     """Get course by ID."""
+    conditional.check(rows_version(db, Course, Course.id == course_id))
     result = db.execute(select(Course).where(Course.id == course_id))
     course = result.scalar_one_or_none()
 
@@ -143,6 +156,7 @@ def update_course(
 
     db.commit()
     db.refresh(course)
+    invalidate_tags("courses", f"course:{course_id}")
     return course
 
 
@@ -165,6 +179,7 @@ def delete_course(
     from datetime import datetime
     course.deleted_at = datetime.utcnow()
     db.commit()
+    invalidate_tags("courses", f"course:{course_id}")
 
 
 # Module endpoints
@@ -190,15 +205,24 @@ def create_module(
     db.add(module)
     db.commit()
     db.refresh(module)
+    invalidate_tags(f"course:{module.course_id}")
     return module
 
 
 @router.get("/{course_id}/modules")
+@cache_response(ttl=settings.COURSE_CACHE_TTL_SECONDS, tags=["course:{course_id}"])
 def get_course_modules(
     course_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db)
 ):
     """Get all modules for a course with their content items."""
+    course_modules = select(Module.id).where(Module.course_id == course_id)
+    conditional.check(
+        rows_version(db, Module, Module.course_id == course_id),
+        rows_version(db, ContentItem, ContentItem.module_id.in_(course_modules))
+    )
+
     # Get all modules
     modules_result = db.execute(
         select(Module).where(Module.course_id == course_id).order_by(Module.order_index)
@@ -214,35 +238,36 @@ def get_course_modules(
         )
         content_items = content_result.scalars().all()
 
+        # UUIDs, datetimes and enums are left to the encoder
         module_dict = {
-            "id": str(module.id),
-            "course_id": str(module.course_id),
+            "id": module.id,
+            "course_id": module.course_id,
             "title": module.title,
             "description": module.description,
             "order_index": module.order_index,
             "is_locked": module.is_locked,
-            "created_at": module.created_at.isoformat(),
-            "updated_at": module.updated_at.isoformat(),
+            "created_at": module.created_at,
+            "updated_at": module.updated_at,
             "content_items": [
                 {
-                    "id": str(item.id),
-                    "module_id": str(item.module_id),
+                    "id": item.id,
+                    "module_id": item.module_id,
                     "title": item.title,
                     "description": item.description,
-                    "content_type": item.content_type.value,
+                    "content_type": item.content_type,
                     "content_url": item.content_url,
                     "content_data": item.content_data,
                     "duration_minutes": item.duration_minutes,
                     "order_index": item.order_index,
                     "is_mandatory": item.is_mandatory,
-                    "created_at": item.created_at.isoformat()
+                    "created_at": item.created_at
                 }
                 for item in content_items
             ]
         }
         modules_data.append(module_dict)
 
-    return {"modules": modules_data}
+    return json_response({"modules": modules_data}, headers=conditional.headers)
 
 
 @router.put("/{course_id}/modules/{module_id}", response_model=ModuleResponse)
@@ -273,6 +298,7 @@ def update_module(
 
     db.commit()
     db.refresh(module)
+    invalidate_tags(f"course:{course_id}")
     return module
 
 
@@ -299,6 +325,7 @@ def delete_module(
 
     db.delete(module)
     db.commit()
+    invalidate_tags(f"course:{course_id}")
 
 
 # Content Item endpoints
@@ -329,6 +356,7 @@ def create_content_item(
     db.add(content)
     db.commit()
     db.refresh(content)
+    invalidate_tags(f"course:{course_id}")
     return content
 
 
@@ -336,9 +364,11 @@ def create_content_item(
 def get_module_content(
     course_id: UUID,
     module_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db)
 ):
     """Get all content items for a module."""
+    conditional.check(rows_version(db, ContentItem, ContentItem.module_id == module_id))
     result = db.execute(
         select(ContentItem).where(ContentItem.module_id == module_id).order_by(ContentItem.order_index)
     )
@@ -375,6 +405,7 @@ def update_content_item(
 
     db.commit()
     db.refresh(content)
+    invalidate_tags(f"course:{course_id}")
     return content
 
 
@@ -402,3 +433,4 @@ def delete_content_item(
 
     db.delete(content)
     db.commit()
+    invalidate_tags(f"course:{course_id}")
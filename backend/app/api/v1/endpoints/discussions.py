@@ -5,6 +5,7 @@ from typing import List, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
 from app.db.session import get_db
+from app.core.conditional import ConditionalRequest, rows_version
 from app.core.deps import get_current_active_user
 from app.schemas.discussion import (
     DiscussionCreate, DiscussionUpdate, DiscussionResponse, DiscussionWithReplies,
@@ -40,24 +41,28 @@ def get_discussions(
     search: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all discussions with optional filters."""
-    query = select(Discussion).options(joinedload(Discussion.user))
+    criteria = []
 
     if course_id:
-        query = query.where(Discussion.course_id == course_id)
+        criteria.append(Discussion.course_id == course_id)
     if category:
-        query = query.where(Discussion.category == category)
+        criteria.append(Discussion.category == category)
     if search:
-        query = query.where(
+        criteria.append(
             or_(
                 Discussion.title.ilike(f"%{search}%"),
                 Discussion.content.ilike(f"%{search}%")
             )
         )
 
+    conditional.check(rows_version(db, Discussion, *criteria), skip, limit, course_id, category, search)
+    query = select(Discussion).options(joinedload(Discussion.user)).where(*criteria)
+
     # Order by pinned first, then by creation date
     query = query.order_by(
         Discussion.is_pinned.desc(),
@@ -72,10 +77,12 @@ def get_discussions(
 @router.get("/by-course/{course_id}", response_model=List[DiscussionResponse])
 def get_discussions_by_course(
     course_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all discussions for a specific course."""
+    conditional.check(rows_version(db, Discussion, Discussion.course_id == course_id))
     result = db.execute(
         select(Discussion).where(Discussion.course_id == course_id)
         .order_by(Discussion.is_pinned.desc(), Discussion.created_at.desc())
@@ -151,10 +158,16 @@ def search_discussions(
 @router.get("/{discussion_id}", response_model=DiscussionWithReplies)
 def get_discussion(
     discussion_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get discussion with replies."""
+    conditional.check(
+        rows_version(db, Discussion, Discussion.id == discussion_id),
+        rows_version(db, DiscussionReply, DiscussionReply.discussion_id == discussion_id)
+    )
+
     result = db.execute(
         select(Discussion)
         .options(joinedload(Discussion.user))
@@ -371,10 +384,12 @@ def create_reply(
 @router.get("/{discussion_id}/replies", response_model=List[ReplyResponse])
 def get_replies(
     discussion_id: UUID,
+    conditional: ConditionalRequest = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all replies for a discussion."""
+    conditional.check(rows_version(db, DiscussionReply, DiscussionReply.discussion_id == discussion_id))
     result = db.execute(
         select(DiscussionReply)
         .where(DiscussionReply.discussion_id == discussion_id)
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy import select
 from typing import List
 from uuid import UUID
 from datetime import datetime
-import secrets
 from app.db.session import get_db
 from app.core.deps import get_current_active_user
 from app.schemas.enrollment import (
@@ -12,110 +11,15 @@ from app.schemas.enrollment import (
     ContentProgressCreate, ContentProgressUpdate, ContentProgressResponse
 )
 from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse
-from app.db.models.enrollment import Enrollment, ContentProgress, EnrollmentStatus
-from app.db.models.course import Course, Module, ContentItem
-from app.db.models.certificate import Certificate
+from app.db.models.enrollment import Enrollment, ContentProgress
+from app.db.models.course import Course
 from app.db.models.user import User
 from app.db.models.note import Note
+from app.services.enrollment_progress import update_enrollment_progress
 
 router = APIRouter()
 
 
-def generate_certificate_number() -> str:
-    """Generate a unique certificate number."""
-    return f"DYN-{datetime.utcnow().strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
-
-
-def generate_verification_code() -> str:
-    """Generate a verification code."""
-    return secrets.token_hex(8).upper()
-
-
-def calculate_course_progress(db: Session, enrollment_id: UUID, course_id: UUID) -> float:
-    """Calculate the progress percentage for a course enrollment."""
-    # Get all content items for this course
-    result = db.execute(
-        select(func.count(ContentItem.id))
-        .join(Module, Module.id == ContentItem.module_id)
-        .where(Module.course_id == course_id)
-    )
-    total_items = result.scalar() or 0
-
-    if total_items == 0:
-        return 0.0
-
-    # Get completed content items for this enrollment
-    result = db.execute(
-        select(func.count(ContentProgress.id))
-        .where(
-            (ContentProgress.enrollment_id == enrollment_id) &
-            (ContentProgress.is_completed == True)
-        )
-    )
-    completed_items = result.scalar() or 0
-
-    return round((completed_items / total_items) * 100, 2)
-
-
-def update_enrollment_progress(db: Session, enrollment_id: UUID, course_id: UUID):
-    """Update enrollment progress and status."""
-    progress = calculate_course_progress(db, enrollment_id, course_id)
-
-    result = db.execute(
-        select(Enrollment).where(Enrollment.id == enrollment_id)
-    )
-    enrollment = result.scalar_one_or_none()
-
-    if enrollment:
-        enrollment.progress_percentage = progress
-        enrollment.last_accessed_at = datetime.utcnow()
-
-        # Update status based on progress
-        if progress == 0 and enrollment.status == EnrollmentStatus.enrolled:
-            enrollment.status = EnrollmentStatus.enrolled
-        elif progress > 0 and progress < 100:
-            enrollment.status = EnrollmentStatus.in_progress
-            if not enrollment.started_at:
-                enrollment.started_at = datetime.utcnow()
-        elif progress == 100:
-            enrollment.status = EnrollmentStatus.completed
-            if not enrollment.completed_at:
-                enrollment.completed_at = datetime.utcnow()
-
-                # Auto-generate certificate when course is completed
-                if not enrollment.certificate_issued:
-                    # Check if certificate already exists
-                    cert_result = db.execute(
-                        select(Certificate).where(Certificate.enrollment_id == enrollment_id)
-                    )
-                    existing_cert = cert_result.scalar_one_or_none()
-
-                    if not existing_cert:
-                        # Get course details for certificate
-                        course_result = db.execute(
-                            select(Course).where(Course.id == course_id)
-                        )
-                        course = course_result.scalar_one()
-
-                        # Create certificate
-                        certificate = Certificate(
-                            user_id=enrollment.user_id,
-                            course_id=course_id,
-                            enrollment_id=enrollment_id,
-                            certificate_number=generate_certificate_number(),
-                            verification_code=generate_verification_code(),
-                            title=f"Certificate of Completion - {course.title}",
-                            description=f"This certifies that {enrollment.user_id} has successfully completed {course.title} offered by DynPro."
-                        )
-                        db.add(certificate)
-                        enrollment.certificate_issued = True
-
-        db.commit()
-        db.refresh(enrollment)
-
-    return enrollment
-
-
 @router.post("/", response_model=EnrollmentResponse, status_code=status.HTTP_201_CREATED)
 def enroll_in_course(
     enrollment_in: EnrollmentCreate,
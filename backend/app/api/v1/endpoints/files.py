@@ -1,196 +1,392 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+import tempfile
+from datetime import timedelta
+from fastapi import (
+    APIRouter, Depends, HTTPException, Request, Response, status, UploadFile, File, Form, Query, BackgroundTasks
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
+from PIL import Image
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, func
 from typing import List, Optional
 from uuid import UUID
-import os
-import secrets
-from datetime import datetime
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.deps import get_current_active_user
-from app.schemas.file import FileResponse, VideoProcessingStatus
+from app.core.ranges import range_response
+from app.schemas.file import (
+    FileResponse, FileUploadCreate, FileUploadStatus, FilePresignedUpload, VideoProcessingStatus
+)
 from app.db.models.user import User
+from app.db.models.file import StoredFile, FileStatus, ProcessingStatus
+from app.services.file_uploads import (
+    InvalidFile, FileTooLarge, store_upload, create_upload, put_chunk, complete_upload,
+    received_chunk_indexes, presigned_upload_url, download_url, delete_file as delete_stored_file
+)
+from app.services.storage import get_storage, read_local_token, LocalStorage, CHUNK_SIZE
+from app.services import video_processing, image_derivatives
 
 router = APIRouter()
 
-# In production, these would be environment variables
-UPLOAD_DIR = "uploads"
-ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".wmv", ".flv", ".webm"}
-ALLOWED_DOCUMENT_EXTENSIONS = {".pdf", ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx"}
-ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp"}
-MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+MAX_FILE_SIZE = settings.FILE_MAX_SIZE_BYTES
 
 
-def generate_unique_filename(original_filename: str) -> str:
-    """Generate a unique filename to prevent collisions."""
-    ext = os.path.splitext(original_filename)[1]
-    return f"{secrets.token_hex(16)}{ext}"
+def _file_url(record: StoredFile) -> str:
+    if record.file_type == "video":
+        return f"{settings.API_V1_STR}/files/video/{record.id}/stream"
+    if record.file_type == "document":
+        return f"{settings.API_V1_STR}/files/document/{record.id}"
+    if record.file_type == "image":
+        return image_derivatives.image_url(record.id)
+    return f"{settings.API_V1_STR}/files/{record.id}"
 
 
-@router.post("/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
-async def upload_file(
-    file: UploadFile = File(...),
-    file_type: str = Form(...),
-    folder: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Upload a file (video, document, or image)."""
-    # Validate file type
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    
-    if file_type == "video" and file_ext not in ALLOWED_VIDEO_EXTENSIONS:
+def _file_response(record: StoredFile) -> dict:
+    return {
+        "id": record.id,
+        "filename": record.filename,
+        "file_type": record.file_type,
+        "file_size": record.file_size,
+        "mime_type": record.mime_type or "application/octet-stream",
+        "file_path": record.storage_key,
+        "file_url": _file_url(record),
+        "srcset": image_derivatives.srcset(record.id) if record.file_type == "image" else None,
+        "uploaded_by": record.uploaded_by,
+        "uploaded_at": record.completed_at or record.created_at
+    }
+
+
+def _upload_status(record: StoredFile) -> dict:
+    return {
+        "id": record.id,
+        "filename": record.filename,
+        "file_type": record.file_type,
+        "file_size": record.file_size,
+        "status": record.status.value,
+        "chunk_size": record.chunk_size,
+        "total_chunks": record.total_chunks,
+        "received_chunks": received_chunk_indexes(record)
+    }
+
+
+def _store(db: Session, file: UploadFile, file_type: str, folder: Optional[str], current_user: User) -> StoredFile:
+    try:
+        return store_upload(
+            db, file.file, file.filename, file_type, current_user.id,
+            folder=folder, declared_mime_type=file.content_type
+        )
+    except InvalidFile as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid video format. Allowed: {', '.join(ALLOWED_VIDEO_EXTENSIONS)}"
+            detail=str(e)
         )
-    elif file_type == "document" and file_ext not in ALLOWED_DOCUMENT_EXTENSIONS:
+    except FileTooLarge:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid document format. Allowed: {', '.join(ALLOWED_DOCUMENT_EXTENSIONS)}"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit"
         )
-    elif file_type == "image" and file_ext not in ALLOWED_IMAGE_EXTENSIONS:
+
+
+def _get_own_file(db: Session, file_id: UUID, current_user: User, status_in=(FileStatus.ready,)) -> StoredFile:
+    record = db.get(StoredFile, file_id)
+    if (
+        record is None
+        or record.status not in status_in
+        or (record.uploaded_by != current_user.id and current_user.role not in ['admin', 'super_admin'])
+    ):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid image format. Allowed: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
         )
-    
-    # In production, this would:
-    # 1. Upload to MinIO/S3
-    # 2. Create database record
-    # 3. For videos, trigger processing job
-    # 4. Return file metadata
-    
+    return record
+
+
+def _get_readable_file(db: Session, file_id: UUID, current_user: User) -> StoredFile:
+    """A ready file the user may read: their own, or any file uploaded by staff (course material)."""
+    staff = ['instructor', 'admin', 'super_admin']
+    row = db.execute(
+        select(StoredFile, User.role)
+        .outerjoin(User, StoredFile.uploaded_by == User.id)
+        .where(StoredFile.id == file_id, StoredFile.status == FileStatus.ready)
+    ).first()
+    if row is None or not (
+        current_user.role in staff or row.StoredFile.uploaded_by == current_user.id or row.role in staff
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    return row.StoredFile
+
+
+def _processing_status(record: StoredFile) -> dict:
+    thumbnails = (record.media_info or {}).get("thumbnails") or []
+    base = f"{settings.API_V1_STR}/files/video/{record.id}/assets"
+    completed = record.processing_status == ProcessingStatus.completed
     return {
-        "id": secrets.token_hex(16),
-        "filename": file.filename,
-        "file_type": file_type,
-        "file_size": 0,  # Would be actual size
-        "mime_type": file.content_type or "application/octet-stream",
-        "file_path": f"/{file_type}s/{folder or 'default'}/{file.filename}",
-        "file_url": f"/api/v1/files/{secrets.token_hex(16)}",
-        "uploaded_by": current_user.id,
-        "uploaded_at": datetime.utcnow()
+        "file_id": record.id,
+        "status": record.processing_status.value if record.processing_status else "not_started",
+        "progress": record.processing_progress or 0,
+        "thumbnail_url": f"{base}/thumbnails/thumb_{len(thumbnails) // 2}.jpg" if thumbnails else None,
+        "duration": record.duration_seconds,
+        "hls_url": f"{base}/hls/master.m3u8" if completed else None,
+        "error": record.processing_error
     }
 
 
+def _trusted_hash(upload_in: FileUploadCreate, current_user: User) -> Optional[str]:
+    # Naming a hash is enough to obtain the content, so only staff may skip the upload
+    if current_user.role in ['instructor', 'admin', 'super_admin']:
+        return upload_in.sha256
+    return None
+
+
+def _process_new_file(db: Session, record: StoredFile) -> None:
+    if record.file_type == "video" and record.processing_status is None:
+        video_processing.enqueue(db, record)
+
+
+def _redirect_to_download(record: StoredFile, inline: bool = False) -> RedirectResponse:
+    return RedirectResponse(
+        download_url(record, inline=inline),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        # The URL expires, so the redirect must not outlive it in caches
+        headers={"Cache-Control": "private, no-store"}
+    )
+
+
+@router.post("/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
+def upload_file(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    file_type: str = Form(...),
+    folder: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload a file (video, document, or image)."""
+    record = _store(db, file, file_type, folder, current_user)
+    _process_new_file(db, record)
+    if file_type == "image":
+        background_tasks.add_task(image_derivatives.generate_eager, record.id)
+    return _file_response(record)
+
+
 @router.post("/video/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
-async def upload_video(
+def upload_video(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload a video file with automatic processing."""
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    record = _store(db, file, "video", None, current_user)
+    video_processing.enqueue(db, record)
+    return _file_response(record)
+
+
+@router.get("/video/{file_id}/stream")
+def stream_video(
+    file_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream video file with range support.
     
-    if file_ext not in ALLOWED_VIDEO_EXTENSIONS:
+    Answers `Range` requests (including multiple ranges and `If-Range`)
+    with 206 Partial Content, so players can seek without re-downloading.
+    """
+    record = _get_readable_file(db, file_id, current_user)
+    if record.file_type != "video":
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid video format. Allowed: {', '.join(ALLOWED_VIDEO_EXTENSIONS)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
         )
     
-    # In production: Upload to MinIO, trigger FFmpeg processing
-    return {
-        "id": secrets.token_hex(16),
-        "filename": file.filename,
-        "file_type": "video",
-        "file_size": 0,
-        "mime_type": file.content_type or "video/mp4",
-        "file_path": f"/videos/{file.filename}",
-        "file_url": f"/api/v1/files/video/{secrets.token_hex(16)}/stream",
-        "uploaded_by": current_user.id,
-        "uploaded_at": datetime.utcnow()
-    }
+    storage = get_storage()
+    info = storage.stat(record.storage_key)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    
+    return range_response(
+        request,
+        storage,
+        info,
+        record.mime_type or "video/mp4",
+        headers={"Cache-Control": "private, max-age=3600"}
+    )
 
 
-@router.get("/video/{file_id}/stream")
-async def stream_video(
+@router.get("/video/{file_id}/processing", response_model=VideoProcessingStatus)
+def get_video_processing_status(
     file_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Stream video file with range support."""
-    # In production: Stream from MinIO with range headers
-    return {
-        "message": "Video streaming endpoint",
-        "file_id": file_id,
-        "stream_url": f"/api/v1/files/video/{file_id}/stream.m3u8"
-    }
+    """Get transcoding progress of a video."""
+    record = _get_readable_file(db, file_id, current_user)
+    if record.file_type != "video":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    return _processing_status(record)
 
 
-@router.post("/document/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
-async def upload_document(
-    file: UploadFile = File(...),
+@router.get("/video/{file_id}/assets/{path:path}")
+def get_video_asset(
+    file_id: UUID,
+    path: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Upload a document file."""
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    """Serve an HLS playlist, segment or thumbnail of a transcoded video.
     
-    if file_ext not in ALLOWED_DOCUMENT_EXTENSIONS:
+    Playlists are small and reference their neighbours by relative path, so
+    they are served here; segments and thumbnails redirect to storage.
+    """
+    record = _get_readable_file(db, file_id, current_user)
+    if (
+        record.processing_status != ProcessingStatus.completed
+        or ".." in path.split("/")
+        or not path.startswith(("hls/", "thumbnails/"))
+    ):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid document format. Allowed: {', '.join(ALLOWED_DOCUMENT_EXTENSIONS)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Asset not found"
         )
     
-    return {
-        "id": secrets.token_hex(16),
-        "filename": file.filename,
-        "file_type": "document",
-        "file_size": 0,
-        "mime_type": file.content_type or "application/pdf",
-        "file_path": f"/documents/{file.filename}",
-        "file_url": f"/api/v1/files/document/{secrets.token_hex(16)}",
-        "uploaded_by": current_user.id,
-        "uploaded_at": datetime.utcnow()
-    }
+    key = f"{video_processing.asset_prefix(record.id)}/{path}"
+    extension = path[path.rfind("."):]
+    content_type = video_processing.CONTENT_TYPES.get(extension, "application/octet-stream")
+    storage = get_storage()
+    if extension != ".m3u8":
+        return RedirectResponse(
+            storage.presigned_get_url(
+                key,
+                timedelta(seconds=settings.STORAGE_PRESIGNED_GET_SECONDS),
+                content_type=content_type,
+                inline=True
+            ),
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={"Cache-Control": "private, no-store"}
+        )
+    
+    info = storage.stat(key)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Asset not found"
+        )
+    return range_response(request, storage, info, content_type, headers={"Cache-Control": "private, max-age=3600"})
+
+
+@router.post("/document/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
+def upload_document(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload a document file."""
+    return _file_response(_store(db, file, "document", None, current_user))
 
 
 @router.get("/document/{file_id}")
-async def get_document(
+def get_document(
     file_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get document file."""
-    # In production: Fetch from MinIO and return file
-    return {
-        "message": "Document download endpoint",
-        "file_id": file_id,
-        "download_url": f"/api/v1/files/document/{file_id}/download"
-    }
+    """Get document file (redirects to a short-lived download URL)."""
+    return _redirect_to_download(_get_readable_file(db, file_id, current_user), inline=True)
 
 
 @router.post("/image/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
-async def upload_image(
+def upload_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Upload an image file."""
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    """Upload an image file.
     
-    if file_ext not in ALLOWED_IMAGE_EXTENSIONS:
+    The common display sizes are rendered in the background right away; use
+    `file_url` with `?w=` (or the `srcset`) to fetch a resized copy.
+    """
+    record = _store(db, file, "image", None, current_user)
+    background_tasks.add_task(image_derivatives.generate_eager, record.id)
+    return _file_response(record)
+
+
+@router.get("/image/{file_id}")
+def get_image(
+    file_id: UUID,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=10000),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+    db: Session = Depends(get_db)
+):
+    """Get an uploaded image resized to at least `w` pixels wide.
+    
+    Public, like the catalogue pages that show course thumbnails. Redirects to
+    the content-addressed derivative, rendering it on first request; the format
+    is WebP when the `Accept` header allows it unless `format` says otherwise.
+    """
+    record = db.get(StoredFile, file_id)
+    if record is None or record.file_type != "image" or record.status != FileStatus.ready:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid image format. Allowed: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
         )
     
-    return {
-        "id": secrets.token_hex(16),
-        "filename": file.filename,
-        "file_type": "image",
-        "file_size": 0,
-        "mime_type": file.content_type or "image/jpeg",
-        "file_path": f"/images/{file.filename}",
-        "file_url": f"/api/v1/files/{secrets.token_hex(16)}",
-        "uploaded_by": current_user.id,
-        "uploaded_at": datetime.utcnow()
-    }
+    width = image_derivatives.pick_width(w)
+    fmt = image_derivatives.pick_format(request.headers.get("accept"), format)
+    try:
+        derivatives = image_derivatives.ensure_derivatives(db, record, [(width, fmt)])
+    except (OSError, Image.DecompressionBombError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Image could not be processed"
+        )
+    
+    return RedirectResponse(
+        image_derivatives.derivative_url(derivatives[image_derivatives.spec_name(width, fmt)], fmt),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": "public, max-age=86400", "Vary": "Accept"}
+    )
+
+
+@router.get("/derivatives/{name}")
+def get_image_derivative(
+    name: str,
+    request: Request
+):
+    """Serve a rendered image derivative by content hash (cacheable forever)."""
+    match = image_derivatives.DERIVATIVE_NAME_PATTERN.match(name)
+    storage = get_storage()
+    fmt = "webp" if match and match.group(2) == ".webp" else "jpeg"
+    info = storage.stat(image_derivatives.derivative_key(match.group(1), fmt)) if match else None
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    return range_response(
+        request,
+        storage,
+        info,
+        image_derivatives.FORMATS[fmt][1],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
 
 
 @router.post("/bulk-upload", status_code=status.HTTP_201_CREATED)
-async def bulk_upload_files(
+def bulk_upload_files(
     files: List[UploadFile] = File(...),
     file_type: str = Form(...),
     db: Session = Depends(get_db),
@@ -205,94 +401,236 @@ async def bulk_upload_files(
     
     uploaded_files = []
     for file in files:
-        # In production: Upload each file
+        try:
+            record = store_upload(
+                db, file.file, file.filename, file_type, current_user.id,
+                declared_mime_type=file.content_type
+            )
+        except (InvalidFile, FileTooLarge) as e:
+            uploaded_files.append({
+                "filename": file.filename,
+                "status": "rejected",
+                "error": str(e) or "File too large"
+            })
+            continue
+        _process_new_file(db, record)
         uploaded_files.append({
-            "filename": file.filename,
+            **_file_response(record),
             "status": "uploaded"
         })
     
+    uploaded_count = sum(1 for f in uploaded_files if f["status"] == "uploaded")
     return {
-        "message": f"Successfully uploaded {len(uploaded_files)} files",
+        "message": f"Successfully uploaded {uploaded_count} files",
         "files": uploaded_files
     }
 
 
-@router.get("/{file_id}", response_model=FileResponse)
-async def get_file(
-    file_id: UUID,
+@router.post("/uploads", response_model=FileUploadStatus, status_code=status.HTTP_201_CREATED)
+def start_resumable_upload(
+    upload_in: FileUploadCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get file metadata."""
-    # In production: Fetch from database
-    return {
-        "id": file_id,
-        "filename": "example.pdf",
-        "file_type": "document",
-        "file_size": 1024000,
-        "mime_type": "application/pdf",
-        "file_path": "/documents/example.pdf",
-        "file_url": f"/api/v1/files/{file_id}",
-        "uploaded_by": current_user.id,
-        "uploaded_at": datetime.utcnow()
-    }
+    """Start a resumable upload.
+    
+    PUT each chunk (`chunk_size` bytes, the last one shorter) to
+    `/uploads/{id}/chunks/{index}`, then POST `/uploads/{id}/complete`. After
+    an interruption, GET `/uploads/{id}` lists the chunks already received.
+    Staff may send the file's `sha256`: if that content is already stored, the
+    upload comes back `ready` with nothing to send.
+    """
+    try:
+        record = create_upload(
+            db, upload_in.filename, upload_in.file_type, upload_in.file_size, current_user.id,
+            folder=upload_in.folder, content_hash=_trusted_hash(upload_in, current_user)
+        )
+    except InvalidFile as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except FileTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit"
+        )
+    if record.status == FileStatus.ready:
+        _process_new_file(db, record)
+    return _upload_status(record)
 
 
-@router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_file(
-    file_id: UUID,
+@router.get("/uploads/{upload_id}", response_model=FileUploadStatus)
+def get_resumable_upload(
+    upload_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Delete a file."""
-    # In production: Delete from MinIO and database
-    return
+    """Get the state of a resumable upload, including which chunks were received."""
+    record = _get_own_file(db, upload_id, current_user, status_in=tuple(FileStatus))
+    return _upload_status(record)
 
 
-@router.get("/{file_id}/metadata")
-async def get_file_metadata(
-    file_id: UUID,
+def _put_chunk(db: Session, upload_id: UUID, index: int, data: bytes, current_user: User) -> dict:
+    record = _get_own_file(db, upload_id, current_user, status_in=(FileStatus.uploading,))
+    try:
+        return _upload_status(put_chunk(db, record, index, data))
+    except InvalidFile as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}", response_model=FileUploadStatus)
+async def upload_chunk(
+    upload_id: UUID,
+    index: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get detailed file metadata."""
+    """Upload one chunk of a resumable upload as the raw request body."""
+    # A chunk is at most FILE_UPLOAD_CHUNK_SIZE_BYTES, so holding one in memory is bounded
+    limit = settings.FILE_UPLOAD_CHUNK_SIZE_BYTES
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Chunks are at most {limit} bytes"
+        )
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Chunks are at most {limit} bytes"
+            )
+    
+    return await run_in_threadpool(_put_chunk, db, upload_id, index, bytes(data), current_user)
+
+
+@router.post("/uploads/presigned", response_model=FilePresignedUpload, status_code=status.HTTP_201_CREATED)
+def start_direct_upload(
+    upload_in: FileUploadCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Start a direct upload to object storage.
+    
+    PUT the file's bytes to `upload_url` before `expires_at`, then POST
+    `/uploads/{id}/complete` to validate and record it.
+    """
+    try:
+        record = create_upload(
+            db, upload_in.filename, upload_in.file_type, upload_in.file_size, current_user.id,
+            folder=upload_in.folder, chunked=False, content_hash=_trusted_hash(upload_in, current_user)
+        )
+    except InvalidFile as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except FileTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit"
+        )
+    
+    if record.status == FileStatus.ready:
+        # Content already stored: nothing to PUT
+        _process_new_file(db, record)
+        return {
+            "id": record.id,
+            "status": record.status.value
+        }
+    
+    upload_url, expires_at = presigned_upload_url(record)
     return {
-        "file_id": file_id,
-        "filename": "example.mp4",
-        "file_type": "video",
-        "file_size": 52428800,
-        "mime_type": "video/mp4",
-        "duration": 600,  # seconds
-        "resolution": "1920x1080",
-        "bitrate": "5000kbps",
-        "uploaded_at": datetime.utcnow().isoformat(),
-        "processing_status": "completed"
+        "id": record.id,
+        "status": record.status.value,
+        "upload_url": upload_url,
+        "method": "PUT",
+        "expires_at": expires_at
     }
 
 
-@router.post("/{file_id}/process")
-async def process_file(
-    file_id: UUID,
+@router.post("/uploads/{upload_id}/complete", response_model=FileResponse)
+def complete_resumable_upload(
+    upload_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Trigger file processing (e.g., video transcoding)."""
-    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+    """Finish a resumable or direct upload."""
+    _get_own_file(db, upload_id, current_user, status_in=(FileStatus.uploading, FileStatus.ready))
+    try:
+        record = complete_upload(db, upload_id)
+    except InvalidFile as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    _process_new_file(db, record)
+    return _file_response(record)
+
+
+@router.get("/blob/{token}")
+def get_local_blob(
+    token: str,
+    request: Request
+):
+    """Serve an object for a presigned URL of the local storage backend."""
+    storage = get_storage()
+    claims = read_local_token(token, "GET") if isinstance(storage, LocalStorage) else None
+    info = storage.stat(claims["key"]) if claims else None
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    return range_response(
+        request,
+        storage,
+        info,
+        claims.get("content_type") or "application/octet-stream",
+        headers={"Content-Disposition": claims["disposition"], "Cache-Control": "private, no-cache"}
+    )
+
+
+@router.put("/blob/{token}")
+async def put_local_blob(
+    token: str,
+    request: Request
+):
+    """Accept an upload for a presigned URL of the local storage backend."""
+    storage = get_storage()
+    claims = read_local_token(token, "PUT") if isinstance(storage, LocalStorage) else None
+    if claims is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to process files"
+            detail="Invalid or expired upload URL"
         )
     
-    # In production: Trigger Celery task for processing
-    return {
-        "message": "File processing started",
-        "file_id": file_id,
-        "status": "processing"
-    }
+    # Spool to disk so a large body never sits in memory; the size is checked on completion
+    with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE * 16) as spool:
+        size = 0
+        async for part in request.stream():
+            size += len(part)
+            if size > MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit"
+                )
+            spool.write(part)
+        spool.seek(0)
+        await run_in_threadpool(
+            storage.put_stream, claims["key"], iter(lambda: spool.read(CHUNK_SIZE), b"")
+        )
+    return Response(status_code=status.HTTP_200_OK)
 
 
 @router.get("/library")
-async def get_file_library(
+def get_file_library(
     file_type: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
@@ -300,10 +638,109 @@ async def get_file_library(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get user's file library."""
-    # In production: Fetch user's uploaded files
+    conditions = [
+        StoredFile.uploaded_by == current_user.id,
+        StoredFile.status == FileStatus.ready
+    ]
+    if file_type:
+        conditions.append(StoredFile.file_type == file_type)
+    
+    total = db.execute(select(func.count(StoredFile.id)).where(*conditions)).scalar()
+    files = db.execute(
+        select(StoredFile)
+        .where(*conditions)
+        .order_by(StoredFile.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
+    
     return {
-        "files": [],
-        "total": 0,
+        "files": [_file_response(f) for f in files],
+        "total": total,
         "page": skip // limit + 1,
-        "pages": 0
+        "pages": (total + limit - 1) // limit
     }
+
+
+@router.get("/{file_id}", response_model=FileResponse)
+def get_file(
+    file_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get file metadata."""
+    return _file_response(_get_readable_file(db, file_id, current_user))
+
+
+@router.get("/{file_id}/download")
+def download_file(
+    file_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download a file (redirects to a short-lived download URL)."""
+    return _redirect_to_download(_get_readable_file(db, file_id, current_user))
+
+
+@router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_file(
+    file_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete a file."""
+    record = _get_own_file(db, file_id, current_user, status_in=tuple(FileStatus))
+    delete_stored_file(db, record)
+
+
+@router.get("/{file_id}/metadata")
+def get_file_metadata(
+    file_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get detailed file metadata."""
+    record = _get_own_file(db, file_id, current_user, status_in=tuple(FileStatus))
+    media_info = record.media_info or {}
+    return {
+        "file_id": record.id,
+        "filename": record.filename,
+        "file_type": record.file_type,
+        "file_size": record.file_size,
+        "mime_type": record.mime_type,
+        "uploaded_at": (record.completed_at or record.created_at).isoformat(),
+        "processing_status": (record.processing_status or record.status).value,
+        "duration": record.duration_seconds,
+        "resolution": f"{media_info['width']}x{media_info['height']}" if "width" in media_info else None,
+        "bitrate": media_info.get("bitrate"),
+        "renditions": [rendition["name"] for rendition in media_info.get("renditions", [])]
+    }
+
+
+@router.post("/{file_id}/process", response_model=VideoProcessingStatus, status_code=status.HTTP_202_ACCEPTED)
+def process_file(
+    file_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Trigger file processing (e.g., video transcoding)."""
+    if current_user.role not in ['instructor', 'admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to process files"
+        )
+    
+    record = _get_readable_file(db, file_id, current_user)
+    if record.file_type != "video":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only videos can be processed"
+        )
+    if record.processing_status in (ProcessingStatus.queued, ProcessingStatus.processing):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Video is already being processed"
+        )
+    
+    video_processing.enqueue(db, record)
+    return _processing_status(record)
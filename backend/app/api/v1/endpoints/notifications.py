@@ -1,20 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter, Depends, HTTPException, status, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, func
-from typing import List
+from sqlalchemy import select, update, delete, and_
+from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
-from app.db.session import get_db
-from app.core.deps import get_current_active_user
+import json
+from app.db.session import get_db, SessionLocal
+from app.core.config import settings
+from app.core.deps import get_current_active_user, get_user_from_token
 from app.schemas.notification import (
-    NotificationCreate, NotificationResponse, NotificationPreferences
+    NotificationCreate, NotificationResponse, NotificationPreferences,
+    NotificationBroadcastCreate, NotificationBroadcastResponse
 )
-from app.db.models.notification import Notification
+from app.db.models.notification import Notification, NotificationBroadcast
 from app.db.models.user import User
+from app.services.notification_broker import (
+    get_broker, publish_notification, publish_unread_count
+)
+from app.services.notification_retention import archive_read_notifications
+from app.services.notification_broadcast import run_broadcast
+from app.services.notification_email import email_notification
+from app.services.notification_counters import (
+    get_unread_count as cached_unread_count, adjust_unread_count, reset_unread_count
+)
 
 router = APIRouter()
 
 
+def _resolve_stream_user(token: str) -> Optional[UUID]:
+    """Authenticate a streaming client without holding a session for the stream."""
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(token, db)
+        return user.id if user else None
+    finally:
+        db.close()
+
+
+def _stream_unread_count(user_id: UUID) -> int:
+    db = SessionLocal()
+    try:
+        return cached_unread_count(db, user_id)
+    finally:
+        db.close()
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @router.get("/", response_model=List[NotificationResponse])
 def get_notifications(
     skip: int = 0,
@@ -59,18 +97,79 @@ def get_unread_count(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get count of unread notifications."""
-    result = db.execute(
-        select(func.count(Notification.id))
-        .where(
-            and_(
-                Notification.user_id == current_user.id,
-                Notification.is_read == False
-            )
+    """Get count of unread notifications (served from the unread counter cache)."""
+    count = cached_unread_count(db, current_user.id)
+    return {"unread_count": count}
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: str
+):
+    """Stream new notifications and unread-count changes as Server-Sent Events.
+    
+    EventSource cannot send an Authorization header, so the access token is
+    passed as a query parameter. Clients only need to poll `/count` while
+    reconnecting.
+    """
+    user_id = await run_in_threadpool(_resolve_stream_user, token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
         )
+    
+    # Subscribe before reading the initial count so no change is missed
+    subscription = await get_broker().subscribe(user_id)
+    
+    async def event_stream():
+        try:
+            unread_count = await run_in_threadpool(_stream_unread_count, user_id)
+            yield f"retry: {settings.NOTIFICATION_STREAM_RETRY_MS}\n\n"
+            yield _sse_event("unread_count", {"unread_count": unread_count})
+            
+            while not await request.is_disconnected():
+                message = await subscription.get(settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield _sse_event(message["event"], message["data"])
+        finally:
+            await subscription.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    count = result.scalar()
-    return {"unread_count": count}
+
+
+@router.websocket("/ws")
+async def notifications_websocket(
+    websocket: WebSocket,
+    token: str
+):
+    """Push new notifications and unread-count changes over a WebSocket."""
+    user_id = await run_in_threadpool(_resolve_stream_user, token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscription = await get_broker().subscribe(user_id)
+    try:
+        unread_count = await run_in_threadpool(_stream_unread_count, user_id)
+        await websocket.send_json({"event": "unread_count", "data": {"unread_count": unread_count}})
+        
+        while True:
+            message = await subscription.get(settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+            # Heartbeats also surface dead connections, since receive is never awaited
+            await websocket.send_json(message or {"event": "ping", "data": {}})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await subscription.close()
 
 
 @router.put("/{notification_id}/read", response_model=NotificationResponse)
@@ -96,11 +195,15 @@ def mark_notification_read(
             detail="Notification not found"
         )
     
+    was_unread = not notification.is_read
     notification.is_read = True
     notification.read_at = datetime.utcnow()
     
     db.commit()
     db.refresh(notification)
+    
+    if was_unread:
+        publish_unread_count(current_user.id, adjust_unread_count(db, current_user.id, -1))
     return notification
 
 
@@ -111,21 +214,38 @@ def mark_all_read(
 ):
     """Mark all notifications as read."""
     result = db.execute(
-        select(Notification).where(
+        update(Notification)
+        .where(
             and_(
                 Notification.user_id == current_user.id,
                 Notification.is_read == False
             )
         )
+        .values(is_read=True, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
     )
-    notifications = result.scalars().all()
-    
-    for notification in notifications:
-        notification.is_read = True
-        notification.read_at = datetime.utcnow()
+    db.commit()
     
+    reset_unread_count(current_user.id)
+    publish_unread_count(current_user.id, 0)
+    return {"message": f"Marked {result.rowcount} notifications as read"}
+
+
+@router.delete("/clear-all", status_code=status.HTTP_204_NO_CONTENT)
+def clear_all_notifications(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete all notifications for current user."""
+    db.execute(
+        delete(Notification)
+        .where(Notification.user_id == current_user.id)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
-    return {"message": f"Marked {len(notifications)} notifications as read"}
+    
+    reset_unread_count(current_user.id)
+    publish_unread_count(current_user.id, 0)
 
 
 @router.delete("/{notification_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -151,25 +271,12 @@ def delete_notification(
             detail="Notification not found"
         )
     
+    was_unread = not notification.is_read
     db.delete(notification)
     db.commit()
-
-
-@router.delete("/clear-all", status_code=status.HTTP_204_NO_CONTENT)
-def clear_all_notifications(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Delete all notifications for current user."""
-    result = db.execute(
-        select(Notification).where(Notification.user_id == current_user.id)
-    )
-    notifications = result.scalars().all()
-    
-    for notification in notifications:
-        db.delete(notification)
     
-    db.commit()
+    if was_unread:
+        publish_unread_count(current_user.id, adjust_unread_count(db, current_user.id, -1))
 
 
 @router.post("/send", response_model=NotificationResponse, status_code=status.HTTP_201_CREATED)
@@ -185,22 +292,115 @@ def send_notification(
             detail="Not authorized to send notifications"
         )
     
-    notification = Notification(**notification_in.dict())
+    notification = Notification(
+        user_id=notification_in.user_id,
+        type=notification_in.notification_type,
+        title=notification_in.title,
+        message=notification_in.message,
+        data=notification_in.metadata
+    )
     db.add(notification)
     db.commit()
     db.refresh(notification)
+    
+    publish_notification(notification)
+    publish_unread_count(notification.user_id, adjust_unread_count(db, notification.user_id, 1))
+    
+    recipient = db.get(User, notification.user_id)
+    if recipient:
+        email_notification(recipient, notification.type, notification.title, notification.message)
     return notification
 
 
+@router.post(
+    "/broadcast",
+    response_model=NotificationBroadcastResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def broadcast_notification(
+    broadcast_in: NotificationBroadcastCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Send a notification to an audience (admin only).
+    
+    Delivery runs in the background; poll `/broadcasts/{id}` for progress.
+    """
+    if current_user.role not in ['admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to send notifications"
+        )
+    
+    broadcast = NotificationBroadcast(
+        created_by=current_user.id,
+        type=broadcast_in.notification_type,
+        title=broadcast_in.title,
+        message=broadcast_in.message,
+        data=broadcast_in.metadata,
+        audience=broadcast_in.audience.model_dump(mode="json", exclude_none=True)
+    )
+    db.add(broadcast)
+    db.commit()
+    db.refresh(broadcast)
+    
+    background_tasks.add_task(run_broadcast, broadcast.id)
+    return broadcast
+
+
+@router.get("/broadcasts", response_model=List[NotificationBroadcastResponse])
+def get_broadcasts(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get recent broadcasts with delivery progress (admin only)."""
+    if current_user.role not in ['admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view broadcasts"
+        )
+    
+    result = db.execute(
+        select(NotificationBroadcast)
+        .order_by(NotificationBroadcast.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.get("/broadcasts/{broadcast_id}", response_model=NotificationBroadcastResponse)
+def get_broadcast(
+    broadcast_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get delivery progress of a broadcast (admin only)."""
+    if current_user.role not in ['admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view broadcasts"
+        )
+    
+    broadcast = db.get(NotificationBroadcast, broadcast_id)
+    if not broadcast:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Broadcast not found"
+        )
+    return broadcast
+
+
 @router.get("/preferences", response_model=NotificationPreferences)
 def get_notification_preferences(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get notification preferences for current user."""
-    # For now, return default preferences
-    # In production, this would fetch from user_preferences table
-    return NotificationPreferences()
+    return NotificationPreferences(**(current_user.notification_preferences or {}))
 
 
 @router.put("/preferences", response_model=NotificationPreferences)
@@ -210,8 +410,8 @@ def update_notification_preferences(
     current_user: User = Depends(get_current_active_user)
 ):
     """Update notification preferences for current user."""
-    # For now, just return the preferences
-    # In production, this would save to user_preferences table
+    current_user.notification_preferences = preferences.model_dump()
+    db.commit()
     return preferences
 
 
@@ -244,9 +444,32 @@ def send_test_notification(
         user_id=current_user.id,
         title="Test Notification",
         message="This is a test notification from the E-Learning Platform",
-        notification_type="system"
+        type="system"
     )
     db.add(notification)
     db.commit()
     db.refresh(notification)
+    
+    publish_notification(notification)
+    publish_unread_count(current_user.id, adjust_unread_count(db, current_user.id, 1))
     return {"message": "Test notification sent", "notification_id": notification.id}
+
+
+@router.post("/archive")
+def archive_notifications(
+    retention_days: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Archive read notifications older than the retention window (admin only).
+    
+    The same job runs periodically; this triggers it on demand.
+    """
+    if current_user.role not in ['admin', 'super_admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to archive notifications"
+        )
+    
+    archived = archive_read_notifications(db, retention_days=retention_days)
+    return {"message": f"Archived {archived} notifications", "archived": archived}
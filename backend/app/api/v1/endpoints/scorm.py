@@ -1,31 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import mimetypes
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
 
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.deps import get_current_active_user, require_role
+from app.core.ranges import range_response
 from app.db.models.user import User
+from app.db.models.enrollment import Enrollment
+from app.db.models.scorm import ScormPackage
+from app.schemas.scorm import ScormCommit
+from app.services.scorm_packages import (
+    InvalidPackage, ingest_package, get_package, launch_structure, content_token, read_content_token,
+    content_url, asset_key
+)
+from app.services.scorm_runtime import InvalidCmi, start_session, get_attempt, record_commit
+from app.services.storage import get_storage
 
 router = APIRouter()
 
 
-@router.post("/scorm/upload")
+def _package_response(package: ScormPackage) -> dict:
+    return {
+        "id": str(package.id),
+        "title": package.title,
+        "version": package.version,
+        "filename": package.filename,
+        "course_id": str(package.course_id) if package.course_id else None,
+        "content_item_id": str(package.content_item_id) if package.content_item_id else None,
+        "file_count": package.file_count,
+        "total_size": package.total_size,
+        "status": "ready",
+        "uploaded_at": package.created_at.isoformat(),
+        "launch_url": f"{settings.API_V1_STR}/scorm/{package.id}/launch"
+    }
+
+
+def _get_launchable_package(db: Session, scorm_id: UUID, user_id: UUID, role: str) -> ScormPackage:
+    """The package, if the user is staff or enrolled in its course."""
+    package = get_package(db, scorm_id)
+    if package is not None and package.course_id and role not in ['instructor', 'admin', 'super_admin']:
+        enrolled = db.execute(
+            select(Enrollment.id).where(Enrollment.user_id == user_id, Enrollment.course_id == package.course_id)
+        ).first()
+        if enrolled is None:
+            package = None
+    if package is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="SCORM package not found"
+        )
+    return package
+
+
+@router.post("/scorm/upload", status_code=status.HTTP_201_CREATED)
 def upload_scorm_package(
     file: UploadFile = File(...),
     course_id: Optional[UUID] = None,
+    content_item_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role(["instructor", "admin"]))
 ):
-    """Upload a SCORM package."""
-    return {
-        "id": "scorm-1",
-        "filename": file.filename,
-        "course_id": str(course_id) if course_id else None,
-        "status": "processing",
-        "uploaded_at": datetime.utcnow().isoformat()
-    }
+    """Upload a SCORM package.
+    
+    The zip is unpacked into storage and its manifest parsed before this
+    returns; a malformed or unsafe package is rejected with 400.
+    """
+    if file.size is not None and file.size > settings.SCORM_MAX_PACKAGE_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Package exceeds the {settings.SCORM_MAX_PACKAGE_BYTES // (1024 * 1024)}MB limit"
+        )
+    try:
+        package = ingest_package(
+            db, file.file, file.filename, current_user.id,
+            course_id=course_id, content_item_id=content_item_id
+        )
+    except InvalidPackage as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return _package_response(package)
 
 
 @router.get("/scorm/{scorm_id}")
@@ -35,13 +95,7 @@ def get_scorm_package(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get SCORM package details."""
-    return {
-        "id": str(scorm_id),
-        "title": "SCORM Course Package",
-        "version": "1.2",
-        "status": "ready",
-        "launch_url": f"/scorm/{scorm_id}/launch"
-    }
+    return _package_response(_get_launchable_package(db, scorm_id, current_user.id, current_user.role))
 
 
 @router.post("/scorm/{scorm_id}/launch")
@@ -50,28 +104,91 @@ def launch_scorm_package(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Launch a SCORM package."""
+    """Launch a SCORM package.
+    
+    Returns the URL of the entry point and the package's item tree, each
+    item with its own URL; all of them work without an Authorization header.
+    Also opens the runtime session: ``session_id`` identifies it in track
+    commits and ``cmi`` holds the values the player's API starts with.
+    """
+    package = _get_launchable_package(db, scorm_id, current_user.id, current_user.role)
+    manifest = launch_structure(package)
+    token = content_token(package.id, current_user.id)
+    attempt, cmi = start_session(db, package, current_user)
     return {
-        "scorm_id": str(scorm_id),
-        "launch_url": f"https://scorm.example.com/player/{scorm_id}",
-        "session_id": "session-123"
+        "scorm_id": str(package.id),
+        "title": manifest["title"] or package.title,
+        "version": manifest["version"],
+        "launch_url": content_url(package.id, token, manifest["launch"]),
+        "items": [
+            {**item, "url": content_url(package.id, token, item["href"]) if item["href"] else None}
+            for item in manifest["items"]
+        ],
+        "session_id": str(attempt.id),
+        "cmi": cmi
     }
 
 
+@router.get("/scorm/{scorm_id}/content/{token}/{path:path}")
+def get_scorm_content(
+    scorm_id: UUID,
+    token: str,
+    path: str,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Serve a file of an unpacked SCORM package (authorised by the launch's content token)."""
+    package = get_package(db, scorm_id) if read_content_token(token, scorm_id) else None
+    key = asset_key(package, path) if package else None
+    storage = get_storage()
+    info = storage.stat(key) if key else None
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not found"
+        )
+    
+    return range_response(
+        request,
+        storage,
+        info,
+        info.content_type or mimetypes.guess_type(path)[0] or "application/octet-stream",
+        # A package never changes after upload, and the token only changes daily
+        headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
+
+
 @router.post("/scorm/{scorm_id}/track")
 def track_scorm_progress(
     scorm_id: UUID,
-    completion_status: str,
-    score: Optional[float] = None,
+    commit: ScormCommit,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Track SCORM package progress."""
+    """Commit runtime data from the player (LMSCommit / Commit).
+    
+    ``values`` holds every element set since the previous commit. They are
+    kept in the session store and persisted in the background, except when
+    the commit finishes the session or completes the content.
+    """
+    attempt = get_attempt(db, commit.session_id, scorm_id, current_user.id)
+    if attempt is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="SCORM session not found"
+        )
+    
+    try:
+        result = record_commit(db, attempt, commit.values, finish=commit.finish)
+    except InvalidCmi as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     return {
         "scorm_id": str(scorm_id),
-        "user_id": str(current_user.id),
-        "completion_status": completion_status,
-        "score": score,
+        "session_id": str(attempt.id),
+        **result,
         "tracked_at": datetime.utcnow().isoformat()
     }
 
@@ -0,0 +1,140 @@
+"""Shared key/value cache for JSON-serialisable values.
+
+Backed by Redis (``CACHE_BACKEND="redis"``) so every worker sees the same
+entries and invalidations, or by a per-process dict for tests and single
+worker setups. Cache failures are logged and treated as misses; callers
+always have the database to fall back on.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache:"
+
+
+class _RedisCache:
+    def get(self, key: str) -> Optional[str]:
+        return get_redis().get(f"{KEY_PREFIX}{key}")
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return get_redis().mget([f"{KEY_PREFIX}{key}" for key in keys])
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        get_redis().set(f"{KEY_PREFIX}{key}", value, ex=ttl)
+
+    def add(self, key: str, value: str, ttl: int) -> bool:
+        return bool(get_redis().set(f"{KEY_PREFIX}{key}", value, ex=ttl, nx=True))
+
+    def incr(self, key: str) -> int:
+        return get_redis().incr(f"{KEY_PREFIX}{key}")
+
+    def delete(self, *keys: str) -> None:
+        get_redis().delete(*(f"{KEY_PREFIX}{key}" for key in keys))
+
+
+class _MemoryCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[float, str]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            with self._lock:
+                self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl, value)
+
+    def add(self, key: str, value: str, ttl: int) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._values[key] = (time.monotonic() + ttl, value)
+            return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._values.get(key)
+            value = int(entry[1]) + 1 if entry is not None else 1
+            self._values[key] = (float("inf"), str(value))
+            return value
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+
+_backend = _RedisCache() if settings.CACHE_BACKEND == "redis" else _MemoryCache()
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the cached value, or None on a miss."""
+    try:
+        value = _backend.get(key)
+    except redis.RedisError as e:
+        logger.warning("Cache unavailable, reading %s from source: %s", key, e)
+        return None
+    return json.loads(value) if value is not None else None
+
+
+def cache_get_many(keys: List[str]) -> List[Optional[Any]]:
+    """Return the cached values in key order, None for each miss."""
+    try:
+        values = _backend.get_many(keys) if keys else []
+    except redis.RedisError as e:
+        logger.warning("Cache unavailable, reading %d keys from source: %s", len(keys), e)
+        return [None] * len(keys)
+    return [json.loads(value) if value is not None else None for value in values]
+
+
+def cache_set(key: str, value: Any, ttl: int) -> None:
+    try:
+        _backend.set(key, json.dumps(value, default=str), ttl)
+    except redis.RedisError as e:
+        logger.warning("Failed to cache %s: %s", key, e)
+
+
+def cache_add(key: str, value: Any, ttl: int) -> Optional[bool]:
+    """Set the key only if it is absent; True if it was set. None if the cache is unavailable."""
+    try:
+        return _backend.add(key, json.dumps(value, default=str), ttl)
+    except redis.RedisError as e:
+        logger.warning("Failed to cache %s: %s", key, e)
+        return None
+
+
+def cache_incr(key: str) -> Optional[int]:
+    """Increment a counter that never expires (starting from 0); None if the cache is unavailable."""
+    try:
+        return _backend.incr(key)
+    except redis.RedisError as e:
+        logger.warning("Failed to increment %s: %s", key, e)
+        return None
+
+
+def cache_delete(*keys: str) -> None:
+    if not keys:
+        return
+    try:
+        _backend.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning("Failed to invalidate %s: %s", ", ".join(keys), e)
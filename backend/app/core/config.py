@@ -23,10 +23,41 @@ class Settings(BaseSettings):
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_SECURE: bool = False
+    MINIO_BUCKET: str = "eduplatform"
+    MINIO_REGION: str = "us-east-1"
+    MINIO_PUBLIC_ENDPOINT: str = ""  # host clients use for presigned URLs; defaults to MINIO_ENDPOINT
+    
+    # Object storage ("local" for a directory on disk, "minio" for MinIO/S3)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_LOCAL_ROOT: str = "storage"
+    STORAGE_PRESIGNED_GET_SECONDS: int = 900
+    STORAGE_PRESIGNED_PUT_SECONDS: int = 3600
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Shared caches, counters and job locks ("redis" for cross-worker, "memory" for single process/tests)
+    CACHE_BACKEND: str = "redis"
+    SCHEDULER_ENABLED: bool = True
+    
+    # Response cache for public catalogue reads; entries are served for up to
+    # RESPONSE_CACHE_STALE_SECONDS past their TTL while one request refreshes them
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_STALE_SECONDS: int = 300
+    COURSE_LIST_CACHE_TTL_SECONDS: int = 60
+    COURSE_CACHE_TTL_SECONDS: int = 300
+    CATEGORY_CACHE_TTL_SECONDS: int = 3600
+    
+    # Notifications push channel ("redis" for cross-worker, "memory" for single process/tests)
+    NOTIFICATION_BROKER: str = "redis"
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: int = 15
+    NOTIFICATION_STREAM_RETRY_MS: int = 5000
+    NOTIFICATION_UNREAD_COUNTER_TTL_SECONDS: int = 86400
+    NOTIFICATION_COUNTER_RECONCILE_SECONDS: int = 300
+    NOTIFICATION_RETENTION_DAYS: int = 90
+    NOTIFICATION_ARCHIVE_BATCH_SIZE: int = 5000
+    NOTIFICATION_ARCHIVE_INTERVAL_SECONDS: int = 3600
+    
     # Email
     SMTP_HOST: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
@@ -34,6 +65,67 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     EMAILS_FROM_EMAIL: str = "noreply@eduplatform.com"
     EMAILS_FROM_NAME: str = "E-Learning Platform"
+    EMAILS_ENABLED: bool = True
+    SMTP_TLS: bool = True  # STARTTLS after connecting
+    SMTP_SSL: bool = False  # implicit TLS (port 465)
+    EMAIL_SMTP_CONNECTIONS: int = 2
+    EMAIL_DOMAIN_RATE_PER_MINUTE: int = 60
+    EMAIL_MAX_RETRIES: int = 5
+    EMAIL_RETRY_BACKOFF_SECONDS: float = 2.0
+    EMAIL_DIGEST_WINDOW_SECONDS: int = 300
+    PASSWORD_RESET_TOKEN_EXPIRE_MINUTES: int = 30
+    
+    # Certificates
+    CERTIFICATE_RENDER_WORKERS: int = 2
+    CERTIFICATE_VERIFY_CACHE_TTL_SECONDS: int = 3600
+    CERTIFICATE_VERIFY_NEGATIVE_TTL_SECONDS: int = 300
+    CERTIFICATE_VERIFY_RATE_LIMIT_PER_MINUTE: int = 60
+    
+    # Assessments
+    ASSESSMENT_CACHE_TTL_SECONDS: int = 3600
+    ASSESSMENT_AUTOSAVE_FLUSH_SECONDS: int = 10
+    ASSESSMENT_AUTOSAVE_TTL_SECONDS: int = 86400
+    ASSESSMENT_DEADLINE_GRACE_SECONDS: int = 30  # allowance for network latency on the last save/submit
+    ASSESSMENT_DEADLINE_SWEEP_SECONDS: int = 15
+    
+    # Assignments
+    ASSIGNMENT_ANALYTICS_CACHE_TTL_SECONDS: int = 300
+    
+    # Files
+    FILE_MAX_SIZE_BYTES: int = 500 * 1024 * 1024
+    FILE_UPLOAD_CHUNK_SIZE_BYTES: int = 8 * 1024 * 1024  # at least 5 MiB, MinIO's smallest multipart part
+    FILE_UPLOAD_EXPIRY_HOURS: int = 24
+    FILE_UPLOAD_CLEANUP_INTERVAL_SECONDS: int = 3600
+    # Deduplicated content: unreferenced blobs are kept this long before collection
+    BLOB_GC_GRACE_SECONDS: int = 86400
+    BLOB_GC_INTERVAL_SECONDS: int = 3600
+    
+    # Video processing (ffmpeg HLS transcoding)
+    VIDEO_FFMPEG_PATH: str = "ffmpeg"
+    VIDEO_FFPROBE_PATH: str = "ffprobe"
+    VIDEO_PROCESSING_WORKERS: int = 0  # concurrent jobs; 0 = half the CPU cores
+    VIDEO_HLS_SEGMENT_SECONDS: int = 6
+    VIDEO_PROCESSING_TIMEOUT_SECONDS: int = 7200
+    VIDEO_QUEUE_SWEEP_SECONDS: int = 60
+    
+    # Image derivatives (resized WebP/JPEG copies of uploaded images)
+    IMAGE_DERIVATIVE_WIDTHS: List[int] = [160, 320, 640, 960, 1280, 1920]
+    IMAGE_EAGER_WIDTHS: List[int] = [320, 640]  # rendered right after upload; the rest on first request
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_JPEG_QUALITY: int = 82
+    
+    # SCORM packages
+    SCORM_MAX_PACKAGE_BYTES: int = 1024 * 1024 * 1024
+    SCORM_MAX_UNPACKED_BYTES: int = 2 * 1024 * 1024 * 1024
+    SCORM_MAX_FILES: int = 20000
+    SCORM_INGEST_WORKERS: int = 8  # concurrent uploads of unpacked files to storage
+    SCORM_MANIFEST_CACHE_TTL_SECONDS: int = 3600
+    # Runtime data lives in the cache backend and is written to Postgres in deltas
+    SCORM_SESSION_TTL_SECONDS: int = 86400
+    SCORM_PERSIST_INTERVAL_SECONDS: int = 30
+    
+    # Frontend (used for links in emails)
+    FRONTEND_URL: str = "http://localhost:3000"
     
     # MeiliSearch
     MEILI_HOST: str = "http://localhost:7700"
@@ -3,7 +3,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db.session import get_db
-from app.core.security import verify_token
+from app.core.security import verify_token, is_access_token
 from app.db.models.user import User
 from typing import Optional
 
@@ -22,7 +22,7 @@ def get_current_user(
     )
     
     payload = verify_token(token)
-    if payload is None:
+    if payload is None or not is_access_token(payload):
         raise credentials_exception
     
     user_id: str = payload.get("sub")
@@ -41,6 +41,29 @@ def get_current_user(
     return user
 
 
+def get_user_from_token(token: str, db: Session) -> Optional[User]:
+    """Resolve an access token to an active user, or None if it is invalid.
+
+    Used by streaming endpoints (SSE/WebSocket) where the browser cannot send
+    an Authorization header and the token arrives as a query parameter.
+    """
+    payload = verify_token(token)
+    if payload is None or not is_access_token(payload):
+        return None
+    
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+    
+    result = db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    
+    if user is None or not user.is_active:
+        return None
+    
+    return user
+
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -0,0 +1,261 @@
+"""HTTP Range (RFC 9110) helpers for serving stored objects.
+
+Lengths come from the object's metadata, never from reading it. Local files
+are sent with the server's zero-copy (``sendfile``) extension when it offers
+one, otherwise read through a single reused buffer; other backends are
+streamed with ranged GETs. A seek in a video player therefore only costs the
+bytes it asks for.
+"""
+import calendar
+import os
+import secrets
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import Request, Response, status
+from fastapi.concurrency import iterate_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from app.core.conditional import quote_etag, etag_matches
+from app.services.storage import ObjectStorage, ObjectInfo, LocalStorage
+
+# More ranges than this in one request are answered with the whole object
+MAX_RANGES = 16
+READ_BUFFER_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a `Range` header into inclusive (start, end) pairs.
+    
+    Returns None when the header is absent or not a bytes range (serve the
+    whole object); raises RangeNotSatisfiable if no range overlaps the object.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    
+    ranges = []
+    for part in header[len("bytes="):].split(","):
+        part = part.strip()
+        if "-" not in part:
+            return None
+        first, last = part.split("-", 1)
+        try:
+            if first == "":
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if last and start > end:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return ranges
+
+
+def coalesce_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping and adjacent ranges, in ascending order."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(header: Optional[str], info: ObjectInfo) -> bool:
+    """Whether an If-Range precondition (entity tag or HTTP date) still holds."""
+    if header is None:
+        return True
+    header = header.strip()
+    if header.startswith(('"', 'W/"')):
+        # Weak tags never satisfy If-Range
+        return not header.startswith("W/") and header == quote_etag(info.etag)
+    if info.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    modified = info.last_modified.replace(microsecond=0)
+    if since.tzinfo is not None and modified.tzinfo is None:
+        since = since.replace(tzinfo=None)
+    elif since.tzinfo is None and modified.tzinfo is not None:
+        modified = modified.replace(tzinfo=None)
+    return modified == since
+
+
+def http_date(value: datetime) -> str:
+    """IMF-fixdate for a UTC datetime (naive values are taken as UTC)."""
+    return formatdate(calendar.timegm(value.utctimetuple()), usegmt=True)
+
+
+class RangeStreamResponse(StreamingResponse):
+    """Streams byte ranges of a stored object, as one body or multipart/byteranges."""
+
+    def __init__(
+        self,
+        storage: ObjectStorage,
+        info: ObjectInfo,
+        ranges: List[Tuple[int, int]],
+        media_type: str,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.storage = storage
+        self.info = info
+        self.ranges = ranges
+        self.part_media_type = media_type
+        self.boundary = secrets.token_hex(16) if len(ranges) > 1 else None
+        self.zerocopy = False
+        if self.boundary:
+            media_type = f"multipart/byteranges; boundary={self.boundary}"
+        super().__init__(
+            self._iter_body(),
+            status_code=status_code,
+            media_type=media_type,
+            headers={**(headers or {}), "Content-Length": str(self._content_length())}
+        )
+
+    def _part_header(self, start: int, end: int, first: bool) -> bytes:
+        separator = "" if first else "\r\n"
+        return (
+            f"{separator}--{self.boundary}\r\n"
+            f"Content-Type: {self.part_media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{self.info.size}\r\n\r\n"
+        ).encode()
+
+    def _closing(self) -> bytes:
+        return f"\r\n--{self.boundary}--\r\n".encode()
+
+    def _content_length(self) -> int:
+        length = sum(end - start + 1 for start, end in self.ranges)
+        if self.boundary:
+            length += sum(
+                len(self._part_header(start, end, i == 0)) for i, (start, end) in enumerate(self.ranges)
+            )
+            length += len(self._closing())
+        return length
+
+    async def _iter_local(self, f, start: int, end: int) -> AsyncIterator[bytes]:
+        # One buffer per response; each chunk is copied out because the server may hold it
+        buffer = bytearray(min(READ_BUFFER_SIZE, end - start + 1))
+        view = memoryview(buffer)
+        position = start
+        while position <= end:
+            want = min(len(buffer), end - position + 1)
+            read = await anyio.to_thread.run_sync(os.preadv, f.fileno(), [view[:want]], position)
+            if read <= 0:
+                return
+            position += read
+            yield bytes(view[:read])
+
+    async def _iter_body(self) -> AsyncIterator[bytes]:
+        local = isinstance(self.storage, LocalStorage)
+        f = await anyio.to_thread.run_sync(open, self.storage.path(self.info.key), "rb") if local else None
+        try:
+            for i, (start, end) in enumerate(self.ranges):
+                if self.boundary:
+                    yield self._part_header(start, end, i == 0)
+                if local:
+                    async for chunk in self._iter_local(f, start, end):
+                        yield chunk
+                else:
+                    async for chunk in iterate_in_threadpool(self.storage.iter_range(self.info.key, start, end)):
+                        yield chunk
+            if self.boundary:
+                yield self._closing()
+        finally:
+            if f is not None:
+                f.close()
+
+    async def _send_zerocopy(self, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        with open(self.storage.path(self.info.key), "rb") as f:
+            for i, (start, end) in enumerate(self.ranges):
+                if self.boundary:
+                    await send({
+                        "type": "http.response.body",
+                        "body": self._part_header(start, end, i == 0),
+                        "more_body": True
+                    })
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f.fileno(),
+                    "offset": start,
+                    "count": end - start + 1,
+                    "more_body": True
+                })
+        await send({"type": "http.response.body", "body": self._closing() if self.boundary else b"", "more_body": False})
+
+    async def stream_response(self, send: Send) -> None:
+        if self.zerocopy:
+            await self._send_zerocopy(send)
+        else:
+            await super().stream_response(send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.zerocopy = (
+            isinstance(self.storage, LocalStorage)
+            and "http.response.zerocopy" in scope.get("extensions", {})
+        )
+        await super().__call__(scope, receive, send)
+
+
+def range_response(
+    request: Request,
+    storage: ObjectStorage,
+    info: ObjectInfo,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serve an object honouring conditional, If-Range and (multi-)Range requests."""
+    etag = quote_etag(info.etag)
+    base_headers = {"ETag": etag, "Accept-Ranges": "bytes", **(headers or {})}
+    if info.last_modified is not None:
+        base_headers["Last-Modified"] = http_date(info.last_modified)
+    
+    if etag_matches(request.headers.get("if-none-match"), info.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=base_headers)
+    
+    ranges = None
+    if if_range_matches(request.headers.get("if-range"), info):
+        try:
+            ranges = parse_range_header(request.headers.get("range"), info.size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                headers={**base_headers, "Content-Range": f"bytes */{info.size}"}
+            )
+    
+    if ranges:
+        ranges = coalesce_ranges(ranges)
+    if not ranges or len(ranges) > MAX_RANGES:
+        # No usable range: send the whole object
+        return RangeStreamResponse(storage, info, [(0, info.size - 1)] if info.size else [], media_type,
+                                   headers=base_headers)
+    
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        base_headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    return RangeStreamResponse(
+        storage, info, ranges, media_type,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        headers=base_headers
+    )
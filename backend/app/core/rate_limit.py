@@ -0,0 +1,73 @@
+"""Fixed-window request rate limiting per client IP.
+
+Use as a route dependency::
+
+    @router.get("/verify/{code}", dependencies=[Depends(rate_limit("verify", 60))])
+
+The client address is ``request.client.host``; behind a reverse proxy run
+uvicorn with ``--proxy-headers`` so it reflects ``X-Forwarded-For``. When the
+counter store is unavailable requests are let through.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+import redis
+from fastapi import HTTPException, Request, status
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+
+
+class _RedisCounter:
+    def hit(self, key: str, window: int) -> int:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.incr(f"{KEY_PREFIX}{key}")
+        pipe.expire(f"{KEY_PREFIX}{key}", window, nx=True)
+        return pipe.execute()[0]
+
+
+class _MemoryCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Tuple[float, int]] = {}
+
+    def hit(self, key: str, window: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expires, count = self._counts.get(key, (0.0, 0))
+            if expires <= now:
+                if len(self._counts) > 10000:
+                    # Drop stale windows so the dict doesn't grow without bound
+                    self._counts = {k: v for k, v in self._counts.items() if v[0] > now}
+                expires, count = now + window, 0
+            self._counts[key] = (expires, count + 1)
+            return count + 1
+
+
+_counter = _RedisCounter() if settings.CACHE_BACKEND == "redis" else _MemoryCounter()
+
+
+def rate_limit(scope: str, limit: int, window: int = 60):
+    """Build a dependency allowing `limit` requests per `window` seconds per client IP."""
+    def dependency(request: Request) -> None:
+        client = request.client.host if request.client else "unknown"
+        window_start = int(time.time()) // window
+        try:
+            count = _counter.hit(f"{scope}:{client}:{window_start}", window)
+        except redis.RedisError as e:
+            logger.warning("Rate limiter unavailable, allowing request: %s", e)
+            return
+        if count > limit:
+            retry_after = window - int(time.time()) % window
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    return dependency
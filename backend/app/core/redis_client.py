@@ -0,0 +1,16 @@
+from functools import lru_cache
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+
+@lru_cache
+def get_redis() -> redis.Redis:
+    """Get the shared synchronous Redis client."""
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+@lru_cache
+def get_async_redis() -> aioredis.Redis:
+    """Get the shared asyncio Redis client (one per worker event loop)."""
+    return aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
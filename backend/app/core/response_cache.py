@@ -0,0 +1,245 @@
+"""Shared cache of whole responses for public, user-independent GET routes.
+
+Mark an endpoint and give its router the caching route class::
+
+    router = APIRouter(route_class=CachedRoute)
+
+    @router.get("/{course_id}")
+    @cache_response(ttl=300, tags=["course:{course_id}"])
+    def get_course(...): ...
+
+The key is the path plus the query parameters the endpoint declares, sorted,
+so parameter order and unknown cache-busting parameters don't fragment the
+cache. A hit is answered before any dependency runs (no database session is
+opened). An entry past its TTL is still served for
+``RESPONSE_CACHE_STALE_SECONDS`` while a single background request renders a
+fresh one, and concurrent misses are coalesced: one request per worker
+renders while the rest wait for it, and other workers wait on a short lock.
+
+An ETag the endpoint set (see ``app.core.conditional``) is stored with the
+entry, so hits still answer a matching ``If-None-Match`` with 304.
+
+Tags name what an entry was built from; their templates are filled from the
+path parameters. Write handlers call ``invalidate_tags`` after committing.
+Each tag has a version counter that is part of the key, so invalidation is a
+single increment and old entries are never served again.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from app.core.cache import cache_get, cache_get_many, cache_set, cache_add, cache_incr, cache_delete
+from app.core.conditional import CACHE_CONTROL, etag_matches
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "response:"
+TAG_PREFIX = "response-tag:"
+LOCK_PREFIX = "response-lock:"
+LOCK_SECONDS = 10
+LOCK_POLL_SECONDS = 0.05
+# Set on the scope of the internal request that refreshes a stale entry
+REFRESH_SCOPE_KEY = "response_cache.refresh"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: int
+    tags: Tuple[str, ...]
+
+
+def cache_response(ttl: int, tags: Sequence[str] = ()):
+    """Mark an endpoint's responses as cacheable for ``ttl`` seconds under ``tags``."""
+    def decorator(func):
+        func.__response_cache__ = CachePolicy(ttl, tuple(tags))
+        return func
+    return decorator
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Make every cached response built under any of these tags unreachable."""
+    for tag in tags:
+        if cache_incr(f"{TAG_PREFIX}{tag}") is None:
+            logger.warning("Cached responses tagged %s may be served until they expire", tag)
+
+
+# Requests rendering a key in this worker, and keys being refreshed in the background
+_inflight: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+_refreshing: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _base_key(request: Request, query_names: Set[str]) -> str:
+    query = sorted(
+        (name, value) for name, value in request.query_params.multi_items()
+        if name in query_names and value != ""
+    )
+    return f"{request.url.path}?{urlencode(query)}"
+
+
+def _lookup(base_key: str, tags: List[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    versions = cache_get_many([f"{TAG_PREFIX}{tag}" for tag in tags])
+    versioned = base_key + "#" + ",".join(str(version or 0) for version in versions)
+    key = KEY_PREFIX + hashlib.sha256(versioned.encode()).hexdigest()
+    return key, cache_get(key)
+
+
+def _entry(response: Response) -> Optional[Dict[str, Any]]:
+    if response.status_code != 200 or not hasattr(response, "body"):
+        return None
+    try:
+        body = response.body.decode()
+    except UnicodeDecodeError:
+        return None
+    return {
+        "body": body,
+        "media_type": response.media_type,
+        "etag": response.headers.get("etag"),
+        "stored_at": time.time()
+    }
+
+
+def _response(request: Request, entry: Dict[str, Any], state: str) -> Response:
+    headers = {"X-Cache": state}
+    etag = entry.get("etag")
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type=entry["media_type"], headers=headers)
+
+
+async def _store(key: str, response: Response, policy: CachePolicy) -> Optional[Dict[str, Any]]:
+    entry = _entry(response)
+    if entry is not None:
+        await run_in_threadpool(cache_set, key, entry, policy.ttl + settings.RESPONSE_CACHE_STALE_SECONDS)
+    return entry
+
+
+async def _wait_for_entry(key: str) -> Optional[Dict[str, Any]]:
+    """Wait for another worker holding the render lock to store the entry."""
+    deadline = time.monotonic() + LOCK_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        entry = await run_in_threadpool(cache_get, key)
+        if entry is not None:
+            return entry
+        if await run_in_threadpool(cache_get, f"{LOCK_PREFIX}{key}") is None:
+            return None
+    return None
+
+
+async def _render(
+    request: Request,
+    handler: Callable[[Request], Awaitable[Response]],
+    key: str,
+    policy: CachePolicy
+) -> Response:
+    """Render a missing entry once per worker, and once across workers where possible."""
+    future = _inflight.get(key)
+    if future is not None:
+        entry = await asyncio.shield(future)
+        return _response(request, entry, "HIT") if entry is not None else await handler(request)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    entry = None
+    locked = False
+    try:
+        # None means the cache is down: render without waiting on anyone
+        locked = await run_in_threadpool(cache_add, f"{LOCK_PREFIX}{key}", 1, LOCK_SECONDS) is not False
+        if not locked:
+            entry = await _wait_for_entry(key)
+            if entry is not None:
+                return _response(request, entry, "HIT")
+        response = await handler(request)
+        entry = await _store(key, response, policy)
+        if entry is not None:
+            response.headers["X-Cache"] = "MISS"
+        return response
+    finally:
+        del _inflight[key]
+        future.set_result(entry)
+        if locked:
+            await run_in_threadpool(cache_delete, f"{LOCK_PREFIX}{key}")
+
+
+def _refresh_in_background(request: Request, key: str) -> None:
+    """Re-request the URL internally with the refresh flag; its handler stores the new entry."""
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+
+    async def refresh() -> None:
+        scope = {
+            key_: value for key_, value in request.scope.items()
+            if not key_.startswith("fastapi_") and key_ not in ("route", "endpoint", "path_params")
+        }
+        # The client's validators would turn the refresh into a bodiless 304
+        scope["headers"] = [
+            (name, value) for name, value in request.scope["headers"]
+            if name not in (b"if-none-match", b"if-modified-since")
+        ]
+        scope[REFRESH_SCOPE_KEY] = key
+
+        async def receive() -> Dict[str, Any]:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: Dict[str, Any]) -> None:
+            pass
+
+        try:
+            if await run_in_threadpool(cache_add, f"{LOCK_PREFIX}{key}", 1, LOCK_SECONDS) is False:
+                return
+            try:
+                await request.app(scope, receive, send)
+            finally:
+                await run_in_threadpool(cache_delete, f"{LOCK_PREFIX}{key}")
+        except Exception:
+            logger.exception("Refreshing cached response for %s failed", request.url.path)
+        finally:
+            _refreshing.discard(key)
+
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+class CachedRoute(APIRoute):
+    """Route class that serves endpoints marked with ``cache_response`` from the response cache."""
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+        policy: Optional[CachePolicy] = getattr(self.endpoint, "__response_cache__", None)
+        if policy is None:
+            return handler
+        query_names = {param.alias for param in self.dependant.query_params}
+
+        async def cached_handler(request: Request) -> Response:
+            if request.method != "GET" or not settings.RESPONSE_CACHE_ENABLED:
+                return await handler(request)
+
+            refresh_key = request.scope.get(REFRESH_SCOPE_KEY)
+            if refresh_key is not None:
+                response = await handler(request)
+                await _store(refresh_key, response, policy)
+                return response
+
+            tags = [tag.format(**request.path_params) for tag in policy.tags]
+            key, entry = await run_in_threadpool(_lookup, _base_key(request, query_names), tags)
+            if entry is None:
+                return await _render(request, handler, key, policy)
+            if time.time() - entry["stored_at"] < policy.ttl:
+                return _response(request, entry, "HIT")
+            _refresh_in_background(request, key)
+            return _response(request, entry, "STALE")
+
+        return cached_handler
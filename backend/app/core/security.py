@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Optional, Any
+import hashlib
 import jwt
 import bcrypt
 from app.core.config import settings
 
+PASSWORD_RESET_AUDIENCE = "password_reset"
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
@@ -26,6 +29,11 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def is_access_token(payload: dict) -> bool:
+    """Whether verified claims belong to an access token (not a refresh or any other token)."""
+    return payload.get("type", "access") == "access"
+
+
 def get_password_hash(password: str) -> str:
     """Hash a password."""
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -34,3 +42,48 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _password_fingerprint(password_hash: str) -> str:
+    # Changes whenever the password does, so a reset token works only once
+    return hashlib.sha256(password_hash.encode('utf-8')).hexdigest()[:16]
+
+
+def create_password_reset_token(user_id: Any, password_hash: str) -> str:
+    """Create a short-lived, single-use password reset token.
+
+    It carries its own audience, so ``verify_token`` rejects it and it can
+    never be used as a bearer token.
+    """
+    expire = datetime.utcnow() + timedelta(minutes=settings.PASSWORD_RESET_TOKEN_EXPIRE_MINUTES)
+    return jwt.encode(
+        {
+            "sub": str(user_id),
+            "type": "password_reset",
+            "pwd": _password_fingerprint(password_hash),
+            "aud": PASSWORD_RESET_AUDIENCE,
+            "exp": expire
+        },
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def verify_password_reset_token(token: str, password_hash_lookup) -> Optional[str]:
+    """Return the user id for a valid reset token, or None.
+    
+    `password_hash_lookup` maps a user id to that user's current password hash.
+    """
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM], audience=PASSWORD_RESET_AUDIENCE
+        )
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get("type") != "password_reset":
+        return None
+    user_id = payload.get("sub")
+    password_hash = password_hash_lookup(user_id)
+    if password_hash is None or payload.get("pwd") != _password_fingerprint(password_hash):
+        return None
+    return user_id
@@ -0,0 +1,59 @@
+"""Fast JSON encoding for responses built from trusted, already-shaped data.
+
+A handler that returns plain dicts and lists without a ``response_model``
+goes through ``jsonable_encoder``, which walks every value in Python, and is
+then encoded with the stdlib ``json``. A handler whose data is already in
+response shape (e.g. dicts from ``model_dump(mode="json")`` held in a cache)
+would still be validated against its ``response_model`` again. For large
+payloads both cost far more than the query. ``json_response`` skips them: it
+encodes the content with orjson straight to bytes. UUIDs, datetimes, dates
+and enums are encoded natively, exactly as their ``str()``/``isoformat()``.
+Decimals become numbers exactly as ``jsonable_encoder`` makes them: an int
+when the exponent is at least 0, else a float. (A Pydantic ``response_model``
+would render them as strings.)
+
+Routes with a ``response_model`` and model instances don't need this:
+FastAPI already serialises those to bytes in Pydantic's core. Keep the
+``response_model`` on routes that use ``json_response`` for the docs.
+"""
+from decimal import Decimal
+from typing import Any, Mapping, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        # As fastapi.encoders.decimal_encoder
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None
+) -> FastJSONResponse:
+    """Encode trusted content as the response, bypassing FastAPI's encoder and response validation.
+
+    Headers set on an injected ``Response`` don't apply to a returned
+    response, so pass any (e.g. ``ConditionalRequest.headers``) here.
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -4,11 +4,13 @@ from app.db.models.enrollment import Enrollment, EnrollmentStatus, ContentProgre
 from app.db.models.assessment import Assessment, Question, QuestionType, AssessmentAttempt
 from app.db.models.assignment import Assignment, AssignmentSubmission
 from app.db.models.discussion import Discussion, DiscussionReply, DiscussionUpvote
-from app.db.models.certificate import Certificate
-from app.db.models.notification import Notification
+from app.db.models.certificate import Certificate, CertificateBatch, CertificateBatchStatus
+from app.db.models.notification import Notification, NotificationArchive, NotificationBroadcast, BroadcastStatus
 from app.db.models.learning_path import LearningPath, LearningPathCourse, LearningPathEnrollment, UserLearningPath
 from app.db.models.department import Department
 from app.db.models.note import Note
+from app.db.models.file import StoredFile, FileStatus, ProcessingStatus, Blob
+from app.db.models.scorm import ScormPackage, ScormAttempt
 
 __all__ = [
     "User",
@@ -32,11 +34,22 @@ __all__ = [
     "DiscussionReply",
     "DiscussionUpvote",
     "Certificate",
+    "CertificateBatch",
+    "CertificateBatchStatus",
     "Notification",
+    "NotificationArchive",
+    "NotificationBroadcast",
+    "BroadcastStatus",
     "LearningPath",
     "LearningPathCourse",
     "LearningPathEnrollment",
     "UserLearningPath",
     "Department",
     "Note",
+    "StoredFile",
+    "FileStatus",
+    "ProcessingStatus",
+    "Blob",
+    "ScormPackage",
+    "ScormAttempt",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Numeric, Enum
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Numeric, Enum, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.db.base_class import Base
 import uuid
@@ -51,6 +51,18 @@ class Question(Base):
 
 class AssessmentAttempt(Base):
     __tablename__ = "assessment_attempts"
+    __table_args__ = (
+        # Attempt numbers are allocated with INSERT ... SELECT max + 1; this makes concurrent starts safe
+        UniqueConstraint(
+            "assessment_id", "user_id", "attempt_number", name="uq_assessment_attempts_user_attempt"
+        ),
+        # Lets the deadline sweep find expired open attempts without scanning submitted ones
+        Index(
+            "ix_assessment_attempts_open_deadline", "deadline_at",
+            postgresql_where=text("submitted_at IS NULL")
+        ),
+        Index("ix_assessment_attempts_assessment_graded", "assessment_id", "graded_at"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     assessment_id = Column(UUID(as_uuid=True), ForeignKey("assessments.id"))
@@ -59,6 +71,11 @@ class AssessmentAttempt(Base):
     score = Column(Numeric(5, 2))
     passed = Column(Boolean, default=False)
     answers = Column(JSONB)
+    grading = Column(JSONB)  # per-question points, manual marks and answer key version
+    needs_manual_grading = Column(Boolean, default=False, nullable=False, server_default="false")
+    graded_at = Column(DateTime)  # last time grading was written; item analysis refreshes from here
+    question_times = Column(JSONB)  # cumulative seconds per question, as reported by the client
     started_at = Column(DateTime, default=datetime.utcnow)
+    deadline_at = Column(DateTime)  # set at start from time_limit_minutes / available_until
     submitted_at = Column(DateTime)
     time_taken_seconds = Column(Integer)
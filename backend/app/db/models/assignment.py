@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from app.db.base_class import Base
 import uuid
@@ -23,6 +23,13 @@ class Assignment(Base):
 
 class AssignmentSubmission(Base):
     __tablename__ = "assignment_submissions"
+    __table_args__ = (
+        # Covers the analytics aggregate, so it is answered from the index alone
+        Index(
+            "ix_assignment_submissions_assignment_submitted", "assignment_id", "submitted_at",
+            postgresql_include=["user_id", "score", "graded_at"]
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     assignment_id = Column(UUID(as_uuid=True), ForeignKey("assignments.id"))
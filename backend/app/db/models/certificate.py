@@ -1,12 +1,31 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, Text, Index, Sequence, Enum, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.db.base_class import Base
 import uuid
 from datetime import datetime
+import enum
+
+
+# Source of certificate numbers; allocated in blocks by the issuance service
+certificate_number_seq = Sequence("certificate_number_seq", metadata=Base.metadata)
+
+
+class CertificateBatchStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
 
 
 class Certificate(Base):
     __tablename__ = "certificates"
+    __table_args__ = (
+        # At most one active certificate per enrollment; revoked ones may be reissued
+        Index(
+            "uq_certificates_enrollment_active", "enrollment_id",
+            unique=True, postgresql_where=text("NOT is_revoked")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -21,3 +40,19 @@ class Certificate(Base):
     certificate_url = Column(String(500))
     is_revoked = Column(Boolean, default=False)
     cert_metadata = Column(JSONB)  # Renamed from 'metadata' to avoid SQLAlchemy reserved word
+
+
+class CertificateBatch(Base):
+    """A background bulk-issuance run for one course."""
+    __tablename__ = "certificate_batches"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    course_id = Column(UUID(as_uuid=True), ForeignKey("courses.id"))
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    status = Column(Enum(CertificateBatchStatus), default=CertificateBatchStatus.pending)
+    total_enrollments = Column(Integer, default=0)
+    issued_count = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
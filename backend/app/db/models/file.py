@@ -0,0 +1,76 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Enum, Index, Text, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.db.base_class import Base
+import uuid
+from datetime import datetime
+import enum
+
+
+class FileStatus(str, enum.Enum):
+    uploading = "uploading"
+    ready = "ready"
+    failed = "failed"
+
+
+class ProcessingStatus(str, enum.Enum):
+    queued = "queued"
+    processing = "processing"
+    completed = "completed"
+    failed = "failed"
+
+
+class Blob(Base):
+    """Deduplicated file content, stored once under ``storage_key`` and shared by every file with this hash."""
+    __tablename__ = "blobs"
+    __table_args__ = (
+        # Lets garbage collection find unreferenced blobs without scanning the rest
+        Index("ix_blobs_orphaned", "orphaned_at", postgresql_where=text("ref_count <= 0")),
+    )
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_key = Column(String(500), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # When the last reference went away; collected after BLOB_GC_GRACE_SECONDS
+    orphaned_at = Column(DateTime)
+
+
+class StoredFile(Base):
+    """An uploaded file; the bytes live in object storage under ``storage_key``."""
+    __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_uploaded_by_type", "uploaded_by", "file_type", "created_at"),
+        # Lets the processing sweep find pending jobs without scanning every file
+        Index(
+            "ix_files_processing_pending", "processing_status",
+            postgresql_where=text("processing_status IN ('queued', 'processing')")
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    filename = Column(String(255), nullable=False)
+    file_type = Column(String(50), nullable=False)
+    folder = Column(String(255))
+    mime_type = Column(String(255))
+    file_size = Column(BigInteger, default=0)
+    storage_key = Column(String(500), nullable=False)
+    # Set once the content is in the blob store; storage_key then points at the blob
+    content_hash = Column(String(64), ForeignKey("blobs.sha256"), index=True)
+    status = Column(Enum(FileStatus), default=FileStatus.uploading)
+    # Resumable uploads: received chunk index -> size in bytes
+    chunk_size = Column(Integer)
+    total_chunks = Column(Integer)
+    received_chunks = Column(JSONB, default=dict)
+    # Video transcoding: progress in percent; renditions, thumbnails and probe results in media_info
+    processing_status = Column(Enum(ProcessingStatus))
+    processing_progress = Column(Integer, default=0)
+    processing_error = Column(Text)
+    processing_started_at = Column(DateTime)
+    duration_seconds = Column(Integer)
+    media_info = Column(JSONB)
+    # Image derivatives: "<width>.<format>" -> SHA-256 of the rendered bytes
+    derivatives = Column(JSONB)
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
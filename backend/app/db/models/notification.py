@@ -1,12 +1,23 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Index, Enum
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.db.base_class import Base
 import uuid
 from datetime import datetime
+import enum
+
+
+class BroadcastStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
 
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_is_read", "user_id", "is_read"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -17,3 +28,47 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     read_at = Column(DateTime)
+
+
+class NotificationArchive(Base):
+    """Read notifications moved out of the hot table by the retention job.
+    
+    Range-partitioned by month on `created_at`; partitions are created on
+    demand by `app.services.notification_retention`.
+    """
+    __tablename__ = "notifications_archive"
+    __table_args__ = (
+        Index("ix_notifications_archive_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    user_id = Column(UUID(as_uuid=True))
+    type = Column(String(50), nullable=False)
+    title = Column(String(255), nullable=False)
+    message = Column(Text)
+    data = Column(JSONB)
+    is_read = Column(Boolean, default=True)
+    read_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class NotificationBroadcast(Base):
+    """A notification fanned out to an audience by a background job."""
+    __tablename__ = "notification_broadcasts"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    type = Column(String(50), nullable=False)
+    title = Column(String(255), nullable=False)
+    message = Column(Text)
+    data = Column(JSONB)
+    audience = Column(JSONB, nullable=False)
+    status = Column(Enum(BroadcastStatus), default=BroadcastStatus.pending)
+    total_recipients = Column(Integer, default=0)
+    delivered_count = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Numeric, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.db.base_class import Base
+import uuid
+from datetime import datetime
+
+
+class ScormPackage(Base):
+    """An uploaded SCORM package, unpacked in object storage under ``storage_prefix``."""
+    __tablename__ = "scorm_packages"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    course_id = Column(UUID(as_uuid=True), ForeignKey("courses.id", ondelete="SET NULL"), index=True)
+    # The content item learners open the package from; its progress tracks the package's
+    content_item_id = Column(UUID(as_uuid=True), ForeignKey("content_items.id", ondelete="SET NULL"), index=True)
+    title = Column(String(255))
+    version = Column(String(10))  # "1.2" or "2004"
+    filename = Column(String(255), nullable=False)
+    storage_prefix = Column(String(255), nullable=False)
+    # Compact launch structure parsed from imsmanifest.xml at ingestion
+    manifest = Column(JSONB)
+    file_count = Column(Integer, default=0)
+    total_size = Column(BigInteger, default=0)
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScormAttempt(Base):
+    """A learner's runtime (CMI) data for a package, persisted from the fast session store."""
+    __tablename__ = "scorm_attempts"
+    __table_args__ = (
+        UniqueConstraint("package_id", "user_id", name="uq_scorm_attempts_package_user"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    package_id = Column(UUID(as_uuid=True), ForeignKey("scorm_packages.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Flat element -> value map, e.g. {"cmi.core.lesson_status": "completed"}
+    cmi = Column(JSONB, default=dict)
+    lesson_status = Column(String(20))
+    score_raw = Column(Numeric(7, 2))
+    total_time_seconds = Column(Integer, default=0)
+    launch_count = Column(Integer, default=0)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Boolean, DateTime, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 import uuid
@@ -28,6 +28,7 @@ class User(Base):
     department = Column(String(100))
     job_title = Column(String(100))
     profile_image_url = Column(String(500))
+    notification_preferences = Column(JSONB)
     is_active = Column(Boolean, default=True)
     email_verified = Column(Boolean, default=False)
     last_login = Column(DateTime)
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -5,14 +6,30 @@ from app.api.v1.router import api_router
 from app.core.config import settings
 from app.db.session import engine
 from app.db.base_class import Base
+from app.services import scheduler, certificate_render, video_processing
+from app.services.email import mail_queue
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Periodic jobs are registered when the endpoint modules are imported
+    scheduler.start()
+    mail_queue.start()
+    yield
+    await mail_queue.stop()
+    await scheduler.stop()
+    certificate_render.shutdown()
+    video_processing.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS middleware
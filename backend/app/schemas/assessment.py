@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from uuid import UUID
 from decimal import Decimal
@@ -87,6 +87,22 @@ class AssessmentAttemptCreate(BaseModel):
 
 class AssessmentSubmission(BaseModel):
     answers: dict
+    time_spent: Optional[Dict[str, float]] = None  # cumulative seconds per question
+
+
+class AutosaveRequest(BaseModel):
+    answers: dict = {}
+    time_spent: Optional[Dict[str, float]] = None  # cumulative seconds per question
+
+
+class AutosaveResponse(BaseModel):
+    saved: int
+    deadline_at: Optional[datetime] = None
+    seconds_remaining: Optional[int] = None
+
+
+class ManualGradeSubmission(BaseModel):
+    points: Dict[str, Decimal]
 
 
 class AssessmentAttemptResponse(BaseModel):
@@ -96,10 +112,53 @@ class AssessmentAttemptResponse(BaseModel):
     attempt_number: int
     score: Optional[Decimal] = None
     passed: bool
+    needs_manual_grading: bool = False
     answers: dict
     started_at: datetime
+    deadline_at: Optional[datetime] = None
     submitted_at: Optional[datetime] = None
     time_taken_seconds: Optional[int] = None
     
     class Config:
         from_attributes = True
+
+
+class AssessmentAttemptStart(AssessmentAttemptResponse):
+    questions: List[QuestionResponse] = []
+
+
+class AssessmentAttemptGrading(AssessmentAttemptResponse):
+    grading: Optional[dict] = None
+
+
+class RegradeResult(BaseModel):
+    regraded: int
+    changed: int
+
+
+class DistractorCount(BaseModel):
+    count: int
+    correct: bool
+
+
+class QuestionStatistics(BaseModel):
+    question_id: UUID
+    scoring: str
+    responses: int = 0
+    pending_manual: int = 0
+    p_value: Optional[float] = None
+    discrimination_index: Optional[float] = None
+    item_rest_correlation: Optional[float] = None
+    mean_time_seconds: Optional[float] = None
+    median_time_seconds: Optional[float] = None
+    distractors: Dict[str, DistractorCount] = {}
+    omitted: Optional[int] = None
+
+
+class ItemAnalysisResponse(BaseModel):
+    assessment_id: UUID
+    answer_key_version: str
+    attempts: int
+    mean_score: Optional[float] = None
+    questions: List[QuestionStatistics] = []
+    computed_at: datetime
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
@@ -54,6 +54,19 @@ class AssignmentGrade(BaseModel):
     feedback: Optional[str] = None
 
 
+class AssignmentBulkGradeItem(AssignmentGrade):
+    submission_id: UUID
+
+
+class AssignmentBulkGrade(BaseModel):
+    grades: List[AssignmentBulkGradeItem] = Field(..., min_length=1, max_length=1000)
+
+
+class AssignmentBulkGradeResult(BaseModel):
+    graded: int
+    graded_at: datetime
+
+
 class AssignmentSubmissionResponse(BaseModel):
     id: UUID
     assignment_id: UUID
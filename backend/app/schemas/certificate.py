@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
@@ -12,7 +12,7 @@ class CertificateBase(BaseModel):
 
 class CertificateCreate(BaseModel):
     enrollment_id: UUID
-    template_id: Optional[UUID] = None
+    template_id: Optional[str] = None
 
 
 class CertificateResponse(CertificateBase):
@@ -43,3 +43,27 @@ class CertificateTemplate(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class CertificateBatchResponse(BaseModel):
+    id: UUID
+    course_id: UUID
+    status: str
+    total_enrollments: int = 0
+    issued_count: int = 0
+    progress_percentage: float = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def compute_progress(self):
+        if self.total_enrollments:
+            self.progress_percentage = round(self.issued_count * 100 / self.total_enrollments, 2)
+        elif self.status == "completed":
+            self.progress_percentage = 100
+        return self
+
+    class Config:
+        from_attributes = True
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 from app.db.models.course import CourseStatus, ContentType
+from app.services.image_derivatives import srcset_for_url
 
 
 class CategoryBase(BaseModel):
@@ -77,6 +78,12 @@ class CourseResponse(CourseBase):
     created_at: datetime
     updated_at: datetime
     published_at: Optional[datetime] = None
+    thumbnail_srcset: Optional[str] = None
+
+    @model_validator(mode="after")
+    def compute_thumbnail_srcset(self):
+        self.thumbnail_srcset = srcset_for_url(self.thumbnail_url)
+        return self
 
     class Config:
         from_attributes = True
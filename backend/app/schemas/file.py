@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -20,6 +20,7 @@ class FileResponse(FileBase):
     id: UUID
     file_path: str
     file_url: str
+    srcset: Optional[str] = None  # images: resized copies for <img srcset>
     uploaded_by: UUID
     uploaded_at: datetime
     
@@ -27,12 +28,41 @@ class FileResponse(FileBase):
         from_attributes = True
 
 
+class FileUploadCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    file_type: str  # video, document, image, etc.
+    file_size: int = Field(..., gt=0)
+    folder: Optional[str] = None
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")  # skips the upload if already stored
+
+
+class FileUploadStatus(BaseModel):
+    id: UUID
+    filename: str
+    file_type: str
+    file_size: int
+    status: str
+    chunk_size: Optional[int] = None  # None when the content was already stored
+    total_chunks: Optional[int] = None
+    received_chunks: List[int]
+
+
+class FilePresignedUpload(BaseModel):
+    id: UUID
+    status: str  # "ready" when the content was already stored and there is nothing to PUT
+    upload_url: Optional[str] = None
+    method: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
 class VideoProcessingStatus(BaseModel):
     file_id: UUID
-    status: str  # processing, completed, failed
+    status: str  # not_started, queued, processing, completed, failed
     progress: int
     thumbnail_url: Optional[str] = None
     duration: Optional[int] = None
+    hls_url: Optional[str] = None
+    error: Optional[str] = None
     
     class Config:
         from_attributes = True
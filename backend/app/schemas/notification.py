@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, AliasChoices, model_validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from uuid import UUID
 
@@ -17,6 +17,11 @@ class NotificationCreate(NotificationBase):
 
 
 class NotificationResponse(NotificationBase):
+    # The ORM model stores these as `type` and `data`
+    notification_type: str = Field(validation_alias=AliasChoices("notification_type", "type"))
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None, validation_alias=AliasChoices("data", "metadata")
+    )
     id: UUID
     user_id: UUID
     is_read: bool
@@ -38,3 +43,47 @@ class NotificationPreferences(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class BroadcastAudience(BaseModel):
+    """Recipients of a broadcast; all given selectors must match."""
+    roles: Optional[List[str]] = None
+    departments: Optional[List[str]] = None
+    course_id: Optional[UUID] = None
+    learning_path_id: Optional[UUID] = None
+
+    @model_validator(mode="after")
+    def require_selector(self):
+        if not (self.roles or self.departments or self.course_id or self.learning_path_id):
+            raise ValueError("At least one audience selector is required")
+        return self
+
+
+class NotificationBroadcastCreate(NotificationBase):
+    audience: BroadcastAudience
+
+
+class NotificationBroadcastResponse(BaseModel):
+    id: UUID
+    title: str
+    notification_type: str = Field(validation_alias=AliasChoices("notification_type", "type"))
+    audience: Dict[str, Any]
+    status: str
+    total_recipients: int = 0
+    delivered_count: int = 0
+    progress_percentage: float = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def compute_progress(self):
+        if self.total_recipients:
+            self.progress_percentage = round(self.delivered_count * 100 / self.total_recipients, 2)
+        elif self.status == "completed":
+            self.progress_percentage = 100
+        return self
+
+    class Config:
+        from_attributes = True
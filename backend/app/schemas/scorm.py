@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from uuid import UUID
+from typing import Dict
+
+
+class ScormCommit(BaseModel):
+    """A batch of CMI values set since the player's last commit."""
+    session_id: UUID
+    values: Dict[str, str] = Field(default_factory=dict, max_length=1000)
+    finish: bool = False  # LMSFinish / Terminate: persist now and add the session time
@@ -1,8 +1,9 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
 from app.db.models.user import UserRole
+from app.services.image_derivatives import srcset_for_url
 
 
 class UserBase(BaseModel):
@@ -31,10 +32,16 @@ class UserResponse(UserBase):
     id: UUID
     role: UserRole
     profile_image_url: Optional[str] = None
+    profile_image_srcset: Optional[str] = None
     is_active: bool
     email_verified: bool
     created_at: datetime
     
+    @model_validator(mode="after")
+    def compute_profile_image_srcset(self):
+        self.profile_image_srcset = srcset_for_url(self.profile_image_url)
+        return self
+    
     class Config:
         from_attributes = True
 
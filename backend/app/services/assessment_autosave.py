@@ -0,0 +1,256 @@
+"""Autosave of in-progress assessment answers.
+
+Clients send answer deltas as learners work, optionally with the cumulative
+seconds spent on each question. Both are merged into a per-attempt hash in
+Redis (or process memory), and the attempt is marked dirty; a periodic job
+writes dirty attempts to ``answers``/``question_times`` in batches with a
+JSONB merge. Saving therefore costs no database write, and
+a dropped connection loses at most the last flush interval, while Redis
+keeps everything saved since.
+
+The hash is cumulative until the attempt is submitted, so flushing it more
+than once is harmless and a delta saved mid-flush is picked up next time.
+"""
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import redis
+from sqlalchemy import select, update, bindparam, func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from app.core.cache import cache_get, cache_set, cache_delete
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.session import SessionLocal
+from app.db.models.assessment import AssessmentAttempt
+from app.services.scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "assessments:autosave:"
+META_PREFIX = "assessments:attempt:"
+DIRTY_KEY = "assessments:autosave:dirty"
+ANSWER_FIELD = "a:"
+TIME_FIELD = "t:"
+FLUSH_BATCH_SIZE = 500
+
+
+def _fields(answers: Dict[str, Any], times: Dict[str, float]) -> Dict[str, Any]:
+    """Answers and per-question times share one hash, told apart by prefix."""
+    return {
+        **{f"{ANSWER_FIELD}{qid}": value for qid, value in answers.items()},
+        **{f"{TIME_FIELD}{qid}": value for qid, value in times.items()}
+    }
+
+
+def _split(fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    answers, times = {}, {}
+    for name, value in fields.items():
+        if name.startswith(ANSWER_FIELD):
+            answers[name[len(ANSWER_FIELD):]] = value
+        elif name.startswith(TIME_FIELD):
+            times[name[len(TIME_FIELD):]] = value
+    return answers, times
+
+
+class _RedisAutosaveStore:
+    def save(self, attempt_id: str, fields: Dict[str, Any]) -> None:
+        key = f"{KEY_PREFIX}{attempt_id}"
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(key, mapping={name: json.dumps(value) for name, value in fields.items()})
+        pipe.expire(key, settings.ASSESSMENT_AUTOSAVE_TTL_SECONDS)
+        pipe.sadd(DIRTY_KEY, attempt_id)
+        pipe.execute()
+
+    def load(self, attempt_id: str) -> Dict[str, Any]:
+        values = get_redis().hgetall(f"{KEY_PREFIX}{attempt_id}")
+        return {name: json.loads(value) for name, value in values.items()}
+
+    def load_many(self, attempt_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        pipe = get_redis().pipeline(transaction=False)
+        for attempt_id in attempt_ids:
+            pipe.hgetall(f"{KEY_PREFIX}{attempt_id}")
+        return {
+            attempt_id: {name: json.loads(value) for name, value in values.items()}
+            for attempt_id, values in zip(attempt_ids, pipe.execute())
+        }
+
+    def pop_dirty(self, count: int) -> List[str]:
+        return get_redis().spop(DIRTY_KEY, count) or []
+
+    def mark_dirty(self, attempt_ids: Iterable[str]) -> None:
+        attempt_ids = list(attempt_ids)
+        if attempt_ids:
+            get_redis().sadd(DIRTY_KEY, *attempt_ids)
+
+    def discard(self, attempt_ids: List[str]) -> None:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(*(f"{KEY_PREFIX}{attempt_id}" for attempt_id in attempt_ids))
+        pipe.srem(DIRTY_KEY, *attempt_ids)
+        pipe.execute()
+
+
+class _MemoryAutosaveStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fields: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+
+    def save(self, attempt_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self._fields.setdefault(attempt_id, {}).update(fields)
+            self._dirty.add(attempt_id)
+
+    def load(self, attempt_id: str) -> Dict[str, Any]:
+        return dict(self._fields.get(attempt_id, {}))
+
+    def load_many(self, attempt_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {attempt_id: self.load(attempt_id) for attempt_id in attempt_ids}
+
+    def pop_dirty(self, count: int) -> List[str]:
+        with self._lock:
+            popped = [self._dirty.pop() for _ in range(min(count, len(self._dirty)))]
+        return popped
+
+    def mark_dirty(self, attempt_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._dirty.update(attempt_ids)
+
+    def discard(self, attempt_ids: List[str]) -> None:
+        with self._lock:
+            for attempt_id in attempt_ids:
+                self._fields.pop(attempt_id, None)
+                self._dirty.discard(attempt_id)
+
+
+_store = _RedisAutosaveStore() if settings.CACHE_BACKEND == "redis" else _MemoryAutosaveStore()
+
+
+def get_open_attempt_meta(db: Session, assessment_id: UUID, attempt_id: UUID) -> Optional[Dict[str, Any]]:
+    """Owner and deadline of an open attempt, cached so autosaves don't hit the database."""
+    key = f"{META_PREFIX}{attempt_id}"
+    meta = cache_get(key)
+    if meta is None:
+        row = db.execute(
+            select(AssessmentAttempt.user_id, AssessmentAttempt.assessment_id, AssessmentAttempt.deadline_at)
+            .where(
+                AssessmentAttempt.id == attempt_id,
+                AssessmentAttempt.submitted_at == None
+            )
+        ).first()
+        if row is None:
+            return None
+        meta = {
+            "user_id": str(row.user_id),
+            "assessment_id": str(row.assessment_id),
+            "deadline_at": row.deadline_at.isoformat() if row.deadline_at else None
+        }
+        cache_set(key, meta, settings.ASSESSMENT_AUTOSAVE_TTL_SECONDS)
+    if meta["assessment_id"] != str(assessment_id):
+        return None
+    return meta
+
+
+def save_answers(attempt_id: UUID, delta: Dict[str, Any], times: Optional[Dict[str, float]] = None) -> None:
+    """Merge an answer delta (and cumulative seconds per question) into the attempt's autosave.
+
+    Raises redis.RedisError if the store is unavailable.
+    """
+    if delta or times:
+        _store.save(str(attempt_id), _fields(delta, times or {}))
+
+
+def pending_answers(attempt_id: UUID) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Autosaved (answers, times) not yet known to be in the database."""
+    try:
+        return _split(_store.load(str(attempt_id)))
+    except redis.RedisError as e:
+        logger.warning("Autosave store unavailable for attempt %s: %s", attempt_id, e)
+        return {}, {}
+
+
+def pending_answers_many(attempt_ids: List[UUID]) -> Dict[str, Tuple[Dict[str, Any], Dict[str, float]]]:
+    try:
+        loaded = _store.load_many([str(attempt_id) for attempt_id in attempt_ids])
+    except redis.RedisError as e:
+        logger.warning("Autosave store unavailable: %s", e)
+        return {}
+    return {attempt_id: _split(fields) for attempt_id, fields in loaded.items()}
+
+
+def discard_answers(attempt_ids: List[UUID]) -> None:
+    """Forget autosaves of submitted attempts; call after the submission is committed."""
+    if not attempt_ids:
+        return
+    cache_delete(*(f"{META_PREFIX}{attempt_id}" for attempt_id in attempt_ids))
+    try:
+        _store.discard([str(attempt_id) for attempt_id in attempt_ids])
+    except redis.RedisError as e:
+        logger.warning("Failed to discard autosaves: %s", e)
+
+
+def write_answers(db: Session, saved: Dict[str, Tuple[Dict[str, Any], Dict[str, float]]]) -> int:
+    """Merge autosaved (answers, times) into open attempts with one executemany UPDATE. Does not commit."""
+    if not saved:
+        return 0
+    attempts = AssessmentAttempt.__table__
+    # Core executemany: the ORM only batches UPDATEs keyed on the primary key alone
+    db.connection().execute(
+        update(attempts)
+        .where(
+            attempts.c.id == bindparam("attempt_id"),
+            attempts.c.submitted_at == None
+        )
+        .values(
+            answers=func.coalesce(attempts.c.answers, literal({}, JSONB)).op("||")(
+                bindparam("delta", type_=JSONB)
+            ),
+            question_times=func.coalesce(attempts.c.question_times, literal({}, JSONB)).op("||")(
+                bindparam("times", type_=JSONB)
+            )
+        ),
+        [
+            {"attempt_id": UUID(attempt_id), "delta": answers, "times": times}
+            for attempt_id, (answers, times) in saved.items()
+        ]
+    )
+    return len(saved)
+
+
+def flush_autosaves(db: Session, batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """Write every dirty attempt's autosave to the database."""
+    flushed = 0
+    while True:
+        try:
+            attempt_ids = _store.pop_dirty(batch_size)
+            saved = _store.load_many(attempt_ids) if attempt_ids else {}
+        except redis.RedisError as e:
+            logger.warning("Autosave store unavailable, skipping flush: %s", e)
+            return flushed
+        if not attempt_ids:
+            return flushed
+
+        try:
+            flushed += write_answers(db, {k: _split(v) for k, v in saved.items() if v})
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the batch back so the next run retries it
+            _store.mark_dirty(attempt_ids)
+            raise
+        if len(attempt_ids) < batch_size:
+            return flushed
+
+
+@periodic(settings.ASSESSMENT_AUTOSAVE_FLUSH_SECONDS)
+def run_autosave_flush() -> None:
+    db = SessionLocal()
+    try:
+        flushed = flush_autosaves(db)
+        if flushed:
+            logger.info("Flushed autosaved answers for %d attempts", flushed)
+    finally:
+        db.close()
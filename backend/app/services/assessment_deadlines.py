@@ -0,0 +1,111 @@
+"""Server-side enforcement of assessment time limits.
+
+Attempts get a ``deadline_at`` when they start. A periodic sweep picks up
+open attempts whose deadline (plus ``ASSESSMENT_DEADLINE_GRACE_SECONDS``) has
+passed, folds in any autosaved answers, grades each batch with the vectorised
+grader and marks the attempts submitted at their deadline. Rows are claimed
+with ``FOR UPDATE SKIP LOCKED`` so a concurrent manual submit never blocks on
+the sweep or gets graded twice.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.assessment import Assessment, AssessmentAttempt
+from app.services.assessment_autosave import pending_answers_many, discard_answers
+from app.services.grading import get_answer_key, score_matrix, summarize
+from app.services.scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def is_past_deadline(attempt: AssessmentAttempt, now: datetime = None) -> bool:
+    """Whether the attempt's deadline, including the grace period, has passed."""
+    if attempt.deadline_at is None:
+        return False
+    now = now or datetime.utcnow()
+    return now > attempt.deadline_at + timedelta(seconds=settings.ASSESSMENT_DEADLINE_GRACE_SECONDS)
+
+
+def _submit_batch(db: Session, rows: List) -> None:
+    pending = pending_answers_many([row.id for row in rows])
+    by_assessment: Dict = defaultdict(list)
+    for row in rows:
+        by_assessment[row.assessment_id].append(row)
+
+    pass_percentages = dict(db.execute(
+        select(Assessment.id, Assessment.pass_percentage).where(Assessment.id.in_(list(by_assessment)))
+    ).all())
+
+    updates = []
+    for assessment_id, attempts in by_assessment.items():
+        key = get_answer_key(db, assessment_id)
+        saved = [pending.get(str(row.id), ({}, {})) for row in attempts]
+        answer_sets = [{**(row.answers or {}), **answers} for row, (answers, _) in zip(attempts, saved)]
+        previous = [row.grading for row in attempts]
+        results = summarize(
+            key, score_matrix(key, answer_sets, previous), float(pass_percentages[assessment_id] or 0), previous
+        )
+        for row, answers, (_, times), result in zip(attempts, answer_sets, saved, results):
+            updates.append({
+                "id": row.id,
+                "answers": answers,
+                "question_times": {**(row.question_times or {}), **times},
+                "submitted_at": row.deadline_at,
+                "time_taken_seconds": max(0, int((row.deadline_at - row.started_at).total_seconds())),
+                **result
+            })
+
+    db.execute(update(AssessmentAttempt).execution_options(synchronize_session=False), updates)
+
+
+def auto_submit_expired_attempts(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Submit and grade every open attempt past its deadline; returns how many were submitted."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.ASSESSMENT_DEADLINE_GRACE_SECONDS)
+    submitted = 0
+    while True:
+        rows = db.execute(
+            select(
+                AssessmentAttempt.id,
+                AssessmentAttempt.assessment_id,
+                AssessmentAttempt.answers,
+                AssessmentAttempt.grading,
+                AssessmentAttempt.question_times,
+                AssessmentAttempt.started_at,
+                AssessmentAttempt.deadline_at
+            )
+            .where(
+                AssessmentAttempt.submitted_at == None,
+                AssessmentAttempt.deadline_at <= cutoff
+            )
+            .order_by(AssessmentAttempt.deadline_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return submitted
+
+        _submit_batch(db, rows)
+        db.commit()
+        discard_answers([row.id for row in rows])
+        submitted += len(rows)
+        if len(rows) < batch_size:
+            return submitted
+
+
+@periodic(settings.ASSESSMENT_DEADLINE_SWEEP_SECONDS)
+def run_deadline_sweep() -> None:
+    db = SessionLocal()
+    try:
+        submitted = auto_submit_expired_attempts(db)
+        if submitted:
+            logger.info("Auto-submitted %d expired assessment attempts", submitted)
+    finally:
+        db.close()
@@ -0,0 +1,182 @@
+"""Serving assessments to learners at exam start.
+
+When a cohort starts a timed exam together, every learner needs the same
+assessment and question set. The set is cached once per assessment (answers
+stripped) in the shared cache and invalidated by the assessment and question
+write endpoints; each attempt gets its own stable shuffle of it. The cached
+set carries a ``_version`` hash of its content, so conditional requests are
+answered without touching the database.
+
+Attempts are numbered by an ``INSERT ... SELECT max(attempt_number) + 1`` that
+also enforces ``max_attempts``, and the unique (assessment_id, user_id,
+attempt_number) constraint turns a concurrent duplicate start into a no-op
+instead of an extra attempt.
+"""
+import hashlib
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, func, literal, DateTime
+from sqlalchemy.dialects.postgresql import insert, JSONB
+from sqlalchemy.orm import Session
+from app.core.cache import cache_get, cache_set, cache_delete
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.models.assessment import Assessment, Question, AssessmentAttempt
+from app.schemas.assessment import AssessmentResponse, QuestionResponse
+
+KEY_PREFIX = "assessments:exam:v2:"
+START_RETRIES = 3
+
+
+class AttemptLimitReached(Exception):
+    pass
+
+
+class NotAvailable(Exception):
+    """The assessment's availability window is not open."""
+
+
+def get_exam(db: Session, assessment_id: UUID) -> Optional[Dict[str, Any]]:
+    """Assessment and its questions without answers, as JSON-ready dicts.
+
+    The dict also has a ``_version`` key, which is not part of the response.
+    """
+    key = f"{KEY_PREFIX}{assessment_id}"
+    exam = cache_get(key)
+    if exam is not None:
+        return exam
+
+    assessment = db.execute(select(Assessment).where(Assessment.id == assessment_id)).scalar_one_or_none()
+    if assessment is None:
+        return None
+    questions = db.execute(
+        select(Question).where(Question.assessment_id == assessment_id).order_by(Question.order_index)
+    ).scalars().all()
+
+    exam = {
+        **AssessmentResponse.model_validate(assessment).model_dump(mode="json"),
+        "questions": [QuestionResponse.model_validate(q).model_dump(mode="json") for q in questions]
+    }
+    exam["_version"] = hashlib.sha1(dumps(exam)).hexdigest()
+    cache_set(key, exam, settings.ASSESSMENT_CACHE_TTL_SECONDS)
+    return exam
+
+
+def invalidate_exam(assessment_id: UUID) -> None:
+    """Drop the cached question set; call after committing assessment or question changes."""
+    cache_delete(f"{KEY_PREFIX}{assessment_id}")
+
+
+def questions_for_attempt(exam: Dict[str, Any], attempt_id: UUID) -> List[Dict[str, Any]]:
+    """The exam's questions in this attempt's order (a stable shuffle if enabled)."""
+    questions = list(exam["questions"])
+    if exam.get("shuffle_questions"):
+        random.Random(attempt_id.int).shuffle(questions)
+    return questions
+
+
+def get_open_attempt(db: Session, assessment_id: UUID, user_id: UUID) -> Optional[AssessmentAttempt]:
+    return db.execute(
+        select(AssessmentAttempt)
+        .where(
+            AssessmentAttempt.assessment_id == assessment_id,
+            AssessmentAttempt.user_id == user_id,
+            AssessmentAttempt.submitted_at == None
+        )
+        .order_by(AssessmentAttempt.attempt_number.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def attempt_deadline(exam: Dict[str, Any], started_at: datetime) -> Optional[datetime]:
+    """When an attempt started now must end: the time limit or the availability window, whichever is first."""
+    deadlines = []
+    if exam.get("time_limit_minutes"):
+        deadlines.append(started_at + timedelta(minutes=exam["time_limit_minutes"]))
+    if exam.get("available_until"):
+        deadlines.append(datetime.fromisoformat(exam["available_until"]))
+    return min(deadlines) if deadlines else None
+
+
+def is_available(exam: Dict[str, Any], now: datetime) -> bool:
+    """Whether ``now`` is inside the exam's availability window."""
+    if exam.get("available_from") and now < datetime.fromisoformat(exam["available_from"]):
+        return False
+    if exam.get("available_until") and now >= datetime.fromisoformat(exam["available_until"]):
+        return False
+    return True
+
+
+def _insert_next_attempt(db: Session, exam: Dict[str, Any], user_id: UUID) -> Optional[UUID]:
+    assessment_id = UUID(exam["id"])
+    attempt_id = uuid.uuid4()
+    started_at = datetime.utcnow()
+    last_number = func.coalesce(func.max(AssessmentAttempt.attempt_number), 0)
+    next_attempt = select(
+        literal(attempt_id),
+        literal(assessment_id),
+        literal(user_id),
+        last_number + 1,
+        literal({}, JSONB),
+        literal(started_at),
+        literal(attempt_deadline(exam, started_at), DateTime),
+        literal(False),
+        literal(False)
+    ).where(
+        AssessmentAttempt.assessment_id == assessment_id,
+        AssessmentAttempt.user_id == user_id
+    )
+    if exam.get("max_attempts"):
+        next_attempt = next_attempt.having(last_number < exam["max_attempts"])
+
+    result = db.execute(
+        insert(AssessmentAttempt)
+        .from_select(
+            ["id", "assessment_id", "user_id", "attempt_number", "answers",
+             "started_at", "deadline_at", "passed", "needs_manual_grading"],
+            next_attempt
+        )
+        .on_conflict_do_nothing(index_elements=["assessment_id", "user_id", "attempt_number"])
+        .returning(AssessmentAttempt.id)
+    )
+    return result.scalar_one_or_none()
+
+
+def start_attempt(db: Session, exam: Dict[str, Any], user_id: UUID) -> AssessmentAttempt:
+    """Resume the learner's open attempt or create the next one. Commits.
+
+    Raises AttemptLimitReached when ``max_attempts`` attempts exist, and
+    NotAvailable when a new attempt would start outside the availability
+    window (it would be past its deadline from the start).
+    """
+    assessment_id = UUID(exam["id"])
+    for _ in range(START_RETRIES):
+        attempt = get_open_attempt(db, assessment_id, user_id)
+        if attempt is not None:
+            return attempt
+        if not is_available(exam, datetime.utcnow()):
+            raise NotAvailable()
+
+        attempt_id = _insert_next_attempt(db, exam, user_id)
+        db.commit()
+        if attempt_id is not None:
+            return db.get(AssessmentAttempt, attempt_id)
+
+        # Either the limit is reached, or a concurrent start took this number
+        attempt_count = db.execute(
+            select(func.count(AssessmentAttempt.id)).where(
+                AssessmentAttempt.assessment_id == assessment_id,
+                AssessmentAttempt.user_id == user_id
+            )
+        ).scalar()
+        if exam.get("max_attempts") and attempt_count >= exam["max_attempts"]:
+            raise AttemptLimitReached()
+
+    attempt = get_open_attempt(db, assessment_id, user_id)
+    if attempt is None:
+        raise AttemptLimitReached()
+    return attempt
@@ -0,0 +1,95 @@
+"""Assignment submission analytics.
+
+Counts, score summary, percentiles and a score histogram all come from one
+aggregate query; the histogram is a ``count(*) FILTER`` per ``width_bucket``
+over ``[0, max_score]``. Results are cached per assignment and dropped by the
+submission and grading endpoints.
+"""
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import select, func, distinct
+from sqlalchemy.orm import Session
+from app.core.cache import cache_get, cache_set, cache_delete
+from app.core.config import settings
+from app.db.models.assignment import Assignment, AssignmentSubmission
+
+KEY_PREFIX = "assignments:analytics:"
+HISTOGRAM_BINS = 10
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def _round(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def compute_assignment_analytics(db: Session, assignment: Assignment) -> Dict[str, Any]:
+    max_score = float(assignment.max_score or 100)
+    score = AssignmentSubmission.score
+    # width_bucket puts max_score itself in bucket bins + 1; fold it into the top bucket
+    bucket = func.least(func.greatest(func.width_bucket(score, 0, max_score, HISTOGRAM_BINS), 1), HISTOGRAM_BINS)
+
+    columns = [
+        func.count().label("total"),
+        func.count(AssignmentSubmission.graded_at).label("graded"),
+        func.count(distinct(AssignmentSubmission.user_id)).label("students"),
+        func.avg(score).label("average"),
+        func.min(score).label("lowest"),
+        func.max(score).label("highest"),
+        func.stddev_pop(score).label("stddev"),
+        func.percentile_cont(list(PERCENTILES)).within_group(score).label("percentiles"),
+    ]
+    if assignment.due_date:
+        columns.append(
+            func.count()
+            .filter(AssignmentSubmission.submitted_at > assignment.due_date)
+            .label("late")
+        )
+    columns += [
+        func.count(score).filter(bucket == i).label(f"bin_{i}") for i in range(1, HISTOGRAM_BINS + 1)
+    ]
+
+    row = db.execute(
+        select(*columns).where(AssignmentSubmission.assignment_id == assignment.id)
+    ).one()
+
+    width = max_score / HISTOGRAM_BINS
+    percentiles = row.percentiles or [None] * len(PERCENTILES)
+    return {
+        "assignment_id": str(assignment.id),
+        "total_submissions": row.total,
+        "graded_submissions": row.graded,
+        "pending_submissions": row.total - row.graded,
+        "unique_students": row.students,
+        "late_submissions": row.late if assignment.due_date else 0,
+        "average_score": _round(row.average) or 0,
+        "highest_score": _round(row.highest) or 0,
+        "lowest_score": _round(row.lowest) or 0,
+        "score_stddev": _round(row.stddev),
+        "max_score": max_score,
+        "percentiles": {
+            f"p{int(p * 100)}": _round(value) for p, value in zip(PERCENTILES, percentiles)
+        },
+        "histogram": [
+            {
+                "lower": round(width * (i - 1), 2),
+                "upper": round(width * i, 2),
+                "count": getattr(row, f"bin_{i}")
+            }
+            for i in range(1, HISTOGRAM_BINS + 1)
+        ]
+    }
+
+
+def get_assignment_analytics(db: Session, assignment: Assignment) -> Dict[str, Any]:
+    key = f"{KEY_PREFIX}{assignment.id}"
+    analytics = cache_get(key)
+    if analytics is None:
+        analytics = compute_assignment_analytics(db, assignment)
+        cache_set(key, analytics, settings.ASSIGNMENT_ANALYTICS_CACHE_TTL_SECONDS)
+    return analytics
+
+
+def invalidate_assignment_analytics(assignment_id: UUID) -> None:
+    """Drop cached analytics; call after committing a submission or grade change."""
+    cache_delete(f"{KEY_PREFIX}{assignment_id}")
@@ -0,0 +1,195 @@
+"""Listing and bulk grading of assignment submissions.
+
+Listings are keyset-paginated on (submitted_at, id), newest first, so a page
+costs the same however deep it is. The cursor is the last row's key, opaque
+to clients. The NDJSON export walks the same ordering with a server-side
+cursor and never holds more than one fetch batch in memory.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update, tuple_, false, true
+from sqlalchemy.orm import Session
+from app.core.serialization import dumps
+from app.db.session import SessionLocal
+from app.db.models.assignment import Assignment, AssignmentSubmission
+from app.db.models.user import User
+from app.db.models.file import StoredFile
+from app.services.file_uploads import stored_file_id
+
+STREAM_BATCH_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(submitted_at: datetime, submission_id: UUID) -> str:
+    raw = f"{submitted_at.isoformat()}|{submission_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submitted_at, submission_id = raw.split("|")
+        return datetime.fromisoformat(submitted_at), UUID(submission_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(cursor)) from e
+
+
+def submissions_query(
+    assignment: Assignment,
+    status: Optional[str] = None,
+    late: Optional[bool] = None,
+    cursor: Optional[str] = None
+):
+    """Submissions of an assignment joined with the student, newest first.
+
+    Raises InvalidCursor if the cursor cannot be decoded.
+    """
+    query = select(
+        AssignmentSubmission.id,
+        AssignmentSubmission.assignment_id,
+        AssignmentSubmission.user_id,
+        AssignmentSubmission.submission_text,
+        AssignmentSubmission.attachment_urls,
+        AssignmentSubmission.score,
+        AssignmentSubmission.feedback,
+        AssignmentSubmission.graded_by,
+        AssignmentSubmission.submitted_at,
+        AssignmentSubmission.graded_at,
+        User.first_name,
+        User.last_name,
+        User.email
+    ).join(
+        User, AssignmentSubmission.user_id == User.id
+    ).where(
+        AssignmentSubmission.assignment_id == assignment.id
+    )
+
+    if status == "graded":
+        query = query.where(AssignmentSubmission.graded_at != None)
+    elif status == "submitted":
+        query = query.where(AssignmentSubmission.graded_at == None)
+
+    if late is not None:
+        if assignment.due_date is None:
+            # Nothing is late without a due date
+            query = query.where(false() if late else true())
+        elif late:
+            query = query.where(AssignmentSubmission.submitted_at > assignment.due_date)
+        else:
+            query = query.where(AssignmentSubmission.submitted_at <= assignment.due_date)
+
+    if cursor:
+        submitted_at, submission_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(AssignmentSubmission.submitted_at, AssignmentSubmission.id) < tuple_(submitted_at, submission_id)
+        )
+
+    return query.order_by(AssignmentSubmission.submitted_at.desc(), AssignmentSubmission.id.desc())
+
+
+def submission_dict(row) -> Dict[str, Any]:
+    return {
+        "id": str(row.id),
+        "assignment_id": str(row.assignment_id),
+        "user_id": str(row.user_id),
+        "student_id": str(row.user_id),
+        "student_name": f"{row.first_name} {row.last_name}" if row.first_name and row.last_name else row.email,
+        "student_email": row.email,
+        "submission_text": row.submission_text,
+        "attachment_urls": row.attachment_urls or [],
+        "attachment_url": row.attachment_urls[0] if row.attachment_urls else None,
+        "grade": row.score,
+        "score": row.score,
+        "feedback": row.feedback,
+        "graded_by": str(row.graded_by) if row.graded_by else None,
+        "submitted_at": row.submitted_at.isoformat(),
+        "graded_at": row.graded_at.isoformat() if row.graded_at else None,
+        "status": "graded" if row.graded_at else "submitted"
+    }
+
+
+def foreign_attachments(db: Session, attachment_urls: Optional[List[str]], user_id: UUID) -> List[str]:
+    """Attachment URLs naming stored files that ``user_id`` did not upload.
+
+    A submission may only attach its author's own files, which is also all
+    the attachment download will serve.
+    """
+    file_ids = {url: stored_file_id(url) for url in attachment_urls or []}
+    wanted = {file_id for file_id in file_ids.values() if file_id}
+    own = set(db.execute(
+        select(StoredFile.id).where(StoredFile.id.in_(wanted), StoredFile.uploaded_by == user_id)
+    ).scalars()) if wanted else set()
+    return [url for url, file_id in file_ids.items() if file_id and file_id not in own]
+
+
+def list_submissions(db: Session, query, limit: int) -> Dict[str, Any]:
+    """One page of submissions and the cursor of the next page (None on the last page)."""
+    rows = db.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    return {
+        "submissions": [submission_dict(row) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+def stream_submissions(query) -> Iterator[bytes]:
+    """Every submission matching the query as NDJSON lines.
+
+    Runs on its own session, since the response body is sent after the
+    request's session has been closed.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for rows in result.partitions():
+            yield b"".join(dumps(submission_dict(row)) + b"\n" for row in rows)
+    finally:
+        db.close()
+
+
+def bulk_grade(
+    db: Session,
+    assignment_id: UUID,
+    grades: List[Dict[str, Any]],
+    grader_id: UUID
+) -> datetime:
+    """Apply many grades with a single executemany UPDATE. Does not commit.
+
+    ``grades`` are dicts with ``submission_id``, ``score`` and ``feedback``.
+    Raises LookupError listing submission ids that are not in the assignment.
+    """
+    submission_ids = [grade["submission_id"] for grade in grades]
+    found = set(db.execute(
+        select(AssignmentSubmission.id).where(
+            AssignmentSubmission.assignment_id == assignment_id,
+            AssignmentSubmission.id.in_(submission_ids)
+        )
+    ).scalars())
+    missing = [str(submission_id) for submission_id in submission_ids if submission_id not in found]
+    if missing:
+        raise LookupError(missing)
+
+    graded_at = datetime.utcnow()
+    db.execute(
+        update(AssignmentSubmission).execution_options(synchronize_session=False),
+        [
+            {
+                "id": grade["submission_id"],
+                "score": grade["score"],
+                "feedback": grade.get("feedback"),
+                "graded_by": grader_id,
+                "graded_at": graded_at
+            }
+            for grade in grades
+        ]
+    )
+    return graded_at
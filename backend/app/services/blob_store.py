@@ -0,0 +1,152 @@
+"""Content-addressed, reference-counted storage of file bytes.
+
+Every uploaded file is hashed with SHA-256 as it is stored. The bytes are then
+kept once per hash under ``blobs/`` and every file with that content points
+at the same blob, which counts its references. Re-uploading a slide deck
+costs a row instead of another copy, and a client that already knows the hash
+can skip sending the bytes at all.
+
+Deleting a file only drops a reference. Blobs left with none are removed by
+a periodic collector once ``BLOB_GC_GRACE_SECONDS`` have passed, so a file
+deleted and uploaded again in the meantime revives its blob for free.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import select, update, case, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.file import Blob, StoredFile
+from app.services.scheduler import periodic
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def blob_key(digest: str) -> str:
+    return f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def hashing(chunks: Iterable[bytes], hasher) -> Iterator[bytes]:
+    """Pass chunks through, feeding each to ``hasher`` on the way."""
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+
+def hash_object(key: str) -> Tuple[str, int]:
+    """SHA-256 and size of a stored object, read as a stream."""
+    hasher = hashlib.sha256()
+    size = 0
+    for chunk in get_storage().iter_range(key):
+        hasher.update(chunk)
+        size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def add_reference(db: Session, digest: str, size: int, staged_key: str) -> str:
+    """Reference the blob for ``digest``, creating it from the staged object. Does not commit.
+
+    The staged object becomes the blob if the hash is new and is deleted
+    otherwise. Returns the blob's storage key. The blob row stays locked until
+    the caller commits, so a concurrent upload or collection of the same
+    content waits rather than racing.
+    """
+    key = blob_key(digest)
+    inserted = db.execute(
+        insert(Blob)
+        .values(sha256=digest, storage_key=key, size=size, ref_count=1, created_at=datetime.utcnow())
+        .on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"ref_count": Blob.ref_count + 1, "orphaned_at": None}
+        )
+        # xmax is 0 only on a freshly inserted row
+        .returning(Blob.storage_key, literal_column("xmax = 0").label("inserted"))
+    ).one()
+    storage = get_storage()
+    if inserted.inserted or storage.stat(inserted.storage_key) is None:
+        storage.move(staged_key, inserted.storage_key)
+    else:
+        storage.delete(staged_key)
+    return inserted.storage_key
+
+
+def acquire(db: Session, digest: str, size: int) -> Optional[str]:
+    """Reference an existing blob with this hash and size; None if there is none. Does not commit."""
+    return db.execute(
+        update(Blob)
+        .where(Blob.sha256 == digest.lower(), Blob.size == size)
+        .values(ref_count=Blob.ref_count + 1, orphaned_at=None)
+        .returning(Blob.storage_key)
+    ).scalar_one_or_none()
+
+
+def release(db: Session, digest: str) -> None:
+    """Drop a reference; the blob is collected later if it was the last. Does not commit."""
+    db.execute(
+        update(Blob)
+        .where(Blob.sha256 == digest)
+        .values(
+            ref_count=Blob.ref_count - 1,
+            orphaned_at=case((Blob.ref_count <= 1, datetime.utcnow()), else_=None)
+        )
+    )
+
+
+def collect_garbage(db: Session) -> int:
+    """Delete blobs unreferenced for longer than ``BLOB_GC_GRACE_SECONDS``. Commits per blob."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.BLOB_GC_GRACE_SECONDS)
+    storage = get_storage()
+    collected = 0
+    while True:
+        # One blob per transaction: its row lock makes an upload of the same
+        # content wait until the object is gone, then store it afresh
+        blob = db.execute(
+            select(Blob)
+            .where(Blob.ref_count <= 0, Blob.orphaned_at < cutoff)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if blob is None:
+            db.rollback()
+            return collected
+
+        digest, key = blob.sha256, blob.storage_key
+        db.delete(blob)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Files still point at it: the count drifted, so recount instead of deleting
+            db.rollback()
+            db.execute(
+                update(Blob)
+                .where(Blob.sha256 == digest)
+                .values(
+                    ref_count=select(func.count(StoredFile.id))
+                    .where(StoredFile.content_hash == digest)
+                    .scalar_subquery(),
+                    orphaned_at=None
+                )
+            )
+            db.commit()
+            logger.warning("Recounted references to blob %s", digest)
+            continue
+        storage.delete(key)
+        db.commit()
+        collected += 1
+
+
+@periodic(settings.BLOB_GC_INTERVAL_SECONDS)
+def run_blob_gc() -> None:
+    db = SessionLocal()
+    try:
+        collected = collect_garbage(db)
+        if collected:
+            logger.info("Collected %d unreferenced blobs", collected)
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+"""Certificate issuance shared by single, automatic and bulk generation.
+
+Certificate numbers come from the ``certificate_number_seq`` sequence, and
+verification codes are an HMAC of the number, so neither can collide. Rows
+are inserted with ``ON CONFLICT DO NOTHING``: the partial unique index on
+active certificates per enrollment turns a concurrent duplicate into a
+skipped row instead of an aborted transaction.
+"""
+import hashlib
+import hmac
+import logging
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import select, update, and_, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.certificate import (
+    Certificate, CertificateBatch, CertificateBatchStatus, certificate_number_seq
+)
+from app.db.models.course import Course
+from app.db.models.enrollment import Enrollment, EnrollmentStatus
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def allocate_certificate_numbers(db: Session, count: int, issued_at: datetime) -> List[str]:
+    """Reserve ``count`` certificate numbers in one round trip."""
+    if count <= 0:
+        return []
+    result = db.execute(
+        select(certificate_number_seq.next_value()).select_from(func.generate_series(1, count))
+    )
+    prefix = f"DYN-{issued_at.strftime('%Y%m%d')}"
+    return [f"{prefix}-{value:08d}" for (value,) in result.all()]
+
+
+def verification_code_for(certificate_number: str) -> str:
+    """Derive the public verification code from a certificate number."""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode("utf-8"), certificate_number.encode("utf-8"), hashlib.sha256
+    )
+    return digest.hexdigest()[:16].upper()
+
+
+def issue_certificates(
+    db: Session, course: Course, enrollments: Sequence, template_id: Optional[str] = None
+) -> List[UUID]:
+    """Insert certificates for enrollments of one course; returns the enrollment ids issued.
+
+    `enrollments` only need `id` and `user_id`. Enrollments that already hold
+    an active certificate are skipped. Does not commit.
+    """
+    if not enrollments:
+        return []
+
+    issued_at = datetime.utcnow()
+    numbers = allocate_certificate_numbers(db, len(enrollments), issued_at)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": enrollment.user_id,
+            "course_id": course.id,
+            "enrollment_id": enrollment.id,
+            "certificate_number": number,
+            "verification_code": verification_code_for(number),
+            "title": f"Certificate of Completion - {course.title}",
+            "description": f"This certifies that the holder has successfully completed {course.title} offered by DynPro.",
+            "issued_at": issued_at,
+            "is_revoked": False,
+            "cert_metadata": {"template_id": template_id} if template_id else None,
+        }
+        for enrollment, number in zip(enrollments, numbers)
+    ]
+    result = db.execute(
+        insert(Certificate)
+        .values(rows)
+        .on_conflict_do_nothing()
+        .returning(Certificate.enrollment_id)
+    )
+    issued = [enrollment_id for (enrollment_id,) in result.all()]
+
+    # Enrollments skipped above already had a certificate, so mark them all
+    db.execute(
+        update(Enrollment)
+        .where(Enrollment.id.in_([enrollment.id for enrollment in enrollments]))
+        .values(certificate_issued=True)
+        .execution_options(synchronize_session=False)
+    )
+    return issued
+
+
+def issue_certificate_for_enrollment(
+    db: Session, enrollment: Enrollment, template_id: Optional[str] = None
+) -> Certificate:
+    """Issue (or return the existing) active certificate for one enrollment. Does not commit."""
+    course = db.execute(select(Course).where(Course.id == enrollment.course_id)).scalar_one()
+    issue_certificates(db, course, [enrollment], template_id)
+    enrollment.certificate_issued = True
+    return db.execute(
+        select(Certificate).where(
+            and_(
+                Certificate.enrollment_id == enrollment.id,
+                Certificate.is_revoked == False
+            )
+        )
+    ).scalar_one()
+
+
+def _pending_enrollments(course_id: UUID):
+    return and_(
+        Enrollment.course_id == course_id,
+        Enrollment.status == EnrollmentStatus.completed,
+        Enrollment.certificate_issued == False
+    )
+
+
+def count_pending_enrollments(db: Session, course_id: UUID) -> int:
+    """Completed enrollments in a course still waiting for a certificate."""
+    return db.execute(
+        select(func.count(Enrollment.id)).where(_pending_enrollments(course_id))
+    ).scalar()
+
+
+def run_certificate_batch(batch_id: UUID) -> None:
+    """Issue certificates for a batch in committed chunks; intended to run as a background task."""
+    db = SessionLocal()
+    try:
+        batch = db.get(CertificateBatch, batch_id)
+        if batch is None or batch.status != CertificateBatchStatus.pending:
+            return
+
+        course = db.get(Course, batch.course_id)
+        batch.status = CertificateBatchStatus.running
+        batch.started_at = datetime.utcnow()
+        batch.total_enrollments = count_pending_enrollments(db, batch.course_id)
+        db.commit()
+
+        after_id = None
+        while True:
+            query = select(Enrollment.id, Enrollment.user_id).where(_pending_enrollments(batch.course_id))
+            if after_id is not None:
+                query = query.where(Enrollment.id > after_id)
+            enrollments = db.execute(query.order_by(Enrollment.id).limit(CHUNK_SIZE)).all()
+            if not enrollments:
+                break
+
+            issued = issue_certificates(db, course, enrollments)
+            after_id = enrollments[-1].id
+            db.execute(
+                update(CertificateBatch)
+                .where(CertificateBatch.id == batch_id)
+                .values(issued_count=CertificateBatch.issued_count + len(issued))
+            )
+            db.commit()
+
+            if len(enrollments) < CHUNK_SIZE:
+                break
+
+        db.refresh(batch)
+        batch.status = CertificateBatchStatus.completed
+        batch.completed_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Certificate batch %s failed", batch_id)
+        db.execute(
+            update(CertificateBatch)
+            .where(CertificateBatch.id == batch_id)
+            .values(status=CertificateBatchStatus.failed, error=str(e), completed_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
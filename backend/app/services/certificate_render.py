@@ -0,0 +1,214 @@
+"""Certificate PDF rendering.
+
+PDFs are drawn with ReportLab in a process pool so CPU-heavy rendering never
+runs on request threads. Fonts are the Bitstream Vera TTFs bundled with
+ReportLab and are embedded in every PDF, so rendering needs no network or
+system fonts.
+
+Rendered files are cached in object storage under a content-addressed key: a
+hash of everything printed on the certificate plus the template version.
+Changing a template's version (or any printed field) yields a new key, so
+cached files never need invalidating and can be served as immutable.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.storage import get_storage, ObjectInfo
+
+CACHE_PREFIX = "certificates/rendered"
+
+
+@dataclass(frozen=True)
+class CertificateTemplate:
+    id: str
+    name: str
+    description: str
+    version: int
+    accent_color: str
+    border: str  # "single", "double" or "none"
+    title_font: str = "VeraBd"
+
+
+TEMPLATES: Dict[str, CertificateTemplate] = {
+    "default": CertificateTemplate(
+        id="default",
+        name="Default Certificate",
+        description="Standard certificate template",
+        version=1,
+        accent_color="#1e3a8a",
+        border="single",
+    ),
+    "professional": CertificateTemplate(
+        id="professional",
+        name="Professional Certificate",
+        description="Professional-looking certificate with border",
+        version=1,
+        accent_color="#7c2d12",
+        border="double",
+    ),
+    "modern": CertificateTemplate(
+        id="modern",
+        name="Modern Certificate",
+        description="Modern minimalist design",
+        version=1,
+        accent_color="#0f766e",
+        border="none",
+    ),
+}
+
+DEFAULT_TEMPLATE = "default"
+
+
+def get_template(template_id: Optional[str]) -> CertificateTemplate:
+    return TEMPLATES.get(template_id or DEFAULT_TEMPLATE, TEMPLATES[DEFAULT_TEMPLATE])
+
+
+def _register_fonts() -> None:
+    from reportlab import rl_config
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if "Vera" in pdfmetrics.getRegisteredFontNames():
+        return
+    font_dir = os.path.join(os.path.dirname(rl_config.__file__), "fonts")
+    for name, filename in (("Vera", "Vera.ttf"), ("VeraBd", "VeraBd.ttf"), ("VeraIt", "VeraIt.ttf")):
+        pdfmetrics.registerFont(TTFont(name, os.path.join(font_dir, filename)))
+
+
+def render_certificate_pdf(fields: Dict[str, str], template: Dict) -> bytes:
+    """Draw a certificate; runs inside a render worker process."""
+    import io
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    _register_fonts()
+    width, height = landscape(A4)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(width, height), invariant=1)
+    pdf.setTitle(fields["title"])
+    pdf.setAuthor(settings.EMAILS_FROM_NAME)
+    accent = HexColor(template["accent_color"])
+
+    pdf.setStrokeColor(accent)
+    if template["border"] in ("single", "double"):
+        pdf.setLineWidth(4)
+        pdf.rect(30, 30, width - 60, height - 60)
+    if template["border"] == "double":
+        pdf.setLineWidth(1.5)
+        pdf.rect(42, 42, width - 84, height - 84)
+    if template["border"] == "none":
+        pdf.setFillColor(accent)
+        pdf.rect(0, height - 24, width, 24, stroke=0, fill=1)
+
+    center = width / 2
+    pdf.setFillColor(accent)
+    pdf.setFont(template["title_font"], 34)
+    pdf.drawCentredString(center, height - 140, "Certificate of Completion")
+
+    pdf.setFillColor(HexColor("#374151"))
+    pdf.setFont("VeraIt", 14)
+    pdf.drawCentredString(center, height - 190, "This certifies that")
+
+    pdf.setFillColor(HexColor("#111827"))
+    pdf.setFont("VeraBd", 28)
+    pdf.drawCentredString(center, height - 235, fields["holder_name"])
+
+    pdf.setFillColor(HexColor("#374151"))
+    pdf.setFont("VeraIt", 14)
+    pdf.drawCentredString(center, height - 275, "has successfully completed")
+
+    pdf.setFillColor(accent)
+    pdf.setFont("VeraBd", 20)
+    pdf.drawCentredString(center, height - 312, fields["course_title"])
+
+    pdf.setFillColor(HexColor("#4b5563"))
+    pdf.setFont("Vera", 11)
+    pdf.drawString(70, 95, f"Issued: {fields['issued_on']}")
+    pdf.drawString(70, 78, f"Certificate No.: {fields['certificate_number']}")
+    pdf.drawRightString(width - 70, 95, f"Verification code: {fields['verification_code']}")
+    pdf.drawRightString(width - 70, 78, fields["verify_url"])
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def certificate_fields(certificate, holder_name: str, course_title: str) -> Dict[str, str]:
+    """Everything printed on a certificate."""
+    return {
+        "title": certificate.title,
+        "holder_name": holder_name,
+        "course_title": course_title,
+        "issued_on": certificate.issued_at.strftime("%B %d, %Y"),
+        "certificate_number": certificate.certificate_number,
+        "verification_code": certificate.verification_code,
+        "verify_url": f"{settings.FRONTEND_URL}/verify-certificate/{certificate.verification_code}",
+    }
+
+
+def render_key(fields: Dict[str, str], template: CertificateTemplate) -> str:
+    """Content-addressed storage key for a rendered certificate."""
+    payload = json.dumps(
+        {"fields": fields, "template": template.id, "version": template.version}, sort_keys=True
+    )
+    return f"{CACHE_PREFIX}/{hashlib.sha256(payload.encode('utf-8')).hexdigest()}.pdf"
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.CERTIFICATE_RENDER_WORKERS)
+    return _pool
+
+
+def shutdown() -> None:
+    """Stop the render workers."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def get_or_render(fields: Dict[str, str], template: CertificateTemplate) -> Tuple[str, ObjectInfo]:
+    """Return the cached PDF for these fields, rendering it first if needed.
+
+    Concurrent requests for the same certificate share one render.
+    """
+    key = render_key(fields, template)
+    storage = get_storage()
+    loop = asyncio.get_running_loop()
+
+    info = await loop.run_in_executor(None, storage.stat, key)
+    if info is not None:
+        return key, info
+
+    future = _inflight.get(key)
+    if future is None:
+        future = _inflight[key] = loop.create_future()
+        try:
+            pdf = await loop.run_in_executor(_get_pool(), render_certificate_pdf, fields, asdict(template))
+            info = await loop.run_in_executor(None, storage.put_bytes, key, pdf, "application/pdf")
+            future.set_result(info)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            _inflight.pop(key, None)
+        return key, info
+
+    return key, await asyncio.shield(future)
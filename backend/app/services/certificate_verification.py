@@ -0,0 +1,100 @@
+"""Public certificate verification, served from cache.
+
+Verification codes are looked up by external HR systems and crawlers far more
+often than certificates change, so results are cached by code: valid and
+revoked certificates for ``CERTIFICATE_VERIFY_CACHE_TTL_SECONDS``, unknown
+codes for the shorter ``CERTIFICATE_VERIFY_NEGATIVE_TTL_SECONDS``. Revoking a
+certificate overwrites its entry with the revoked result immediately. Lookups
+only add entries that are absent, so one that read the certificate before the
+revocation committed cannot put the valid result back afterwards.
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.cache import cache_get, cache_set, cache_add
+from app.core.config import settings
+from app.db.models.certificate import Certificate
+from app.db.models.course import Course
+from app.db.models.user import User
+
+KEY_PREFIX = "certificates:verify:"
+
+NOT_FOUND = {
+    "valid": False,
+    "message": "Certificate not found or verification code is invalid"
+}
+REVOKED = {
+    "valid": False,
+    "message": "This certificate has been revoked"
+}
+
+
+def _lookup(db: Session, verification_code: str) -> Optional[Dict[str, Any]]:
+    """One query for everything a verification response shows."""
+    row = db.execute(
+        select(
+            Certificate.id,
+            Certificate.certificate_number,
+            Certificate.is_revoked,
+            Certificate.issued_at,
+            Certificate.expires_at,
+            User.first_name,
+            User.last_name,
+            User.username,
+            Course.title
+        )
+        .join(User, User.id == Certificate.user_id)
+        .join(Course, Course.id == Certificate.course_id)
+        .where(Certificate.verification_code == verification_code)
+    ).first()
+
+    if row is None:
+        return None
+    if row.is_revoked:
+        return {"certificate_id": str(row.id), "result": REVOKED}
+    return {
+        "certificate_id": str(row.id),
+        "result": {
+            "valid": True,
+            "certificate_number": row.certificate_number,
+            "issued_to": f"{row.first_name} {row.last_name}" if row.first_name else row.username,
+            "course_title": row.title,
+            "issued_at": row.issued_at.isoformat(),
+            "expires_at": row.expires_at.isoformat() if row.expires_at else None
+        }
+    }
+
+
+def _cached_lookup(db: Session, verification_code: str) -> Optional[Dict[str, Any]]:
+    key = f"{KEY_PREFIX}{verification_code}"
+    entry = cache_get(key)
+    if entry is not None:
+        return entry or None
+
+    entry = _lookup(db, verification_code)
+    if entry is None:
+        # Cache the miss as an empty dict so repeated bad codes skip the database too
+        cache_add(key, {}, settings.CERTIFICATE_VERIFY_NEGATIVE_TTL_SECONDS)
+    else:
+        cache_add(key, entry, settings.CERTIFICATE_VERIFY_CACHE_TTL_SECONDS)
+    return entry
+
+
+def verify_code(db: Session, verification_code: str, certificate_id=None) -> Dict[str, Any]:
+    """Verification response for a code, optionally also matching the certificate id."""
+    entry = _cached_lookup(db, verification_code)
+    if entry is None:
+        return NOT_FOUND
+    if certificate_id is not None and entry["certificate_id"] != str(certificate_id):
+        return NOT_FOUND
+    return entry["result"]
+
+
+def cache_revocation(verification_code: str, certificate_id) -> None:
+    """Cache the revoked result for a code; call after the revocation is committed."""
+    cache_set(
+        f"{KEY_PREFIX}{verification_code}",
+        {"certificate_id": str(certificate_id), "result": REVOKED},
+        settings.CERTIFICATE_VERIFY_CACHE_TTL_SECONDS
+    )
@@ -0,0 +1,256 @@
+"""Outbound mail queue.
+
+Handlers enqueue rendered messages from any thread; a few sender tasks on the
+app's event loop drain the queue, each over one long-lived SMTP connection.
+Recipient domains are rate limited with a token bucket, transient SMTP
+failures are retried with exponential backoff, and digest items are buffered
+per recipient so a burst of notifications becomes one "5 new replies" email.
+
+Point ``SMTP_HOST``/``SMTP_PORT`` at a local ``aiosmtpd`` to test delivery.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosmtplib
+from app.core.config import settings
+from app.services.email_templates import render
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutboundEmail:
+    to: str
+    subject: str
+    text: str
+    html: Optional[str] = None
+    attempts: int = 0
+    not_before: float = 0.0
+
+    @property
+    def domain(self) -> str:
+        return self.to.rsplit("@", 1)[-1].lower()
+
+    def to_message(self) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
+        message["To"] = self.to
+        message["Subject"] = self.subject
+        message.set_content(self.text)
+        if self.html:
+            message.add_alternative(self.html, subtype="html")
+        return message
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated: float = field(default_factory=time.monotonic)
+
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain."""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, per_minute)
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def acquire(self, domain: str) -> float:
+        """Take a token; returns 0, or the seconds to wait if none is available."""
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(domain, _Bucket(tokens=self.capacity, updated=now))
+        bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+
+class _SMTPConnection:
+    """One reusable SMTP session, reconnected when the server drops it."""
+
+    def __init__(self):
+        self._client: Optional[aiosmtplib.SMTP] = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            use_tls=settings.SMTP_SSL,
+            start_tls=settings.SMTP_TLS and not settings.SMTP_SSL,
+        )
+        await client.connect()
+        if settings.SMTP_USER:
+            await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return client
+
+    async def send(self, message: EmailMessage) -> None:
+        if self._client is None or not self._client.is_connected:
+            self._client = await self._connect()
+        try:
+            await self._client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Idle connections get closed server-side; reconnect once
+            self._client = await self._connect()
+            await self._client.send_message(message)
+
+    async def close(self) -> None:
+        if self._client is not None and self._client.is_connected:
+            try:
+                await self._client.quit()
+            except aiosmtplib.SMTPException:
+                self._client.close()
+        self._client = None
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies (bad recipient, rejected content) are not worth retrying."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(500 <= e.code < 600 for e in error.recipients)
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class MailQueue:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._connections: List[_SMTPConnection] = []
+        self._limiter = DomainRateLimiter(settings.EMAIL_DOMAIN_RATE_PER_MINUTE)
+        self._digests: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def start(self, connections: Optional[int] = None) -> None:
+        """Start sender tasks on the running event loop."""
+        if self.running or not settings.EMAILS_ENABLED:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for _ in range(connections or settings.EMAIL_SMTP_CONNECTIONS):
+            connection = _SMTPConnection()
+            self._connections.append(connection)
+            self._workers.append(asyncio.create_task(self._sender(connection)))
+
+    async def stop(self) -> None:
+        """Flush pending digests, drain the queue and close connections."""
+        if not self.running:
+            return
+        for key in list(self._digests):
+            self._flush_digest(key)
+        if self._queue.qsize():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning("Dropping %d unsent emails on shutdown", self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for connection in self._connections:
+            await connection.close()
+        self._workers.clear()
+        self._connections.clear()
+        self._loop = None
+        self._queue = None
+
+    def enqueue(self, email: OutboundEmail) -> bool:
+        """Queue an email; safe to call from threadpool handlers."""
+        if not self.running:
+            logger.warning("Mail queue not running, dropping email to %s", email.to)
+            return False
+        self._call(self._queue.put_nowait, email)
+        return True
+
+    def enqueue_digest_item(self, to: str, digest_key: str, label: str, item: Dict[str, Any]) -> bool:
+        """Buffer an item; the digest is sent when its window closes."""
+        if not self.running:
+            logger.warning("Mail queue not running, dropping email to %s", to)
+            return False
+        self._call(self._add_digest_item, to, digest_key, label, item)
+        return True
+
+    def _call(self, func, *args) -> None:
+        if _in_loop(self._loop):
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _add_digest_item(self, to: str, digest_key: str, label: str, item: Dict[str, Any]) -> None:
+        key = (to, digest_key)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = {"label": label, "items": []}
+            self._loop.call_later(settings.EMAIL_DIGEST_WINDOW_SECONDS, self._flush_digest, key)
+        digest["items"].append(item)
+
+    def _flush_digest(self, key: Tuple[str, str]) -> None:
+        digest = self._digests.pop(key, None)
+        if not digest:
+            return
+        items = digest["items"]
+        if len(items) == 1:
+            subject, text, html = render("notification", **items[0])
+        else:
+            subject, text, html = render("notification_digest", label=digest["label"], items=items)
+        self._queue.put_nowait(OutboundEmail(to=key[0], subject=subject, text=text, html=html))
+
+    def _retry_later(self, email: OutboundEmail, delay: float) -> None:
+        email.not_before = time.monotonic() + delay
+        self._loop.call_later(delay, self._queue.put_nowait, email)
+
+    async def _sender(self, connection: _SMTPConnection) -> None:
+        while True:
+            email = await self._queue.get()
+            try:
+                wait = email.not_before - time.monotonic()
+                if wait <= 0:
+                    wait = self._limiter.acquire(email.domain)
+                if wait > 0:
+                    self._retry_later(email, wait)
+                    continue
+                await self._send(connection, email)
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, connection: _SMTPConnection, email: OutboundEmail) -> None:
+        try:
+            await connection.send(email.to_message())
+        except (aiosmtplib.SMTPException, OSError) as e:
+            email.attempts += 1
+            if _is_permanent(e) or email.attempts > settings.EMAIL_MAX_RETRIES:
+                logger.error("Giving up on email to %s after %d attempts: %s", email.to, email.attempts, e)
+                return
+            delay = settings.EMAIL_RETRY_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+            logger.warning("Email to %s failed (%s), retrying in %.0fs", email.to, e, delay)
+            await connection.close()
+            self._retry_later(email, delay)
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+mail_queue = MailQueue()
+
+
+def send_email(to: str, template: str, **context) -> bool:
+    """Render a template and queue it for delivery."""
+    subject, text, html = render(template, **context)
+    return mail_queue.enqueue(OutboundEmail(to=to, subject=subject, text=text, html=html))
+
+
+def send_digest_item(to: str, digest_key: str, label: str, title: str, message: Optional[str] = None) -> bool:
+    """Queue one item of a per-recipient digest (e.g. one discussion reply)."""
+    return mail_queue.enqueue_digest_item(to, digest_key, label, {"title": title, "message": message})
@@ -0,0 +1,91 @@
+"""Email templates.
+
+Each template has a subject, a plain-text body and an HTML body, rendered
+with Jinja2 (HTML autoescaped). Templates receive ``settings`` in addition to
+the caller's context.
+"""
+from typing import Optional, Tuple
+from jinja2 import Environment, DictLoader, StrictUndefined, select_autoescape
+from app.core.config import settings
+
+_LAYOUT = """<!DOCTYPE html>
+<html><body style="font-family: Arial, sans-serif; color: #1f2937;">
+{% block content %}{% endblock %}
+<p style="color: #6b7280; font-size: 12px;">{{ settings.EMAILS_FROM_NAME }}</p>
+</body></html>"""
+
+TEMPLATES = {
+    "password_reset": {
+        "subject": "Reset your {{ settings.PROJECT_NAME }} password",
+        "text": (
+            "Hi {{ name }},\n\n"
+            "Use the link below to reset your password. It expires in {{ expires_minutes }} minutes.\n\n"
+            "{{ reset_url }}\n\n"
+            "If you didn't request this, you can ignore this email."
+        ),
+        "html": (
+            "{% extends 'layout.html' %}{% block content %}"
+            "<p>Hi {{ name }},</p>"
+            "<p>Use the link below to reset your password. It expires in {{ expires_minutes }} minutes.</p>"
+            "<p><a href=\"{{ reset_url }}\">Reset password</a></p>"
+            "<p>If you didn't request this, you can ignore this email.</p>"
+            "{% endblock %}"
+        ),
+    },
+    "test_email": {
+        "subject": "{{ settings.PROJECT_NAME }} test email",
+        "text": "This is a test email sent by {{ sent_by }}. Outbound mail is working.",
+        "html": (
+            "{% extends 'layout.html' %}{% block content %}"
+            "<p>This is a test email sent by {{ sent_by }}. Outbound mail is working.</p>"
+            "{% endblock %}"
+        ),
+    },
+    "notification": {
+        "subject": "{{ title }}",
+        "text": "{{ message or '' }}\n\n{{ settings.FRONTEND_URL }}/dashboard",
+        "html": (
+            "{% extends 'layout.html' %}{% block content %}"
+            "<h3>{{ title }}</h3><p>{{ message or '' }}</p>"
+            "<p><a href=\"{{ settings.FRONTEND_URL }}/dashboard\">Open dashboard</a></p>"
+            "{% endblock %}"
+        ),
+    },
+    "notification_digest": {
+        "subject": "{{ items|length }} new {{ label }}",
+        "text": (
+            "You have {{ items|length }} new {{ label }}:\n\n"
+            "{% for item in items %}- {{ item.title }}\n{% endfor %}\n"
+            "{{ settings.FRONTEND_URL }}/dashboard"
+        ),
+        "html": (
+            "{% extends 'layout.html' %}{% block content %}"
+            "<p>You have {{ items|length }} new {{ label }}:</p><ul>"
+            "{% for item in items %}<li><strong>{{ item.title }}</strong> {{ item.message or '' }}</li>{% endfor %}"
+            "</ul><p><a href=\"{{ settings.FRONTEND_URL }}/dashboard\">Open dashboard</a></p>"
+            "{% endblock %}"
+        ),
+    },
+}
+
+_sources = {"layout.html": _LAYOUT}
+for _name, _parts in TEMPLATES.items():
+    for _part, _source in _parts.items():
+        _sources[f"{_name}.{_part}"] = _source
+
+_env = Environment(
+    loader=DictLoader(_sources),
+    autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+    undefined=StrictUndefined,
+)
+
+
+def render(template: str, **context) -> Tuple[str, str, Optional[str]]:
+    """Render a template into (subject, text, html)."""
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown email template: {template}")
+    context.setdefault("settings", settings)
+    subject = _env.get_template(f"{template}.subject").render(**context).strip()
+    text = _env.get_template(f"{template}.text").render(**context)
+    html = _env.get_template(f"{template}.html").render(**context)
+    return subject, text, html
@@ -0,0 +1,70 @@
+"""Course progress of an enrollment, derived from its completed content items."""
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.db.models.enrollment import Enrollment, ContentProgress, EnrollmentStatus
+from app.db.models.course import Module, ContentItem
+from app.services.certificate_issuance import issue_certificate_for_enrollment
+
+
+def calculate_course_progress(db: Session, enrollment_id: UUID, course_id: UUID) -> float:
+    """Calculate the progress percentage for a course enrollment."""
+    # Get all content items for this course
+    result = db.execute(
+        select(func.count(ContentItem.id))
+        .join(Module, Module.id == ContentItem.module_id)
+        .where(Module.course_id == course_id)
+    )
+    total_items = result.scalar() or 0
+
+    if total_items == 0:
+        return 0.0
+
+    # Get completed content items for this enrollment
+    result = db.execute(
+        select(func.count(ContentProgress.id))
+        .where(
+            (ContentProgress.enrollment_id == enrollment_id) &
+            (ContentProgress.is_completed == True)
+        )
+    )
+    completed_items = result.scalar() or 0
+
+    return round((completed_items / total_items) * 100, 2)
+
+
+def update_enrollment_progress(db: Session, enrollment_id: UUID, course_id: UUID):
+    """Update enrollment progress and status."""
+    progress = calculate_course_progress(db, enrollment_id, course_id)
+
+    result = db.execute(
+        select(Enrollment).where(Enrollment.id == enrollment_id)
+    )
+    enrollment = result.scalar_one_or_none()
+
+    if enrollment:
+        enrollment.progress_percentage = progress
+        enrollment.last_accessed_at = datetime.utcnow()
+
+        # Update status based on progress
+        if progress == 0 and enrollment.status == EnrollmentStatus.enrolled:
+            enrollment.status = EnrollmentStatus.enrolled
+        elif progress > 0 and progress < 100:
+            enrollment.status = EnrollmentStatus.in_progress
+            if not enrollment.started_at:
+                enrollment.started_at = datetime.utcnow()
+        elif progress == 100:
+            enrollment.status = EnrollmentStatus.completed
+            if not enrollment.completed_at:
+                enrollment.completed_at = datetime.utcnow()
+
+                # Auto-generate certificate when course is completed
+                if not enrollment.certificate_issued:
+                    issue_certificate_for_enrollment(db, enrollment)
+
+        db.commit()
+        db.refresh(enrollment)
+
+    return enrollment
@@ -0,0 +1,486 @@
+"""Storing uploaded files.
+
+A file arrives in one of three ways:
+
+- one multipart request, streamed through the API to storage;
+- a resumable upload: the client declares the file, PUTs fixed-size chunks
+  in any order (retrying or resuming after a dropped connection by asking
+  which chunks arrived), then completes it, which concatenates the chunks in
+  object storage;
+- a direct upload: the client PUTs the whole file to a presigned storage URL
+  and then completes it, so the API never sees the bytes.
+
+Either way the bytes are never held whole in memory. Downloads redirect to
+presigned GET URLs for the same reason.
+
+Finished uploads are hashed and handed to the blob store, which keeps one
+copy per content hash; a staff upload that declares a hash already stored is
+complete as soon as it is created.
+
+The content type is sniffed from the first bytes rather than trusted from
+the client, and must match the declared file type and extension.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.file import StoredFile, FileStatus
+from app.services.scheduler import periodic
+from app.services.storage import get_storage, CHUNK_SIZE
+from app.services.blob_store import hashing, hash_object, add_reference, acquire, release
+from app.services.video_processing import asset_prefix
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".wmv", ".flv", ".webm"}
+ALLOWED_DOCUMENT_EXTENSIONS = {".pdf", ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx"}
+ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp"}
+
+ALLOWED_EXTENSIONS = {
+    "video": ALLOWED_VIDEO_EXTENSIONS,
+    "document": ALLOWED_DOCUMENT_EXTENSIONS,
+    "image": ALLOWED_IMAGE_EXTENSIONS,
+}
+
+SNIFF_BYTES = 512
+
+# file_url values handed out for stored files, e.g. /api/v1/files/document/<id>
+_FILE_URL_PATTERN = re.compile(r"/files/(?:video/|document/|image/)?([0-9a-fA-F-]{36})(?:/|$|\?)")
+
+_OFFICE_MIME_TYPES = {
+    ".doc": "application/msword",
+    ".xls": "application/vnd.ms-excel",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"\x1a\x45\xdf\xa3", "video/webm"),
+    (b"FLV\x01", "video/x-flv"),
+    (b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "video/x-ms-wmv"),
+]
+
+_SNIFFED_TYPES = {
+    "video": {"video/mp4", "video/quicktime", "video/webm", "video/x-msvideo", "video/x-ms-wmv", "video/x-flv"},
+    "image": {"image/png", "image/jpeg", "image/gif", "image/bmp", "image/webp", "image/svg+xml"},
+    "document": {"application/pdf", *_OFFICE_MIME_TYPES.values()},
+}
+
+
+class InvalidFile(ValueError):
+    pass
+
+
+class UploadIncomplete(InvalidFile):
+    """Not all bytes have arrived yet; the upload can still be finished."""
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+def sniff_mime_type(head: bytes, ext: str) -> Optional[str]:
+    """Content type from a file's first bytes, or None if unrecognised."""
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    if head.startswith(b"RIFF"):
+        return {b"WEBP": "image/webp", b"AVI ": "video/x-msvideo"}.get(head[8:12])
+    # Office formats are OLE compound files (legacy) or ZIP containers (OOXML); tell them apart by extension
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1") and ext in (".doc", ".xls", ".ppt"):
+        return _OFFICE_MIME_TYPES[ext]
+    if head.startswith(b"PK\x03\x04"):
+        return _OFFICE_MIME_TYPES.get(ext) if ext in (".docx", ".xlsx", ".pptx") else "application/zip"
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if (text.startswith(b"<?xml") or text.startswith(b"<svg")) and b"<svg" in head.lower():
+        return "image/svg+xml"
+    return None
+
+
+def check_extension(filename: str, file_type: str) -> str:
+    """The file's lower-cased extension; raises InvalidFile if the type doesn't allow it."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    allowed = ALLOWED_EXTENSIONS.get(file_type)
+    if allowed is not None and ext not in allowed:
+        raise InvalidFile(f"Invalid {file_type} format. Allowed: {', '.join(sorted(allowed))}")
+    return ext
+
+
+def detect_mime_type(head: bytes, ext: str, file_type: str, declared: Optional[str] = None) -> str:
+    """Sniff the content type and check it against the declared file type."""
+    mime_type = sniff_mime_type(head, ext)
+    allowed = _SNIFFED_TYPES.get(file_type)
+    if allowed is None:
+        return mime_type or declared or "application/octet-stream"
+    if mime_type not in allowed:
+        raise InvalidFile(f"File content is not a valid {file_type}")
+    return mime_type
+
+
+def storage_key(file_type: str, file_id: UUID, ext: str) -> str:
+    return f"files/{file_type}/{file_id}{ext}"
+
+
+def part_key(file_id: UUID, index: int) -> str:
+    return f"uploads/{file_id}/{index:05d}"
+
+
+def _limited(first: bytes, stream: BinaryIO, limit: int, counter: list) -> Iterator[bytes]:
+    counter[0] = len(first)
+    yield first
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        counter[0] += len(chunk)
+        if counter[0] > limit:
+            raise FileTooLarge()
+        yield chunk
+
+
+def store_upload(
+    db: Session,
+    stream: BinaryIO,
+    filename: str,
+    file_type: str,
+    user_id: UUID,
+    folder: Optional[str] = None,
+    declared_mime_type: Optional[str] = None
+) -> StoredFile:
+    """Stream a file to storage and record it. Commits.
+
+    Raises InvalidFile if the name or content doesn't match ``file_type`` and
+    FileTooLarge past ``FILE_MAX_SIZE_BYTES``.
+    """
+    ext = check_extension(filename, file_type)
+    head = stream.read(SNIFF_BYTES)
+    if not head:
+        raise InvalidFile("File is empty")
+    mime_type = detect_mime_type(head, ext, file_type, declared_mime_type)
+
+    file_id = uuid4()
+    key = storage_key(file_type, file_id, ext)
+    storage = get_storage()
+    size = [0]
+    hasher = hashlib.sha256()
+    info = storage.put_stream(
+        key, hashing(_limited(head, stream, settings.FILE_MAX_SIZE_BYTES, size), hasher), mime_type
+    )
+    file_size = info.size if info else size[0]
+
+    try:
+        digest = hasher.hexdigest()
+        record = StoredFile(
+            id=file_id,
+            filename=filename,
+            file_type=file_type,
+            folder=folder,
+            mime_type=mime_type,
+            file_size=file_size,
+            # The blob row must exist before the file that references it
+            storage_key=add_reference(db, digest, file_size, key),
+            content_hash=digest,
+            status=FileStatus.ready,
+            uploaded_by=user_id,
+            completed_at=datetime.utcnow()
+        )
+        db.add(record)
+        db.commit()
+    except Exception:
+        db.rollback()
+        storage.delete(key)
+        raise
+    db.refresh(record)
+    return record
+
+
+def create_upload(
+    db: Session,
+    filename: str,
+    file_type: str,
+    file_size: int,
+    user_id: UUID,
+    folder: Optional[str] = None,
+    chunked: bool = True,
+    content_hash: Optional[str] = None
+) -> StoredFile:
+    """Start a resumable (``chunked``) or direct upload. Commits.
+
+    If ``content_hash`` (SHA-256) names stored content of the same size, the
+    file is created ready and nothing needs to be uploaded. Callers should
+    only pass it for users trusted with any content they can name by hash.
+
+    Raises InvalidFile for a disallowed extension and FileTooLarge past ``FILE_MAX_SIZE_BYTES``.
+    """
+    ext = check_extension(filename, file_type)
+    if file_size > settings.FILE_MAX_SIZE_BYTES:
+        raise FileTooLarge()
+
+    if content_hash:
+        record = _create_from_blob(db, filename, file_type, file_size, user_id, folder, content_hash.lower(), ext)
+        if record is not None:
+            return record
+
+    file_id = uuid4()
+    chunk_size = settings.FILE_UPLOAD_CHUNK_SIZE_BYTES if chunked else None
+    record = StoredFile(
+        id=file_id,
+        filename=filename,
+        file_type=file_type,
+        folder=folder,
+        file_size=file_size,
+        storage_key=storage_key(file_type, file_id, ext),
+        status=FileStatus.uploading,
+        chunk_size=chunk_size,
+        total_chunks=max(1, math.ceil(file_size / chunk_size)) if chunked else None,
+        received_chunks={},
+        uploaded_by=user_id
+    )
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def _create_from_blob(
+    db: Session,
+    filename: str,
+    file_type: str,
+    file_size: int,
+    user_id: UUID,
+    folder: Optional[str],
+    digest: str,
+    ext: str
+) -> Optional[StoredFile]:
+    key = acquire(db, digest, file_size)
+    if key is None:
+        return None
+    try:
+        head = b"".join(get_storage().iter_range(key, 0, SNIFF_BYTES - 1))
+        mime_type = detect_mime_type(head, ext, file_type)
+    except InvalidFile:
+        db.rollback()
+        raise
+    record = StoredFile(
+        filename=filename,
+        file_type=file_type,
+        folder=folder,
+        mime_type=mime_type,
+        file_size=file_size,
+        storage_key=key,
+        content_hash=digest,
+        status=FileStatus.ready,
+        uploaded_by=user_id,
+        completed_at=datetime.utcnow()
+    )
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def expected_chunk_size(upload: StoredFile, index: int) -> int:
+    if index == upload.total_chunks - 1:
+        return upload.file_size - upload.chunk_size * (upload.total_chunks - 1)
+    return upload.chunk_size
+
+
+def put_chunk(db: Session, upload: StoredFile, index: int, data: bytes) -> StoredFile:
+    """Store one chunk of a resumable upload; re-sending a chunk replaces it. Commits.
+
+    Raises InvalidFile for an out-of-range index, a wrong chunk length, or a
+    first chunk whose content doesn't match the declared type.
+    """
+    if upload.status != FileStatus.uploading:
+        raise InvalidFile("Upload is already complete")
+    if upload.chunk_size is None:
+        raise InvalidFile("Upload is not chunked")
+    if not 0 <= index < upload.total_chunks:
+        raise InvalidFile(f"Chunk index must be between 0 and {upload.total_chunks - 1}")
+    if len(data) != expected_chunk_size(upload, index):
+        raise InvalidFile(f"Chunk {index} must be {expected_chunk_size(upload, index)} bytes")
+
+    values = {
+        # Merge rather than overwrite, so concurrent chunk uploads don't lose each other
+        "received_chunks": func.coalesce(StoredFile.received_chunks, literal({}, JSONB)).op("||")(
+            literal({str(index): len(data)}, JSONB)
+        )
+    }
+    if index == 0:
+        ext = os.path.splitext(upload.storage_key)[1]
+        values["mime_type"] = detect_mime_type(data[:SNIFF_BYTES], ext, upload.file_type)
+
+    get_storage().put_bytes(part_key(upload.id, index), data)
+    db.execute(update(StoredFile).where(StoredFile.id == upload.id).values(**values))
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def received_chunk_indexes(upload: StoredFile) -> list:
+    return sorted(int(index) for index in (upload.received_chunks or {}))
+
+
+def presigned_upload_url(upload: StoredFile) -> Tuple[str, datetime]:
+    """Where the client PUTs a direct upload, and until when."""
+    expires = timedelta(seconds=settings.STORAGE_PRESIGNED_PUT_SECONDS)
+    return get_storage().presigned_put_url(upload.storage_key, expires), datetime.utcnow() + expires
+
+
+def download_url(record: StoredFile, inline: bool = False) -> str:
+    """A short-lived presigned URL for the file's bytes."""
+    return get_storage().presigned_get_url(
+        record.storage_key,
+        timedelta(seconds=settings.STORAGE_PRESIGNED_GET_SECONDS),
+        filename=record.filename,
+        content_type=record.mime_type,
+        inline=inline
+    )
+
+
+def stored_file_id(url: str) -> Optional[UUID]:
+    """The id of the stored file an API file URL refers to, if it refers to one."""
+    match = _FILE_URL_PATTERN.search(url or "")
+    if match is None:
+        return None
+    try:
+        return UUID(match.group(1))
+    except ValueError:
+        return None
+
+
+def _assemble_chunks(upload: StoredFile) -> None:
+    missing = sorted(set(range(upload.total_chunks)) - set(received_chunk_indexes(upload)))
+    if missing:
+        raise UploadIncomplete(f"Missing chunks: {', '.join(str(index) for index in missing[:20])}")
+
+    storage = get_storage()
+    parts = [part_key(upload.id, index) for index in range(upload.total_chunks)]
+    info = storage.compose(upload.storage_key, parts, upload.mime_type or "application/octet-stream")
+    if info is None or info.size != upload.file_size:
+        storage.delete(upload.storage_key)
+        raise InvalidFile("Assembled file size does not match the declared size")
+    for key in parts:
+        storage.delete(key)
+
+
+def _check_direct_upload(upload: StoredFile) -> None:
+    """Validate what the client PUT to the presigned URL; rejected objects are deleted."""
+    storage = get_storage()
+    info = storage.stat(upload.storage_key)
+    if info is None:
+        raise UploadIncomplete("File has not been uploaded")
+    try:
+        if info.size != upload.file_size:
+            raise InvalidFile("Uploaded file size does not match the declared size")
+        head = b"".join(storage.iter_range(upload.storage_key, 0, SNIFF_BYTES - 1))
+        ext = os.path.splitext(upload.storage_key)[1]
+        upload.mime_type = detect_mime_type(head, ext, upload.file_type, info.content_type)
+    except InvalidFile:
+        storage.delete(upload.storage_key)
+        raise
+
+
+def complete_upload(db: Session, upload_id: UUID) -> StoredFile:
+    """Finish a resumable or direct upload and mark the file ready. Commits.
+
+    Raises InvalidFile if chunks are missing or the stored bytes fail
+    validation; a file whose stored bytes were rejected is marked failed.
+    """
+    upload = db.execute(
+        select(StoredFile).where(StoredFile.id == upload_id).with_for_update()
+    ).scalar_one()
+    if upload.status != FileStatus.uploading:
+        db.rollback()
+        if upload.status == FileStatus.ready:
+            return upload
+        raise InvalidFile("Upload failed validation")
+
+    try:
+        if upload.chunk_size is None:
+            _check_direct_upload(upload)
+        else:
+            _assemble_chunks(upload)
+    except UploadIncomplete:
+        db.rollback()
+        raise
+    except InvalidFile:
+        upload.status = FileStatus.failed
+        db.commit()
+        raise
+
+    digest, size = hash_object(upload.storage_key)
+    upload.storage_key = add_reference(db, digest, size, upload.storage_key)
+    upload.content_hash = digest
+    upload.status = FileStatus.ready
+    upload.completed_at = datetime.utcnow()
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def delete_file(db: Session, record: StoredFile) -> None:
+    """Delete a file record and its stored bytes (and any leftover chunks). Commits.
+
+    Deduplicated content is only dereferenced; the blob store collects it
+    once nothing else uses it.
+    """
+    keys = [part_key(record.id, index) for index in received_chunk_indexes(record)]
+    if record.content_hash:
+        release(db, record.content_hash)
+    else:
+        keys.append(record.storage_key)
+    # Transcoded renditions and thumbnails live under their own prefix
+    asset_prefixes = [asset_prefix(record.id)] if record.processing_status is not None else []
+    db.delete(record)
+    db.commit()
+    storage = get_storage()
+    for key in keys:
+        storage.delete(key)
+    for prefix in asset_prefixes:
+        storage.delete_prefix(prefix)
+
+
+def expire_uploads(db: Session) -> int:
+    """Delete resumable uploads left unfinished past ``FILE_UPLOAD_EXPIRY_HOURS``."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.FILE_UPLOAD_EXPIRY_HOURS)
+    stale = db.execute(
+        select(StoredFile).where(
+            StoredFile.status != FileStatus.ready,
+            StoredFile.created_at < cutoff
+        )
+    ).scalars().all()
+    for record in stale:
+        delete_file(db, record)
+    return len(stale)
+
+
+@periodic(settings.FILE_UPLOAD_CLEANUP_INTERVAL_SECONDS)
+def run_upload_cleanup() -> None:
+    db = SessionLocal()
+    try:
+        expired = expire_uploads(db)
+        if expired:
+            logger.info("Deleted %d expired uploads", expired)
+    finally:
+        db.close()
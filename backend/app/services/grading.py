@@ -0,0 +1,395 @@
+"""Assessment grading.
+
+An assessment's questions are compiled once into an ``AnswerKey``: canonical
+accepted answers per question plus a points vector. Keys are cached per
+process and tagged with a version derived from the questions' row count and
+latest ``updated_at``, so editing a question recompiles the key on every
+worker without explicit invalidation.
+
+Grading works on a batch of attempts at a time, one question column at a
+time, so submitting a single attempt and re-grading every attempt of an
+assessment share the same code. Scorers by type:
+
+- ``multiple_choice`` with one correct value, and ``true_false``: canonical
+  equality.
+- ``multiple_choice`` with several correct values: set equality, or with
+  ``partial_credit`` (correct picks - wrong picks) / number correct.
+- ``short_answer``: case/space/punctuation-insensitive match against the
+  accepted answers, then a fuzzy match at ``fuzzy_threshold`` (default 0.85).
+- ``essay``: left pending for manual grading.
+
+``correct_answer`` holds ``{"value": ...}`` or ``{"values": [...]}`` (also
+``answer``/``answers``/``accepted``), with optional ``partial_credit``,
+``case_sensitive`` and ``fuzzy_threshold``. Submitted answers may be the raw
+value or wrapped the same way.
+"""
+import re
+import string
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from app.db.models.assessment import Assessment, Question, AssessmentAttempt, QuestionType
+
+REGRADE_CHUNK_SIZE = 1000
+DEFAULT_FUZZY_THRESHOLD = 0.85
+KEY_CACHE_SIZE = 256
+
+_VALUE_FIELDS = ("value", "values", "answer", "answers", "accepted")
+_TRUE = {"true", "t", "yes", "1"}
+_FALSE = {"false", "f", "no", "0"}
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    id: str
+    kind: str  # "choice", "boolean", "multi", "text" or "manual"
+    points: float
+    accepted: Tuple[str, ...] = ()
+    partial_credit: bool = False
+    case_sensitive: bool = False
+    fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD
+
+
+@dataclass
+class AnswerKey:
+    version: str
+    questions: List[CompiledQuestion]
+    points: np.ndarray = field(repr=False)
+
+    @property
+    def total_points(self) -> float:
+        return float(self.points.sum())
+
+    @property
+    def manual_question_ids(self) -> List[str]:
+        return [q.id for q in self.questions if q.kind == "manual"]
+
+
+def _unwrap(answer: Any) -> Any:
+    if isinstance(answer, dict):
+        for name in _VALUE_FIELDS:
+            if name in answer:
+                return answer[name]
+        return None
+    return answer
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+def _canonical(value: Any) -> Optional[str]:
+    """Canonical form of a choice value: 2, "2" and " 2 " all compare equal."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().casefold()
+
+
+def _canonical_bool(value: Any) -> Optional[str]:
+    canonical = _canonical(value)
+    if canonical in _TRUE:
+        return "true"
+    if canonical in _FALSE:
+        return "false"
+    return canonical
+
+
+def _normalize_text(value: Any, case_sensitive: bool) -> Optional[str]:
+    if value is None:
+        return None
+    text = _WHITESPACE.sub(" ", str(value).translate(_PUNCTUATION)).strip()
+    return text if case_sensitive else text.casefold()
+
+
+def compile_question(question: Question) -> CompiledQuestion:
+    spec = question.correct_answer if isinstance(question.correct_answer, dict) else {"value": question.correct_answer}
+    values = _as_list(_unwrap(spec))
+    points = float(question.points or 0)
+    question_id = str(question.id)
+
+    if question.question_type == QuestionType.essay:
+        return CompiledQuestion(id=question_id, kind="manual", points=points)
+
+    if question.question_type == QuestionType.short_answer:
+        case_sensitive = bool(spec.get("case_sensitive", False))
+        accepted = tuple(a for a in (_normalize_text(v, case_sensitive) for v in values) if a)
+        return CompiledQuestion(
+            id=question_id,
+            kind="text",
+            points=points,
+            accepted=accepted,
+            case_sensitive=case_sensitive,
+            fuzzy_threshold=float(spec.get("fuzzy_threshold", DEFAULT_FUZZY_THRESHOLD))
+        )
+
+    if question.question_type == QuestionType.true_false:
+        accepted = tuple(dict.fromkeys(c for c in (_canonical_bool(v) for v in values) if c))
+        return CompiledQuestion(id=question_id, kind="boolean", points=points, accepted=accepted)
+
+    accepted = tuple(dict.fromkeys(c for c in (_canonical(v) for v in values) if c))
+    if len(accepted) > 1 or spec.get("multiple"):
+        return CompiledQuestion(
+            id=question_id,
+            kind="multi",
+            points=points,
+            accepted=accepted,
+            partial_credit=bool(spec.get("partial_credit", False))
+        )
+    return CompiledQuestion(id=question_id, kind="choice", points=points, accepted=accepted)
+
+
+def compile_answer_key(questions: Sequence[Question], version: str) -> AnswerKey:
+    compiled = [compile_question(q) for q in questions]
+    return AnswerKey(
+        version=version,
+        questions=compiled,
+        points=np.array([q.points for q in compiled], dtype=float)
+    )
+
+
+_keys: "OrderedDict[str, AnswerKey]" = OrderedDict()
+_keys_lock = threading.Lock()
+
+
+def answer_key_version(db: Session, assessment_id: UUID) -> str:
+    count, last_updated = db.execute(
+        select(func.count(Question.id), func.max(Question.updated_at))
+        .where(Question.assessment_id == assessment_id)
+    ).one()
+    return f"{count}:{last_updated.isoformat() if last_updated else ''}"
+
+
+def get_answer_key(db: Session, assessment_id: UUID) -> AnswerKey:
+    """Compiled answer key for an assessment, recompiled only when its questions change."""
+    version = answer_key_version(db, assessment_id)
+    cache_key = str(assessment_id)
+    with _keys_lock:
+        key = _keys.get(cache_key)
+        if key is not None and key.version == version:
+            _keys.move_to_end(cache_key)
+            return key
+
+    questions = db.execute(
+        select(Question)
+        .where(Question.assessment_id == assessment_id)
+        .order_by(Question.order_index, Question.created_at)
+    ).scalars().all()
+    key = compile_answer_key(questions, version)
+    with _keys_lock:
+        _keys[cache_key] = key
+        _keys.move_to_end(cache_key)
+        while len(_keys) > KEY_CACHE_SIZE:
+            _keys.popitem(last=False)
+    return key
+
+
+def selected_options(question: CompiledQuestion, answer: Any) -> Tuple[str, ...]:
+    """Canonical options picked in an answer to a choice question (empty if unanswered)."""
+    canonical = _canonical_bool if question.kind == "boolean" else _canonical
+    return tuple(sorted(set(filter(None, (canonical(v) for v in _as_list(_unwrap(answer)))))))
+
+
+def _score_choice(question: CompiledQuestion, answers: List[Any], canonical) -> np.ndarray:
+    values = np.array([canonical(_unwrap(a)) or "" for a in answers], dtype=str)
+    return np.isin(values, np.array(question.accepted, dtype=str)).astype(float)
+
+
+def _score_multi(question: CompiledQuestion, answers: List[Any]) -> np.ndarray:
+    selections = [set(filter(None, (_canonical(v) for v in _as_list(_unwrap(a))))) for a in answers]
+    vocabulary = {value: i for i, value in enumerate(question.accepted)}
+    for selected in selections:
+        for value in selected:
+            vocabulary.setdefault(value, len(vocabulary))
+
+    selected_matrix = np.zeros((len(answers), len(vocabulary)), dtype=bool)
+    for row, selected in enumerate(selections):
+        selected_matrix[row, [vocabulary[v] for v in selected]] = True
+    correct = np.zeros(len(vocabulary), dtype=bool)
+    correct[:len(question.accepted)] = True
+
+    hits = selected_matrix[:, correct].sum(axis=1)
+    wrong = selected_matrix[:, ~correct].sum(axis=1)
+    required = max(len(question.accepted), 1)
+    if question.partial_credit:
+        return np.clip((hits - wrong) / required, 0.0, 1.0)
+    return ((hits == required) & (wrong == 0)).astype(float)
+
+
+def _score_text(question: CompiledQuestion, answers: List[Any]) -> np.ndarray:
+    values = np.array(
+        [_normalize_text(_unwrap(a), question.case_sensitive) or "" for a in answers], dtype=str
+    )
+    scores = np.isin(values, np.array(question.accepted, dtype=str)).astype(float)
+    if question.fuzzy_threshold < 1:
+        for i in np.flatnonzero(scores == 0):
+            if values[i] and any(
+                SequenceMatcher(None, values[i], accepted).ratio() >= question.fuzzy_threshold
+                for accepted in question.accepted
+            ):
+                scores[i] = 1.0
+    return scores
+
+
+def _score_manual(question: CompiledQuestion, answers: List[Any], previous: List[Optional[Dict]]) -> np.ndarray:
+    """Keep earlier manual marks; unanswered essays score 0, answered ones stay pending (NaN)."""
+    scores = np.full(len(answers), np.nan)
+    for i, (answer, grading) in enumerate(zip(answers, previous)):
+        manual = (grading or {}).get("manual", {})
+        if question.id in manual:
+            scores[i] = min(float(manual[question.id]), question.points)
+        elif _unwrap(answer) in (None, ""):
+            scores[i] = 0.0
+    return scores
+
+
+def score_matrix(
+    key: AnswerKey, answer_sets: List[Dict[str, Any]], previous: Optional[List[Optional[Dict]]] = None
+) -> np.ndarray:
+    """Points earned per (attempt, question); NaN marks answers awaiting manual grading."""
+    previous = previous or [None] * len(answer_sets)
+    earned = np.zeros((len(answer_sets), len(key.questions)))
+    for column, question in enumerate(key.questions):
+        answers = [(answer_set or {}).get(question.id) for answer_set in answer_sets]
+        if question.kind == "manual":
+            earned[:, column] = _score_manual(question, answers, previous)
+            continue
+        if question.kind == "multi":
+            fraction = _score_multi(question, answers)
+        elif question.kind == "text":
+            fraction = _score_text(question, answers)
+        elif question.kind == "boolean":
+            fraction = _score_choice(question, answers, _canonical_bool)
+        else:
+            fraction = _score_choice(question, answers, _canonical)
+        earned[:, column] = fraction * question.points
+    return earned
+
+
+def summarize(
+    key: AnswerKey, earned: np.ndarray, pass_percentage: float, previous: Optional[List[Optional[Dict]]] = None
+) -> List[Dict[str, Any]]:
+    """Turn a score matrix into attempt fields (score, passed, needs_manual_grading, graded_at, grading)."""
+    previous = previous or [None] * earned.shape[0]
+    pending = np.isnan(earned)
+    totals = np.nansum(earned, axis=1)
+    total_points = key.total_points
+    scores = np.round(totals / total_points * 100, 2) if total_points > 0 else np.zeros(len(totals))
+    needs_manual = pending.any(axis=1)
+    passed = (scores >= pass_percentage) & ~needs_manual
+
+    question_ids = [q.id for q in key.questions]
+    graded_at = datetime.utcnow()
+    results = []
+    for row in range(earned.shape[0]):
+        results.append({
+            "score": float(scores[row]),
+            "passed": bool(passed[row]),
+            "needs_manual_grading": bool(needs_manual[row]),
+            "graded_at": graded_at,
+            "grading": {
+                "version": key.version,
+                "points": {
+                    qid: None if pending[row, col] else round(float(earned[row, col]), 2)
+                    for col, qid in enumerate(question_ids)
+                },
+                "manual": (previous[row] or {}).get("manual", {})
+            }
+        })
+    return results
+
+
+def grade_attempt(db: Session, assessment: Assessment, attempt: AssessmentAttempt, answers: Dict[str, Any]) -> None:
+    """Grade one submission onto `attempt`. Does not commit."""
+    key = get_answer_key(db, assessment.id)
+    earned = score_matrix(key, [answers], [attempt.grading])
+    result = summarize(key, earned, float(assessment.pass_percentage or 0), [attempt.grading])[0]
+    attempt.answers = answers
+    for name, value in result.items():
+        setattr(attempt, name, value)
+
+
+def apply_manual_grades(
+    db: Session, assessment: Assessment, attempt: AssessmentAttempt, points: Dict[str, float]
+) -> None:
+    """Record instructor marks for manually graded questions and re-score. Does not commit."""
+    key = get_answer_key(db, assessment.id)
+    limits = {q.id: q.points for q in key.questions if q.kind == "manual"}
+    unknown = set(points) - set(limits)
+    if unknown:
+        raise ValueError(f"Not manually graded questions: {', '.join(sorted(unknown))}")
+    for question_id, value in points.items():
+        if not 0 <= value <= limits[question_id]:
+            raise ValueError(f"Points for {question_id} must be between 0 and {limits[question_id]:g}")
+
+    grading = dict(attempt.grading or {})
+    grading["manual"] = {**grading.get("manual", {}), **{qid: float(v) for qid, v in points.items()}}
+    earned = score_matrix(key, [attempt.answers or {}], [grading])
+    result = summarize(key, earned, float(assessment.pass_percentage or 0), [grading])[0]
+    for name, value in result.items():
+        setattr(attempt, name, value)
+
+
+def regrade_assessment(db: Session, assessment: Assessment) -> Dict[str, int]:
+    """Re-grade every submitted attempt against the current key. Does not commit.
+
+    Attempts are scored in chunks of REGRADE_CHUNK_SIZE and written back with
+    one executemany UPDATE per chunk.
+    """
+    key = get_answer_key(db, assessment.id)
+    pass_percentage = float(assessment.pass_percentage or 0)
+    regraded = changed = 0
+    after_id = None
+
+    while True:
+        query = select(
+            AssessmentAttempt.id,
+            AssessmentAttempt.answers,
+            AssessmentAttempt.grading,
+            AssessmentAttempt.score,
+            AssessmentAttempt.passed
+        ).where(
+            AssessmentAttempt.assessment_id == assessment.id,
+            AssessmentAttempt.submitted_at != None
+        )
+        if after_id is not None:
+            query = query.where(AssessmentAttempt.id > after_id)
+        rows = db.execute(query.order_by(AssessmentAttempt.id).limit(REGRADE_CHUNK_SIZE)).all()
+        if not rows:
+            break
+
+        previous = [row.grading for row in rows]
+        earned = score_matrix(key, [row.answers or {} for row in rows], previous)
+        results = summarize(key, earned, pass_percentage, previous)
+        db.execute(
+            update(AssessmentAttempt).execution_options(synchronize_session=False),
+            [{"id": row.id, **result} for row, result in zip(rows, results)]
+        )
+
+        regraded += len(rows)
+        changed += sum(
+            1 for row, result in zip(rows, results)
+            if row.score is None or float(row.score) != result["score"] or row.passed != result["passed"]
+        )
+        after_id = rows[-1].id
+        if len(rows) < REGRADE_CHUNK_SIZE:
+            break
+
+    return {"regraded": regraded, "changed": changed}
@@ -0,0 +1,189 @@
+"""Resized WebP/JPEG derivatives of uploaded images.
+
+Originals are served at whatever size they were uploaded, so a page of course
+cards would download megabytes. Instead images are requested at a width,
+rounded up to one of ``IMAGE_DERIVATIVE_WIDTHS``, and in WebP when the client
+accepts it. Each derivative is rendered once (the common widths right after
+upload, the rest on first request) and stored content-addressed under
+``derivatives/images/`` by the SHA-256 of its bytes. Its URL therefore never
+changes meaning and can be cached as immutable. A width larger than the
+original renders the original size, which hashes to the same object, so
+oversized buckets cost nothing to store.
+"""
+import hashlib
+import io
+import logging
+import re
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from PIL import Image, ImageOps
+from sqlalchemy import update, func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.file import StoredFile, FileStatus
+from app.services.storage import get_storage, LocalStorage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_PREFIX = "derivatives/images"
+# Pillow format, content type and extension per output format
+FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+SPOOL_BYTES = 16 * 1024 * 1024
+
+_IMAGE_URL_PATTERN = re.compile(r"/files/image/([0-9a-fA-F-]{36})(?:/|$|\?)")
+DERIVATIVE_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})(\.webp|\.jpg)$")
+
+# Striped locks: concurrent first requests for one image render it once per process
+_render_locks = [threading.Lock() for _ in range(64)]
+
+
+def pick_width(requested: Optional[int]) -> int:
+    """The smallest configured width at least as wide as requested (the largest if none is)."""
+    widths = sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+    if requested is None:
+        return widths[-1]
+    return next((width for width in widths if width >= requested), widths[-1])
+
+
+def pick_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """An explicitly requested format, else WebP if the Accept header allows it, else JPEG."""
+    if requested in FORMATS:
+        return requested
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+def spec_name(width: int, fmt: str) -> str:
+    return f"{width}.{fmt}"
+
+
+def derivative_key(digest: str, fmt: str) -> str:
+    return f"{DERIVATIVE_PREFIX}/{digest[:2]}/{digest}{FORMATS[fmt][2]}"
+
+
+def derivative_url(digest: str, fmt: str) -> str:
+    return f"{settings.API_V1_STR}/files/derivatives/{digest}{FORMATS[fmt][2]}"
+
+
+def image_url(file_id: UUID) -> str:
+    return f"{settings.API_V1_STR}/files/image/{file_id}"
+
+
+def srcset(file_id: UUID) -> str:
+    """A ``srcset`` attribute offering every configured width."""
+    url = image_url(file_id)
+    return ", ".join(f"{url}?w={width} {width}w" for width in sorted(settings.IMAGE_DERIVATIVE_WIDTHS))
+
+
+def srcset_for_url(url: Optional[str]) -> Optional[str]:
+    """The ``srcset`` for an uploaded image's URL; None for any other URL."""
+    match = _IMAGE_URL_PATTERN.search(url or "")
+    if match is None:
+        return None
+    try:
+        return srcset(UUID(match.group(1)))
+    except ValueError:
+        return None
+
+
+def _open_source(record: StoredFile):
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        return open(storage.path(record.storage_key), "rb")
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    for chunk in storage.iter_range(record.storage_key):
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def load_image(f, max_width: int) -> Image.Image:
+    """Decode an image upright, in RGB or RGBA, at no less than ``max_width``."""
+    image = Image.open(f)
+    if image.format == "JPEG":
+        # Let libjpeg decode at a reduced scale when the source is much larger
+        image.draft("RGB", (max_width, max_width))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def render(image: Image.Image, width: int, fmt: str) -> bytes:
+    """Encode ``image`` at ``width`` (never upscaled) in ``fmt``."""
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if fmt == "jpeg" and image.mode == "RGBA":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, "JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _store(data: bytes, fmt: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    key = derivative_key(digest, fmt)
+    storage = get_storage()
+    # Identical bytes are already stored under the same key
+    if storage.stat(key) is None:
+        storage.put_stream(key, [data], FORMATS[fmt][1])
+    return digest
+
+
+def ensure_derivatives(db: Session, record: StoredFile, specs: Iterable[Tuple[int, str]]) -> Dict[str, str]:
+    """Render whichever of the (width, format) specs are missing. Commits if any were.
+
+    Returns the record's derivatives, spec name -> digest. The source is
+    decoded once for all missing specs.
+    """
+    specs = list(specs)
+    with _render_locks[hash(record.id) % len(_render_locks)]:
+        db.refresh(record, ["derivatives"])
+        existing = dict(record.derivatives or {})
+        missing = [(width, fmt) for width, fmt in specs if spec_name(width, fmt) not in existing]
+        if not missing:
+            return existing
+
+        with _open_source(record) as f:
+            image = load_image(f, max(width for width, _ in missing))
+            rendered = {spec_name(width, fmt): _store(render(image, width, fmt), fmt) for width, fmt in missing}
+
+        db.execute(
+            update(StoredFile)
+            .where(StoredFile.id == record.id)
+            .values(derivatives=func.coalesce(StoredFile.derivatives, literal({}, JSONB)).op("||")(
+                literal(rendered, JSONB)
+            ))
+        )
+        db.commit()
+        return {**existing, **rendered}
+
+
+def generate_eager(file_id: UUID) -> None:
+    """Render the ``IMAGE_EAGER_WIDTHS`` derivatives of a new upload, in both formats."""
+    db = SessionLocal()
+    try:
+        record = db.get(StoredFile, file_id)
+        if record is None or record.status != FileStatus.ready:
+            return
+        ensure_derivatives(db, record, [
+            (width, fmt) for width in settings.IMAGE_EAGER_WIDTHS for fmt in FORMATS
+        ])
+    except Exception:
+        # Not fatal: the derivatives are rendered on first request instead
+        logger.exception("Rendering derivatives of image %s failed", file_id)
+    finally:
+        db.close()
@@ -0,0 +1,236 @@
+"""Item analysis for assessment questions.
+
+Submitted attempts are unpacked into columnar form (points earned and
+seconds spent per question, options picked for choice questions) and the
+statistics are computed over whole columns with NumPy:
+
+- difficulty (p-value): mean fraction of the question's points earned;
+- discrimination index: p-value of the top 27% of attempts by total score
+  minus that of the bottom 27%;
+- item-rest correlation: correlation between the question's score and the
+  rest of the attempt's score;
+- distractor frequencies: how often each option was picked;
+- mean and median time per question, from client-reported times.
+
+Each worker keeps the columns per assessment and refreshes them
+incrementally: only attempts graded since the last refresh (by
+``graded_at``) are read and upserted. Editing the questions changes the
+answer key version and rebuilds the columns from scratch.
+"""
+import math
+import threading
+import warnings
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.models.assessment import AssessmentAttempt
+from app.services.grading import AnswerKey, get_answer_key, score_matrix, selected_options
+
+GROUP_FRACTION = 0.27
+FETCH_BATCH_SIZE = 2000
+STATE_CACHE_SIZE = 64
+# Re-read attempts graded shortly before the watermark, in case their transaction committed late
+WATERMARK_OVERLAP = timedelta(seconds=60)
+
+_CHOICE_KINDS = ("choice", "boolean", "multi")
+
+
+@dataclass
+class _Row:
+    graded_at: Optional[datetime]
+    earned: np.ndarray
+    times: np.ndarray
+    choices: List[Optional[Tuple[str, ...]]]
+
+
+@dataclass
+class _AssessmentState:
+    key: AnswerKey
+    watermark: Optional[datetime] = None
+    rows: Dict[UUID, _Row] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_states: "OrderedDict[str, _AssessmentState]" = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def _state_for(key: AnswerKey, assessment_id: UUID) -> _AssessmentState:
+    cache_key = str(assessment_id)
+    with _states_lock:
+        state = _states.get(cache_key)
+        if state is None or state.key.version != key.version:
+            state = _states[cache_key] = _AssessmentState(key=key)
+        _states.move_to_end(cache_key)
+        while len(_states) > STATE_CACHE_SIZE:
+            _states.popitem(last=False)
+        return state
+
+
+def _unpack(key: AnswerKey, rows: List) -> Dict[UUID, _Row]:
+    """Turn a batch of attempt rows into per-question columns."""
+    earned = score_matrix(key, [row.answers or {} for row in rows], [row.grading for row in rows])
+    unpacked = {}
+    for i, row in enumerate(rows):
+        answers = row.answers or {}
+        times = row.question_times or {}
+        unpacked[row.id] = _Row(
+            graded_at=row.graded_at,
+            earned=earned[i],
+            times=np.array([times.get(q.id, np.nan) for q in key.questions], dtype=float),
+            choices=[
+                selected_options(q, answers.get(q.id)) if q.kind in _CHOICE_KINDS else None
+                for q in key.questions
+            ]
+        )
+    return unpacked
+
+
+def _refresh(db: Session, state: _AssessmentState, assessment_id: UUID) -> bool:
+    """Read attempts graded since the watermark; returns whether anything changed."""
+    query = select(
+        AssessmentAttempt.id,
+        AssessmentAttempt.answers,
+        AssessmentAttempt.grading,
+        AssessmentAttempt.question_times,
+        AssessmentAttempt.graded_at
+    ).where(
+        AssessmentAttempt.assessment_id == assessment_id,
+        AssessmentAttempt.submitted_at != None
+    )
+    if state.watermark is not None:
+        query = query.where(AssessmentAttempt.graded_at > state.watermark - WATERMARK_OVERLAP)
+
+    changed = False
+    result = db.execute(query.execution_options(yield_per=FETCH_BATCH_SIZE))
+    for rows in result.partitions():
+        fresh = [
+            row for row in rows
+            if row.id not in state.rows or state.rows[row.id].graded_at != row.graded_at
+        ]
+        if not fresh:
+            continue
+        state.rows.update(_unpack(state.key, fresh))
+        graded = [row.graded_at for row in fresh if row.graded_at is not None]
+        if graded:
+            state.watermark = max([state.watermark, *graded] if state.watermark else graded)
+        changed = True
+    return changed
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    counts = mask.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(mask, values, 0).sum(axis=0) / counts
+
+
+def _item_rest_correlation(fractions: np.ndarray, earned: np.ndarray) -> np.ndarray:
+    """Pearson correlation of each question's score with the rest of the attempt, per column."""
+    mask = ~np.isnan(fractions)
+    rest = np.nansum(earned, axis=1)[:, None] - np.nan_to_num(earned)
+    f_centered = fractions - _masked_mean(fractions, mask)
+    r_centered = rest - _masked_mean(rest, mask)
+    covariance = _masked_mean(f_centered * r_centered, mask)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return covariance / np.sqrt(_masked_mean(f_centered ** 2, mask) * _masked_mean(r_centered ** 2, mask))
+
+
+def _number(value: float, digits: int = 4) -> Optional[float]:
+    return None if value is None or math.isnan(value) or math.isinf(value) else round(float(value), digits)
+
+
+def compute_statistics(key: AnswerKey, rows: List[_Row]) -> Dict[str, Any]:
+    question_count = len(key.questions)
+    if not rows or not question_count:
+        return {
+            "attempts": len(rows),
+            "mean_score": None,
+            "questions": [
+                {"question_id": q.id, "scoring": q.kind, "responses": 0, "distractors": {}}
+                for q in key.questions
+            ]
+        }
+
+    earned = np.vstack([row.earned for row in rows])
+    times = np.vstack([row.times for row in rows])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = np.where(key.points > 0, earned / key.points, np.nan)
+    graded = ~np.isnan(fractions)
+    totals = np.nansum(earned, axis=1)
+
+    p_values = _masked_mean(fractions, graded)
+    correlations = _item_rest_correlation(fractions, earned)
+
+    # Discrimination: upper vs lower 27% by total score
+    group_size = max(1, int(round(len(rows) * GROUP_FRACTION)))
+    order = np.argsort(totals, kind="stable")
+    lower, upper = order[:group_size], order[-group_size:]
+    discrimination = (
+        _masked_mean(fractions[upper], graded[upper]) - _masked_mean(fractions[lower], graded[lower])
+        if len(rows) >= 2 else np.full(question_count, np.nan)
+    )
+
+    timed = ~np.isnan(times)
+    mean_times = _masked_mean(times, timed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median_times = np.nanmedian(times, axis=0)
+
+    total_points = key.total_points
+    questions = []
+    for j, question in enumerate(key.questions):
+        stats = {
+            "question_id": question.id,
+            "scoring": question.kind,
+            "responses": int(graded[:, j].sum()),
+            "pending_manual": int((~graded[:, j]).sum()),
+            "p_value": _number(p_values[j]),
+            "discrimination_index": _number(discrimination[j]),
+            "item_rest_correlation": _number(correlations[j]),
+            "mean_time_seconds": _number(mean_times[j], 1),
+            "median_time_seconds": _number(median_times[j], 1),
+            "distractors": {}
+        }
+        if question.kind in _CHOICE_KINDS:
+            picks = Counter()
+            omitted = 0
+            for row in rows:
+                selected = row.choices[j]
+                if selected:
+                    picks.update(selected)
+                else:
+                    omitted += 1
+            stats["distractors"] = {
+                option: {"count": count, "correct": option in question.accepted}
+                for option, count in picks.most_common()
+            }
+            stats["omitted"] = omitted
+        questions.append(stats)
+
+    return {
+        "attempts": len(rows),
+        "mean_score": _number(totals.mean() / total_points * 100, 2) if total_points > 0 else None,
+        "questions": questions
+    }
+
+
+def get_item_analysis(db: Session, assessment_id: UUID) -> Dict[str, Any]:
+    """Item statistics for an assessment, refreshed with attempts graded since the last call."""
+    key = get_answer_key(db, assessment_id)
+    state = _state_for(key, assessment_id)
+    with state.lock:
+        if _refresh(db, state, assessment_id) or state.result is None:
+            state.result = {
+                "assessment_id": str(assessment_id),
+                "answer_key_version": key.version,
+                **compute_statistics(key, list(state.rows.values())),
+                "computed_at": datetime.utcnow().isoformat()
+            }
+        return state.result
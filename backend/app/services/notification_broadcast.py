@@ -0,0 +1,170 @@
+"""Fan a notification out to an audience of users.
+
+Rows are materialized with chunked ``INSERT ... SELECT`` statements walking the
+audience in user-id order, so nothing is loaded into Python per recipient.
+Each chunk commits and updates ``delivered_count`` on the broadcast record,
+which is what the progress endpoint reports, then pushes and emails the
+chunk's recipients.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict
+from uuid import UUID
+
+from sqlalchemy import select, insert, update, and_, func, literal, any_
+from sqlalchemy.orm import Session
+from app.db.session import SessionLocal
+from app.db.models.user import User
+from app.db.models.department import Department
+from app.db.models.enrollment import Enrollment, EnrollmentStatus
+from app.db.models.learning_path import LearningPath
+from app.db.models.notification import Notification, NotificationBroadcast, BroadcastStatus
+from app.services.notification_broker import get_broker, publish_unread_count
+from app.services.notification_counters import adjust_unread_counts
+from app.services.notification_email import email_notifications
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+
+def audience_conditions(audience: Dict[str, Any]) -> list:
+    """SQL conditions on `User` for an audience selector (combined with AND)."""
+    conditions = [User.is_active == True, User.deleted_at.is_(None)]
+    
+    if audience.get("roles"):
+        conditions.append(User.role.in_(audience["roles"]))
+    
+    if audience.get("departments"):
+        conditions.append(User.department.in_(audience["departments"]))
+    
+    if audience.get("course_id"):
+        conditions.append(User.id.in_(
+            select(Enrollment.user_id).where(
+                and_(
+                    Enrollment.course_id == UUID(str(audience["course_id"])),
+                    Enrollment.status != EnrollmentStatus.dropped
+                )
+            )
+        ))
+    
+    if audience.get("learning_path_id"):
+        # Users store their department by name; paths target department ids
+        conditions.append(User.department.in_(
+            select(Department.name)
+            .join(LearningPath, Department.id == any_(LearningPath.target_departments))
+            .where(LearningPath.id == UUID(str(audience["learning_path_id"])))
+        ))
+    
+    return conditions
+
+
+def count_audience(db: Session, audience: Dict[str, Any]) -> int:
+    """Number of users an audience selector currently matches."""
+    return db.execute(
+        select(func.count(User.id)).where(and_(*audience_conditions(audience)))
+    ).scalar()
+
+
+def _deliver_chunk(db: Session, broadcast: NotificationBroadcast, after_id, created_at: datetime):
+    """Insert notifications for the next chunk of recipients; returns (user_id, notification_id) rows."""
+    conditions = audience_conditions(broadcast.audience)
+    if after_id is not None:
+        conditions.append(User.id > after_id)
+    
+    recipients = (
+        select(
+            func.gen_random_uuid(),
+            User.id,
+            literal(broadcast.type),
+            literal(broadcast.title),
+            literal(broadcast.message),
+            literal(broadcast.data, Notification.data.type),
+            literal(False),
+            literal(created_at)
+        )
+        .where(and_(*conditions))
+        .order_by(User.id)
+        .limit(CHUNK_SIZE)
+    )
+    result = db.execute(
+        insert(Notification)
+        .from_select(
+            ["id", "user_id", "type", "title", "message", "data", "is_read", "created_at"],
+            recipients
+        )
+        .returning(Notification.user_id, Notification.id)
+    )
+    return result.all()
+
+
+def _push(broadcast: NotificationBroadcast, rows, created_at: datetime) -> None:
+    """Push the new notifications and any known unread counts to recipients."""
+    payload = {
+        "title": broadcast.title,
+        "message": broadcast.message,
+        "notification_type": broadcast.type,
+        "link": None,
+        "metadata": broadcast.data,
+        "is_read": False,
+        "created_at": created_at.isoformat(),
+        "read_at": None,
+    }
+    broker = get_broker()
+    for user_id, notification_id in rows:
+        broker.publish(user_id, "notification", {**payload, "id": str(notification_id), "user_id": str(user_id)})
+    
+    for user_id, unread_count in adjust_unread_counts([user_id for user_id, _ in rows], 1).items():
+        publish_unread_count(user_id, unread_count)
+
+
+def run_broadcast(broadcast_id: UUID) -> None:
+    """Deliver a pending broadcast; intended to run as a background task."""
+    db = SessionLocal()
+    try:
+        broadcast = db.get(NotificationBroadcast, broadcast_id)
+        if broadcast is None or broadcast.status != BroadcastStatus.pending:
+            return
+        
+        broadcast.status = BroadcastStatus.running
+        broadcast.started_at = datetime.utcnow()
+        broadcast.total_recipients = count_audience(db, broadcast.audience)
+        db.commit()
+        
+        created_at = datetime.utcnow()
+        after_id = None
+        while True:
+            rows = _deliver_chunk(db, broadcast, after_id, created_at)
+            if not rows:
+                break
+            
+            after_id = max(user_id for user_id, _ in rows)
+            db.execute(
+                update(NotificationBroadcast)
+                .where(NotificationBroadcast.id == broadcast_id)
+                .values(delivered_count=NotificationBroadcast.delivered_count + len(rows))
+            )
+            db.commit()
+            _push(broadcast, rows, created_at)
+            email_notifications(
+                db, [user_id for user_id, _ in rows], broadcast.type, broadcast.title, broadcast.message
+            )
+            
+            if len(rows) < CHUNK_SIZE:
+                break
+        
+        db.refresh(broadcast)
+        broadcast.status = BroadcastStatus.completed
+        broadcast.completed_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Broadcast %s failed", broadcast_id)
+        db.execute(
+            update(NotificationBroadcast)
+            .where(NotificationBroadcast.id == broadcast_id)
+            .values(status=BroadcastStatus.failed, error=str(e), completed_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,165 @@
+"""Per-user push channel for notification events.
+
+Handlers publish events synchronously (they run in the threadpool) and the
+streaming endpoints consume them asynchronously. ``RedisBroker`` fans events
+out across workers over Redis pub/sub; ``InMemoryBroker`` keeps everything in
+process and is used for tests and single-worker development.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import redis
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+from app.schemas.notification import NotificationResponse
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "notifications:user:"
+
+
+def user_channel(user_id) -> str:
+    """Pub/sub channel name for a user."""
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+class Subscription:
+    """A single consumer of a user's event stream."""
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds for the next event."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+
+class NotificationBroker:
+    """Publish/subscribe interface for per-user notification events."""
+
+    def publish(self, user_id, event: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, user_id) -> Subscription:
+        raise NotImplementedError
+
+
+class _MemorySubscription(Subscription):
+    def __init__(self, broker: "InMemoryBroker", user_id: str):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        self.broker._remove(self)
+
+
+class InMemoryBroker(NotificationBroker):
+    """Process-local broker; safe to publish from threadpool workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, set] = {}
+
+    def publish(self, user_id, event: str, data: Dict[str, Any]) -> None:
+        message = {"event": event, "data": data}
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, message)
+            except RuntimeError:
+                # Event loop already closed; the subscription is going away
+                self._remove(subscription)
+
+    async def subscribe(self, user_id) -> Subscription:
+        subscription = _MemorySubscription(self, str(user_id))
+        with self._lock:
+            self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def _remove(self, subscription: _MemorySubscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None or message.get("type") != "message":
+            return None
+        return json.loads(message["data"])
+
+    async def close(self) -> None:
+        try:
+            await self.pubsub.unsubscribe()
+        finally:
+            await self.pubsub.aclose()
+
+
+class RedisBroker(NotificationBroker):
+    """Cross-worker broker backed by Redis pub/sub."""
+
+    def publish(self, user_id, event: str, data: Dict[str, Any]) -> None:
+        message = json.dumps({"event": event, "data": data}, default=str)
+        try:
+            get_redis().publish(user_channel(user_id), message)
+        except redis.RedisError as e:
+            # Push is best-effort; clients fall back to polling on reconnect
+            logger.warning("Failed to publish %s event for user %s: %s", event, user_id, e)
+
+    async def subscribe(self, user_id) -> Subscription:
+        pubsub = get_async_redis().pubsub()
+        await pubsub.subscribe(user_channel(user_id))
+        return _RedisSubscription(pubsub)
+
+
+_broker: Optional[NotificationBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> NotificationBroker:
+    """Get the configured notification broker."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if settings.NOTIFICATION_BROKER == "memory":
+                    _broker = InMemoryBroker()
+                else:
+                    _broker = RedisBroker()
+    return _broker
+
+
+def set_broker(broker: Optional[NotificationBroker]) -> None:
+    """Override the broker (e.g. install an ``InMemoryBroker`` in tests)."""
+    global _broker
+    _broker = broker
+
+
+def publish_notification(notification) -> None:
+    """Push a newly created notification to its recipient."""
+    data = NotificationResponse.model_validate(notification).model_dump(mode="json")
+    get_broker().publish(notification.user_id, "notification", data)
+
+
+def publish_unread_count(user_id, unread_count: int) -> None:
+    """Push a user's current unread count."""
+    get_broker().publish(user_id, "unread_count", {"unread_count": unread_count})
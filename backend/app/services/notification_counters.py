@@ -0,0 +1,223 @@
+"""Per-user unread-notification counters.
+
+Counters are read-through: a miss falls back to one ``COUNT(*)`` and seeds the
+cache, after which the write handlers keep it current with relative
+adjustments. Adjustments only apply to counters that already exist, so a
+missing key never turns into a wrong small number. A periodic job recomputes
+cached counters in batches to repair any drift.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+import redis
+from sqlalchemy import select, and_, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.session import SessionLocal
+from app.db.models.notification import Notification
+from app.services.scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "notifications:unread:"
+RECONCILE_BATCH_SIZE = 500
+
+# INCRBY only when the counter is cached; clamp at zero
+_ADJUST_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+    value = 0
+end
+return value
+"""
+
+
+class _RedisCounterStore:
+    def __init__(self):
+        self._adjust = None
+
+    def get(self, user_id: str) -> Optional[int]:
+        value = get_redis().get(f"{KEY_PREFIX}{user_id}")
+        return int(value) if value is not None else None
+
+    def set(self, user_id: str, value: int) -> None:
+        get_redis().set(
+            f"{KEY_PREFIX}{user_id}", value, ex=settings.NOTIFICATION_UNREAD_COUNTER_TTL_SECONDS
+        )
+
+    def adjust(self, user_id: str, delta: int) -> Optional[int]:
+        if self._adjust is None:
+            self._adjust = get_redis().register_script(_ADJUST_SCRIPT)
+        value = self._adjust(keys=[f"{KEY_PREFIX}{user_id}"], args=[delta])
+        return int(value) if value is not None else None
+
+    def adjust_many(self, user_ids: List[str], delta: int) -> List[Optional[int]]:
+        if self._adjust is None:
+            self._adjust = get_redis().register_script(_ADJUST_SCRIPT)
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id in user_ids:
+            self._adjust(keys=[f"{KEY_PREFIX}{user_id}"], args=[delta], client=pipe)
+        return [int(value) if value is not None else None for value in pipe.execute()]
+
+    def cached_users(self) -> Iterable[str]:
+        for key in get_redis().scan_iter(match=f"{KEY_PREFIX}*", count=RECONCILE_BATCH_SIZE):
+            yield key[len(KEY_PREFIX):]
+
+    def set_many(self, values: Dict[str, int]) -> None:
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id, value in values.items():
+            # XX: don't resurrect counters that expired meanwhile
+            pipe.set(
+                f"{KEY_PREFIX}{user_id}", value,
+                ex=settings.NOTIFICATION_UNREAD_COUNTER_TTL_SECONDS, xx=True
+            )
+        pipe.execute()
+
+
+class _MemoryCounterStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, int] = {}
+
+    def get(self, user_id: str) -> Optional[int]:
+        return self._values.get(user_id)
+
+    def set(self, user_id: str, value: int) -> None:
+        with self._lock:
+            self._values[user_id] = value
+
+    def adjust(self, user_id: str, delta: int) -> Optional[int]:
+        with self._lock:
+            if user_id not in self._values:
+                return None
+            self._values[user_id] = max(0, self._values[user_id] + delta)
+            return self._values[user_id]
+
+    def adjust_many(self, user_ids: List[str], delta: int) -> List[Optional[int]]:
+        return [self.adjust(user_id, delta) for user_id in user_ids]
+
+    def cached_users(self) -> Iterable[str]:
+        return list(self._values)
+
+    def set_many(self, values: Dict[str, int]) -> None:
+        with self._lock:
+            for user_id, value in values.items():
+                if user_id in self._values:
+                    self._values[user_id] = value
+
+
+_store = _RedisCounterStore() if settings.CACHE_BACKEND == "redis" else _MemoryCounterStore()
+
+
+def count_unread(db: Session, user_id) -> int:
+    """Count unread notifications in the database."""
+    result = db.execute(
+        select(func.count(Notification.id))
+        .where(
+            and_(
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            )
+        )
+    )
+    return result.scalar()
+
+
+def get_unread_count(db: Session, user_id) -> int:
+    """Get a user's unread count, from the cache when possible."""
+    try:
+        cached = _store.get(str(user_id))
+    except redis.RedisError as e:
+        logger.warning("Unread counter unavailable, counting in database: %s", e)
+        return count_unread(db, user_id)
+    
+    if cached is not None:
+        return cached
+    
+    count = count_unread(db, user_id)
+    _set(user_id, count)
+    return count
+
+
+def adjust_unread_count(db: Session, user_id, delta: int) -> int:
+    """Apply a committed change to a user's unread count and return the new value."""
+    try:
+        value = _store.adjust(str(user_id), delta)
+    except redis.RedisError as e:
+        logger.warning("Unread counter unavailable, counting in database: %s", e)
+        return count_unread(db, user_id)
+    
+    if value is not None:
+        return value
+    return get_unread_count(db, user_id)
+
+
+def adjust_unread_counts(user_ids: List, delta: int) -> Dict[str, int]:
+    """Apply the same change to many users' cached counters.
+    
+    Returns the new values for users whose counter was cached; the rest are
+    recounted lazily on their next read.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    try:
+        values = _store.adjust_many(user_ids, delta)
+    except redis.RedisError as e:
+        logger.warning("Failed to adjust unread counters: %s", e)
+        return {}
+    return {user_id: value for user_id, value in zip(user_ids, values) if value is not None}
+
+
+def reset_unread_count(user_id) -> None:
+    """Record that a user has no unread notifications."""
+    _set(user_id, 0)
+
+
+def _set(user_id, value: int) -> None:
+    try:
+        _store.set(str(user_id), value)
+    except redis.RedisError as e:
+        logger.warning("Failed to cache unread count for user %s: %s", user_id, e)
+
+
+def _reconcile_batch(db: Session, user_ids: List[str]) -> None:
+    result = db.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(
+            and_(
+                Notification.user_id.in_([UUID(user_id) for user_id in user_ids]),
+                Notification.is_read == False
+            )
+        )
+        .group_by(Notification.user_id)
+    )
+    counts = {user_id: 0 for user_id in user_ids}
+    counts.update({str(user_id): count for user_id, count in result.all()})
+    _store.set_many(counts)
+
+
+@periodic(settings.NOTIFICATION_COUNTER_RECONCILE_SECONDS)
+def reconcile_unread_counts() -> int:
+    """Recompute every cached counter from the database; returns users checked."""
+    db = SessionLocal()
+    checked = 0
+    batch: List[str] = []
+    try:
+        for user_id in _store.cached_users():
+            batch.append(user_id)
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                _reconcile_batch(db, batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            _reconcile_batch(db, batch)
+            checked += len(batch)
+    finally:
+        db.close()
+    return checked
@@ -0,0 +1,71 @@
+"""Email delivery of notifications according to user preferences.
+
+Notification emails go through the mail queue's digest buffer keyed by
+notification type, so a burst of the same kind arrives as one email.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.models.user import User
+from app.schemas.notification import NotificationPreferences
+from app.services.email import send_digest_item
+
+# Notification type -> preference flag that also has to be enabled
+PREFERENCE_BY_TYPE = {
+    "course_enrollment": "course_updates",
+    "course_update": "course_updates",
+    "assignment_due": "assignment_reminders",
+    "grade_posted": "grade_notifications",
+    "discussion_reply": "discussion_replies",
+    "certificate_issued": "certificate_notifications",
+}
+
+DIGEST_LABELS = {
+    "course_enrollment": "course enrollments",
+    "course_update": "course updates",
+    "assignment_due": "assignment reminders",
+    "grade_posted": "grades",
+    "discussion_reply": "discussion replies",
+    "certificate_issued": "certificates",
+    "announcement": "announcements",
+}
+
+
+def wants_email(preferences: Optional[Dict], notification_type: str) -> bool:
+    """Whether stored preferences allow emailing this notification type."""
+    prefs = NotificationPreferences(**(preferences or {}))
+    if not prefs.email_notifications:
+        return False
+    flag = PREFERENCE_BY_TYPE.get(notification_type)
+    return getattr(prefs, flag) if flag else True
+
+
+def email_notification(
+    user: User, notification_type: str, title: str, message: Optional[str] = None
+) -> bool:
+    """Queue an email for one notification if the user wants it."""
+    if not user.email or not wants_email(user.notification_preferences, notification_type):
+        return False
+    return send_digest_item(
+        user.email,
+        notification_type,
+        DIGEST_LABELS.get(notification_type, "notifications"),
+        title,
+        message
+    )
+
+
+def email_notifications(
+    db: Session, user_ids: List, notification_type: str, title: str, message: Optional[str] = None
+) -> int:
+    """Queue emails for many recipients of the same notification; returns emails queued."""
+    result = db.execute(
+        select(User.email, User.notification_preferences).where(User.id.in_(user_ids))
+    )
+    label = DIGEST_LABELS.get(notification_type, "notifications")
+    queued = 0
+    for email, preferences in result.all():
+        if email and wants_email(preferences, notification_type):
+            queued += send_digest_item(email, notification_type, label, title, message)
+    return queued
@@ -0,0 +1,97 @@
+"""Move old read notifications into the partitioned archive table.
+
+Each batch is a single ``DELETE ... RETURNING`` feeding an ``INSERT``, so rows
+never pass through Python and the hot ``notifications`` table only holds
+unread and recent items. Month partitions of ``notifications_archive`` are
+created before the rows that need them are moved.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_BATCH_SQL = text("""
+    WITH moved AS (
+        DELETE FROM notifications
+        WHERE id IN (
+            SELECT id FROM notifications
+            WHERE is_read = true
+              AND COALESCE(read_at, created_at) < :cutoff
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, created_at, user_id, type, title, message, data, is_read, read_at
+    )
+    INSERT INTO notifications_archive
+        (id, created_at, user_id, type, title, message, data, is_read, read_at, archived_at)
+    SELECT id, COALESCE(created_at, read_at, now()), user_id, type, title, message, data,
+           is_read, read_at, now()
+    FROM moved
+""")
+
+_PENDING_MONTHS_SQL = text("""
+    SELECT DISTINCT date_trunc('month', COALESCE(created_at, read_at, now()))
+    FROM notifications
+    WHERE is_read = true
+      AND COALESCE(read_at, created_at) < :cutoff
+""")
+
+
+def _partition_name(month_start: datetime) -> str:
+    return f"notifications_archive_{month_start:%Y_%m}"
+
+
+def ensure_archive_partition(db: Session, month_start: datetime) -> None:
+    """Create the archive partition covering ``month_start``'s month."""
+    month_start = month_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(month_start)} "
+        f"PARTITION OF notifications_archive "
+        f"FOR VALUES FROM ('{month_start:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+    ))
+
+
+def archive_read_notifications(
+    db: Session,
+    retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None
+) -> int:
+    """Archive read notifications older than the retention window.
+    
+    Commits after every batch so locks stay short; returns rows moved.
+    """
+    retention_days = retention_days or settings.NOTIFICATION_RETENTION_DAYS
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    
+    for (month_start,) in db.execute(_PENDING_MONTHS_SQL, {"cutoff": cutoff}).all():
+        ensure_archive_partition(db, month_start)
+    db.commit()
+    
+    moved = 0
+    while True:
+        result = db.execute(_ARCHIVE_BATCH_SQL, {"cutoff": cutoff, "batch_size": batch_size})
+        db.commit()
+        moved += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    return moved
+
+
+@periodic(settings.NOTIFICATION_ARCHIVE_INTERVAL_SECONDS)
+def run_notification_archival() -> None:
+    db = SessionLocal()
+    try:
+        moved = archive_read_notifications(db)
+        if moved:
+            logger.info("Archived %d read notifications", moved)
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+"""Periodic background jobs run inside the API workers.
+
+Jobs are plain synchronous functions registered with ``@periodic``; each runs
+in the threadpool so it can use a regular ``SessionLocal``. With the Redis
+cache backend a short lock makes sure only one worker runs a given job per
+interval.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+
+import redis
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "scheduler:lock:"
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], object]
+
+
+_jobs: List[PeriodicJob] = []
+_tasks: List[asyncio.Task] = []
+
+
+def periodic(interval_seconds: float, name: str = None):
+    """Register a function to run every ``interval_seconds``."""
+    def decorator(func):
+        _jobs.append(PeriodicJob(name or f"{func.__module__}.{func.__name__}", interval_seconds, func))
+        return func
+    return decorator
+
+
+def _acquire(job: PeriodicJob) -> bool:
+    if settings.CACHE_BACKEND != "redis":
+        return True
+    try:
+        ttl = max(1, int(job.interval_seconds * 0.9))
+        return bool(get_redis().set(f"{LOCK_PREFIX}{job.name}", "1", nx=True, ex=ttl))
+    except redis.RedisError as e:
+        logger.warning("Skipping job %s, lock unavailable: %s", job.name, e)
+        return False
+
+
+def run_job(job: PeriodicJob) -> None:
+    """Run a job once if this worker wins the lock for the current interval."""
+    if not _acquire(job):
+        return
+    try:
+        job.func()
+    except Exception:
+        logger.exception("Periodic job %s failed", job.name)
+
+
+async def _loop(job: PeriodicJob) -> None:
+    while True:
+        await asyncio.sleep(job.interval_seconds)
+        await run_in_threadpool(run_job, job)
+
+
+def start() -> None:
+    """Start all registered jobs on the running event loop."""
+    if not settings.SCHEDULER_ENABLED or _tasks:
+        return
+    for job in _jobs:
+        _tasks.append(asyncio.create_task(_loop(job), name=job.name))
+
+
+async def stop() -> None:
+    """Cancel running jobs."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
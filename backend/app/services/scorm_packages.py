@@ -0,0 +1,298 @@
+"""SCORM package ingestion and launch.
+
+A package is a zip with ``imsmanifest.xml`` at its root. On upload every
+member is streamed out of the zip straight into object storage under
+``scorm/<id>/`` (the zip is read from the request's spooled temp file, one
+member at a time, never whole). The manifest is parsed once, at ingestion,
+into a compact launch structure of title, version and a flat item list with
+resolved launch URLs. It is stored on the package row and cached, so a
+launch never opens the zip or the XML again.
+
+Package assets are served from a URL carrying a signed content token: the
+player runs in an iframe, which cannot send the API's bearer token. The
+token is the same all day for a user and package, so cached assets survive
+relaunches.
+"""
+import mimetypes
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time
+from typing import Any, BinaryIO, Dict, List, Optional
+from urllib.parse import urljoin
+from uuid import UUID, uuid4
+
+import jwt
+from sqlalchemy import select
+from sqlalchemy.orm import Session, defer
+from app.core.cache import cache_get, cache_set
+from app.core.config import settings
+from app.db.models.scorm import ScormPackage
+from app.services.storage import get_storage, CHUNK_SIZE
+
+MANIFEST_NAME = "imsmanifest.xml"
+MAX_MANIFEST_BYTES = 10 * 1024 * 1024
+
+
+class InvalidPackage(ValueError):
+    pass
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attr(element: ET.Element, name: str) -> Optional[str]:
+    """An attribute by local name, whatever namespace prefix the package used."""
+    for key, value in element.attrib.items():
+        if _local(key).lower() == name.lower():
+            return value
+    return None
+
+
+def _children(element: ET.Element, name: str) -> List[ET.Element]:
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _text(element: Optional[ET.Element], name: str) -> Optional[str]:
+    if element is None:
+        return None
+    for child in _children(element, name):
+        if child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+
+def _detect_version(root: ET.Element) -> str:
+    schema_version = _text(next(iter(_children(root, "metadata")), None), "schemaversion") or ""
+    if "2004" in schema_version or "1.3" in schema_version:
+        return "2004"
+    if schema_version == "1.2":
+        return "1.2"
+    # No usable schemaversion: SCORM 2004 packages use the adlcp_v1p3 namespace
+    for element in root.iter():
+        if "adlcp_v1p3" in element.tag or any("adlcp_v1p3" in key for key in element.attrib):
+            return "2004"
+    return "1.2"
+
+
+def _join(base: str, href: str) -> str:
+    if "://" in href:
+        return href
+    return urljoin(base, href) if base else href
+
+
+def _with_parameters(href: str, parameters: Optional[str]) -> str:
+    if not parameters:
+        return href
+    if parameters[0] == "?" and "?" in href:
+        parameters = "&" + parameters[1:]
+    elif parameters[0] not in "?#&":
+        parameters = ("&" if "?" in href else "?") + parameters
+    return href + parameters
+
+
+def parse_manifest(data: bytes) -> Dict[str, Any]:
+    """Reduce imsmanifest.xml to the launch structure.
+
+    Returns ``{"title", "version", "launch", "items"}`` where each item is
+    ``{"id", "title", "href", "sco", "depth"}`` in manifest order and
+    ``launch`` is the first item with content. Raises InvalidPackage.
+    """
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as e:
+        raise InvalidPackage(f"{MANIFEST_NAME} is not valid XML: {e}")
+    if _local(root.tag) != "manifest":
+        raise InvalidPackage(f"{MANIFEST_NAME} has no <manifest> root")
+
+    root_base = _attr(root, "base") or ""
+    resources = {}
+    for container in _children(root, "resources"):
+        container_base = _join(root_base, _attr(container, "base") or "")
+        for resource in _children(container, "resource"):
+            href = _attr(resource, "href")
+            base = _join(container_base, _attr(resource, "base") or "")
+            resources[_attr(resource, "identifier")] = {
+                "href": _join(base, href) if href else None,
+                "sco": (_attr(resource, "scormtype") or "").lower() == "sco"
+            }
+
+    organizations = next(iter(_children(root, "organizations")), None)
+    organization = None
+    if organizations is not None:
+        candidates = _children(organizations, "organization")
+        default = _attr(organizations, "default")
+        organization = next((o for o in candidates if _attr(o, "identifier") == default), None)
+        organization = organization if organization is not None else next(iter(candidates), None)
+
+    items: List[Dict[str, Any]] = []
+
+    def walk(element: ET.Element, depth: int) -> None:
+        for item in _children(element, "item"):
+            resource = resources.get(_attr(item, "identifierref"))
+            href = resource["href"] if resource else None
+            items.append({
+                "id": _attr(item, "identifier"),
+                "title": _text(item, "title") or _attr(item, "identifier"),
+                "href": _with_parameters(href, _attr(item, "parameters")) if href else None,
+                "sco": bool(resource and resource["sco"]),
+                "depth": depth
+            })
+            walk(item, depth + 1)
+
+    if organization is not None:
+        walk(organization, 0)
+    elif resources:
+        # Resource-only packages launch their first resource
+        identifier, resource = next(iter(resources.items()))
+        items.append({"id": identifier, "title": identifier, "href": resource["href"], "sco": resource["sco"], "depth": 0})
+
+    launch = next((item["href"] for item in items if item["href"]), None)
+    if launch is None:
+        raise InvalidPackage(f"{MANIFEST_NAME} has no launchable item")
+    return {
+        "title": _text(organization, "title") or _text(root, "title"),
+        "version": _detect_version(root),
+        "launch": launch,
+        "items": items
+    }
+
+
+def _member_path(name: str) -> str:
+    path = posixpath.normpath(name.replace("\\", "/"))
+    if path.startswith(("/", "../")) or path == ".." or ":" in path.split("/", 1)[0]:
+        raise InvalidPackage(f"Unsafe path in package: {name}")
+    return path
+
+
+def _store_member(archive: zipfile.ZipFile, key: str, info: zipfile.ZipInfo) -> None:
+    content_type = mimetypes.guess_type(info.filename)[0] or "application/octet-stream"
+    with archive.open(info) as f:
+        get_storage().put_stream(key, iter(lambda: f.read(CHUNK_SIZE), b""), content_type)
+
+
+def ingest_package(
+    db: Session,
+    stream: BinaryIO,
+    filename: str,
+    user_id: UUID,
+    course_id: Optional[UUID] = None,
+    content_item_id: Optional[UUID] = None
+) -> ScormPackage:
+    """Unpack a SCORM zip into storage and record it with its parsed manifest. Commits.
+
+    ``stream`` must be seekable (zip's directory is at the end). Raises
+    InvalidPackage for anything that is not a safe, well-formed package.
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise InvalidPackage("Package is not a zip file")
+
+    with archive:
+        members = {}
+        for info in archive.infolist():
+            if not info.is_dir():
+                members[_member_path(info.filename)] = info
+        if len(members) > settings.SCORM_MAX_FILES:
+            raise InvalidPackage(f"Package has more than {settings.SCORM_MAX_FILES} files")
+        # Reads stop at each member's declared size, so this bounds what unpacking writes
+        total_size = sum(info.file_size for info in members.values())
+        if total_size > settings.SCORM_MAX_UNPACKED_BYTES:
+            raise InvalidPackage("Package is too large once unpacked")
+        if MANIFEST_NAME not in members:
+            raise InvalidPackage(f"{MANIFEST_NAME} not found at the package root")
+        if members[MANIFEST_NAME].file_size > MAX_MANIFEST_BYTES:
+            raise InvalidPackage(f"{MANIFEST_NAME} is too large")
+        manifest = parse_manifest(archive.read(members[MANIFEST_NAME]))
+
+        package_id = uuid4()
+        prefix = f"scorm/{package_id}"
+        storage = get_storage()
+        try:
+            with ThreadPoolExecutor(max_workers=settings.SCORM_INGEST_WORKERS) as pool:
+                # ZipFile serialises the underlying reads; the storage writes overlap
+                list(pool.map(
+                    lambda item: _store_member(archive, f"{prefix}/{item[0]}", item[1]),
+                    members.items()
+                ))
+        except Exception:
+            storage.delete_prefix(prefix)
+            raise
+
+    package = ScormPackage(
+        id=package_id,
+        course_id=course_id,
+        content_item_id=content_item_id,
+        title=manifest["title"] or filename,
+        version=manifest["version"],
+        filename=filename,
+        storage_prefix=prefix,
+        manifest=manifest,
+        file_count=len(members),
+        total_size=total_size,
+        uploaded_by=user_id
+    )
+    db.add(package)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        storage.delete_prefix(prefix)
+        raise
+    db.refresh(package)
+    return package
+
+
+def _manifest_cache_key(package_id: UUID) -> str:
+    return f"scorm:manifest:{package_id}"
+
+
+def launch_structure(package: ScormPackage) -> Dict[str, Any]:
+    """The package's parsed manifest, from cache when possible."""
+    key = _manifest_cache_key(package.id)
+    manifest = cache_get(key)
+    if manifest is None:
+        manifest = package.manifest
+        cache_set(key, manifest, settings.SCORM_MANIFEST_CACHE_TTL_SECONDS)
+    return manifest
+
+
+def get_package(db: Session, package_id: UUID) -> Optional[ScormPackage]:
+    # Deferring the manifest keeps lookups cheap; launches read it from cache
+    return db.execute(
+        select(ScormPackage).options(defer(ScormPackage.manifest)).where(ScormPackage.id == package_id)
+    ).scalar_one_or_none()
+
+
+def content_token(package_id: UUID, user_id: UUID) -> str:
+    """A token for the package's assets, identical all day and valid until the end of the next."""
+    expires = datetime.combine(datetime.utcnow().date() + timedelta(days=2), time.min)
+    return jwt.encode(
+        {"sub": str(user_id), "pkg": str(package_id), "aud": "scorm", "exp": expires},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def read_content_token(token: str, package_id: UUID) -> Optional[str]:
+    """The user id a content token was issued to, if it is valid for this package."""
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM], audience="scorm")
+    except jwt.PyJWTError:
+        return None
+    return claims["sub"] if claims.get("pkg") == str(package_id) else None
+
+
+def content_url(package_id: UUID, token: str, path: str = "") -> str:
+    return f"{settings.API_V1_STR}/scorm/{package_id}/content/{token}/{path}"
+
+
+def asset_key(package: ScormPackage, path: str) -> Optional[str]:
+    """Storage key of a package asset, or None for a path outside the package."""
+    normalized = posixpath.normpath(path)
+    if normalized.startswith(("/", "../")) or normalized in (".", ".."):
+        return None
+    return f"{package.storage_prefix}/{normalized}"
@@ -0,0 +1,463 @@
+"""SCORM runtime (CMI) data of learners' attempts.
+
+A SCORM player calls SetValue for every interaction and commits often, so
+commits never touch Postgres directly. The player posts the values changed
+since its last commit as one batch; they are written to the session's CMI
+map in the cache backend and recorded in a per-session delta, in a single
+round trip. A periodic job merges each session's accumulated delta into its
+``scorm_attempts`` row, so the database sees at most one write per session
+per ``SCORM_PERSIST_INTERVAL_SECONDS`` however chatty the content is.
+
+Commits that complete or pass the content, and the last commit of a session,
+are persisted at once. Completion is carried into the learner's
+ContentProgress for the package's content item and into their enrollment.
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.session import SessionLocal
+from app.db.models.enrollment import Enrollment, ContentProgress
+from app.db.models.scorm import ScormPackage, ScormAttempt
+from app.db.models.user import User
+from app.services.enrollment_progress import update_enrollment_progress
+from app.services.scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+VALUES_PREFIX = "scorm:cmi:"
+DELTA_PREFIX = "scorm:cmi-delta:"
+DIRTY_KEY = "scorm:cmi-dirty"
+PERSIST_BATCH_SIZE = 200
+
+ELEMENT_PATTERN = re.compile(r"^(cmi|adl)\.[A-Za-z0-9_.]{1,250}$")
+MAX_VALUE_LENGTH = 64000  # SCORM 2004's limit for cmi.suspend_data
+
+# Set by the LMS at launch; a SetValue on these is an error in either version
+READ_ONLY = frozenset({
+    "cmi.core.student_id", "cmi.core.student_name", "cmi.core.credit", "cmi.core.entry",
+    "cmi.core.total_time", "cmi.core.lesson_mode", "cmi.launch_data",
+    "cmi.learner_id", "cmi.learner_name", "cmi.credit", "cmi.entry", "cmi.total_time", "cmi.mode",
+})
+# Written once per session; a new session starts without them
+SESSION_ONLY = ("cmi.core.session_time", "cmi.core.exit", "cmi.session_time", "cmi.exit")
+COMPLETE_STATUSES = frozenset({"completed", "passed"})
+
+# The values each status element may take
+VOCABULARIES = {
+    "cmi.core.lesson_status": frozenset({"passed", "completed", "failed", "incomplete", "browsed", "not attempted"}),
+    "cmi.completion_status": frozenset({"completed", "incomplete", "not attempted", "unknown"}),
+    "cmi.success_status": frozenset({"passed", "failed", "unknown"}),
+}
+SCORE_PATTERN = re.compile(r"\.score\.(raw|min|max|scaled)$")
+MAX_SCORE = Decimal("99999.99")  # scorm_attempts.score_raw is NUMERIC(7, 2)
+
+_HMS_PATTERN = re.compile(r"^(\d{1,4}):(\d{2}):(\d{2}(?:\.\d{1,2})?)$")
+_DURATION_PATTERN = re.compile(
+    r"^P(?:(\d+)Y)?(?:(\d+)M)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$"
+)
+
+
+class InvalidCmi(ValueError):
+    pass
+
+
+class _RedisCmiStore:
+    def load(self, session_id: str) -> Dict[str, str]:
+        return get_redis().hgetall(f"{VALUES_PREFIX}{session_id}")
+
+    def seed(self, session_id: str, defaults: Dict[str, str], overrides: Dict[str, str]) -> Dict[str, str]:
+        # A session already live in another tab keeps what the learner wrote
+        key = f"{VALUES_PREFIX}{session_id}"
+        pipe = get_redis().pipeline(transaction=True)
+        for element, value in defaults.items():
+            pipe.hsetnx(key, element, value)
+        pipe.hset(key, mapping=overrides)
+        pipe.hdel(key, *SESSION_ONLY)
+        pipe.expire(key, settings.SCORM_SESSION_TTL_SECONDS)
+        pipe.hgetall(key)
+        return pipe.execute()[-1]
+
+    def commit(self, session_id: str, changes: Dict[str, str]) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        for prefix in (VALUES_PREFIX, DELTA_PREFIX):
+            pipe.hset(f"{prefix}{session_id}", mapping=changes)
+            pipe.expire(f"{prefix}{session_id}", settings.SCORM_SESSION_TTL_SECONDS)
+        pipe.sadd(DIRTY_KEY, session_id)
+        pipe.execute()
+
+    def take_delta(self, session_id: str) -> Dict[str, str]:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hgetall(f"{DELTA_PREFIX}{session_id}")
+        pipe.delete(f"{DELTA_PREFIX}{session_id}")
+        return pipe.execute()[0]
+
+    def restore_delta(self, session_id: str, delta: Dict[str, str]) -> None:
+        # Values committed since the delta was taken are newer and win
+        key = f"{DELTA_PREFIX}{session_id}"
+        pipe = get_redis().pipeline(transaction=True)
+        for element, value in delta.items():
+            pipe.hsetnx(key, element, value)
+        pipe.expire(key, settings.SCORM_SESSION_TTL_SECONDS)
+        pipe.sadd(DIRTY_KEY, session_id)
+        pipe.execute()
+
+    def dirty_sessions(self, count: int) -> List[str]:
+        return get_redis().spop(DIRTY_KEY, count) or []
+
+
+class _MemoryCmiStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[str, str]] = {}
+        self._deltas: Dict[str, Dict[str, str]] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _touch(self, session_id: str) -> None:
+        self._expires[session_id] = time.monotonic() + settings.SCORM_SESSION_TTL_SECONDS
+
+    def load(self, session_id: str) -> Dict[str, str]:
+        return dict(self._values.get(session_id, {}))
+
+    def seed(self, session_id: str, defaults: Dict[str, str], overrides: Dict[str, str]) -> Dict[str, str]:
+        with self._lock:
+            values = self._values.setdefault(session_id, {})
+            for element, value in defaults.items():
+                values.setdefault(element, value)
+            values.update(overrides)
+            for element in SESSION_ONLY:
+                values.pop(element, None)
+            self._touch(session_id)
+            return dict(values)
+
+    def commit(self, session_id: str, changes: Dict[str, str]) -> None:
+        with self._lock:
+            self._values.setdefault(session_id, {}).update(changes)
+            self._deltas.setdefault(session_id, {}).update(changes)
+            self._touch(session_id)
+
+    def take_delta(self, session_id: str) -> Dict[str, str]:
+        with self._lock:
+            return self._deltas.pop(session_id, {})
+
+    def restore_delta(self, session_id: str, delta: Dict[str, str]) -> None:
+        with self._lock:
+            self._deltas[session_id] = {**delta, **self._deltas.get(session_id, {})}
+
+    def dirty_sessions(self, count: int) -> List[str]:
+        with self._lock:
+            now = time.monotonic()
+            for session_id in [s for s, expires in self._expires.items() if expires < now]:
+                self._values.pop(session_id, None)
+                self._deltas.pop(session_id, None)
+                del self._expires[session_id]
+            return list(self._deltas)[:count]
+
+
+_store = _RedisCmiStore() if settings.CACHE_BACKEND == "redis" else _MemoryCmiStore()
+
+
+def parse_session_time(value: Optional[str]) -> int:
+    """Seconds in a SCORM 1.2 ``HHHH:MM:SS.SS`` or SCORM 2004 ISO 8601 duration; 0 if invalid."""
+    if not value:
+        return 0
+    match = _HMS_PATTERN.match(value)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return int(int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+    match = _DURATION_PATTERN.match(value)
+    if match and value not in ("P", "PT"):
+        years, months, days, hours, minutes, seconds = (float(part or 0) for part in match.groups())
+        return int(((years * 365 + months * 30 + days) * 24 + hours) * 3600 + minutes * 60 + seconds)
+    return 0
+
+
+def format_total_time(seconds: int, version: str) -> str:
+    if version == "2004":
+        return f"PT{seconds}S"
+    return f"{seconds // 3600:04d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def lesson_status(values: Dict[str, str]) -> Optional[str]:
+    """One status for either version: 2004's success status when decided, else its completion."""
+    if "cmi.core.lesson_status" in values:
+        return values["cmi.core.lesson_status"]
+    success = values.get("cmi.success_status")
+    if success in ("passed", "failed"):
+        return success
+    return values.get("cmi.completion_status")
+
+
+def _score(values: Dict[str, str]) -> Optional[float]:
+    raw = values.get("cmi.core.score.raw", values.get("cmi.score.raw"))
+    try:
+        return round(float(raw), 2) if raw not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _validate_score(element: str, value: str, kind: str) -> None:
+    if value == "" and not element.startswith("cmi.score."):
+        return  # SCORM 1.2 scores may be blank
+    try:
+        score = Decimal(value)
+    except InvalidOperation:
+        raise InvalidCmi(f"Value of {element} is not a number")
+    limit = Decimal(1) if kind == "scaled" else MAX_SCORE
+    if not score.is_finite() or abs(score) > limit:
+        raise InvalidCmi(f"Value of {element} is out of range")
+
+
+def validate_changes(changes: Dict[str, str]) -> None:
+    """Raise InvalidCmi unless every element is a writable CMI element with a sane value."""
+    for element, value in changes.items():
+        if not ELEMENT_PATTERN.match(element):
+            raise InvalidCmi(f"Not a CMI data model element: {element}")
+        if element in READ_ONLY or element.endswith("._count") or element.endswith("._children"):
+            raise InvalidCmi(f"Element is read only: {element}")
+        if len(value) > MAX_VALUE_LENGTH:
+            raise InvalidCmi(f"Value of {element} is too long")
+        if element in VOCABULARIES and value not in VOCABULARIES[element]:
+            raise InvalidCmi(f"Not a valid value of {element}: {value}")
+        score = SCORE_PATTERN.search(element)
+        if score:
+            _validate_score(element, value, score.group(1))
+
+
+def _initial_values(attempt: ScormAttempt, version: str, user: User) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """The (learner-written defaults, LMS-owned values) a session starts from."""
+    persisted = {k: v for k, v in (attempt.cmi or {}).items() if k not in SESSION_ONLY}
+    previous_exit = (attempt.cmi or {}).get("cmi.exit" if version == "2004" else "cmi.core.exit")
+    if attempt.launch_count <= 1:
+        entry = "ab-initio"
+    else:
+        entry = "resume" if previous_exit == "suspend" else ""
+    name = ", ".join(part for part in (user.last_name, user.first_name) if part) or user.email
+    total_time = format_total_time(attempt.total_time_seconds or 0, version)
+
+    if version == "2004":
+        defaults = {"cmi.completion_status": "unknown", "cmi.success_status": "unknown", **persisted}
+        overrides = {
+            "cmi.learner_id": str(user.id),
+            "cmi.learner_name": name,
+            "cmi.credit": "credit",
+            "cmi.entry": entry,
+            "cmi.mode": "normal",
+            "cmi.total_time": total_time
+        }
+    else:
+        defaults = {"cmi.core.lesson_status": "not attempted", **persisted}
+        overrides = {
+            "cmi.core.student_id": str(user.id),
+            "cmi.core.student_name": name,
+            "cmi.core.credit": "credit",
+            "cmi.core.entry": entry,
+            "cmi.core.lesson_mode": "normal",
+            "cmi.core.total_time": total_time
+        }
+    return defaults, overrides
+
+
+def start_session(db: Session, package: ScormPackage, user: User) -> Tuple[ScormAttempt, Dict[str, str]]:
+    """Open the learner's attempt at a package and return it with its CMI values. Commits.
+
+    A learner has one attempt per package, resumed by every launch; the
+    attempt id doubles as the runtime session id.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        insert(ScormAttempt)
+        .values(
+            id=uuid4(), package_id=package.id, user_id=user.id, cmi={},
+            total_time_seconds=0, launch_count=0, created_at=now, updated_at=now
+        )
+        .on_conflict_do_nothing(constraint="uq_scorm_attempts_package_user")
+    )
+    attempt = db.execute(
+        select(ScormAttempt)
+        .where(ScormAttempt.package_id == package.id, ScormAttempt.user_id == user.id)
+        .with_for_update()
+    ).scalar_one()
+    attempt.launch_count = (attempt.launch_count or 0) + 1
+    db.commit()
+    db.refresh(attempt)
+
+    defaults, overrides = _initial_values(attempt, package.version, user)
+    try:
+        values = _store.seed(str(attempt.id), defaults, overrides)
+    except redis.RedisError as e:
+        logger.warning("SCORM session store unavailable, commits will write through: %s", e)
+        values = {**defaults, **overrides}
+    return attempt, values
+
+
+def get_attempt(db: Session, session_id: UUID, package_id: UUID, user_id: UUID) -> Optional[ScormAttempt]:
+    return db.execute(
+        select(ScormAttempt).where(
+            ScormAttempt.id == session_id,
+            ScormAttempt.package_id == package_id,
+            ScormAttempt.user_id == user_id
+        )
+    ).scalar_one_or_none()
+
+
+def record_commit(db: Session, attempt: ScormAttempt, changes: Dict[str, str], finish: bool = False) -> Dict:
+    """Apply one batched commit from the player.
+
+    The changes go to the session store and are persisted by the periodic
+    flush, unless the commit finishes the session or completes the content,
+    in which case they are persisted (and the commit) before returning.
+    Raises InvalidCmi.
+    """
+    validate_changes(changes)
+    session_id = str(attempt.id)
+    status = lesson_status(changes)
+    try:
+        _store.commit(session_id, changes)
+    except redis.RedisError as e:
+        logger.warning("SCORM session store unavailable, writing through: %s", e)
+        attempt = _persist(db, attempt.id, changes, changes, finish) or attempt
+        return {"accepted": len(changes), "lesson_status": attempt.lesson_status, "persisted": True}
+
+    if finish or status in COMPLETE_STATUSES:
+        attempt = flush(db, attempt.id, finish=finish) or attempt
+        return {"accepted": len(changes), "lesson_status": attempt.lesson_status, "persisted": True}
+    return {"accepted": len(changes), "lesson_status": status or attempt.lesson_status, "persisted": False}
+
+
+def flush(db: Session, attempt_id: UUID, finish: bool = False) -> Optional[ScormAttempt]:
+    """Persist a session's pending delta. Commits.
+
+    Returns the attempt, or None if there was nothing to write. A failed
+    write puts the delta back for the next flush, unless the database
+    rejected its values (see ``_persist``).
+    """
+    session_id = str(attempt_id)
+    delta = _store.take_delta(session_id)
+    if not delta and not finish:
+        return None
+    try:
+        values = _store.load(session_id) or delta
+        return _persist(db, attempt_id, delta, values, finish)
+    except Exception:
+        db.rollback()
+        if delta:
+            _store.restore_delta(session_id, delta)
+        raise
+
+
+def _persist(
+    db: Session,
+    attempt_id: UUID,
+    delta: Dict[str, str],
+    values: Dict[str, str],
+    finish: bool
+) -> Optional[ScormAttempt]:
+    attempt = db.execute(
+        select(ScormAttempt).where(ScormAttempt.id == attempt_id).with_for_update()
+    ).scalar_one_or_none()
+    if attempt is None:
+        db.rollback()
+        return None
+
+    attempt.cmi = {**(attempt.cmi or {}), **delta}
+    status = lesson_status(values)
+    if status:
+        attempt.lesson_status = status
+    score = _score(values)
+    if score is not None:
+        attempt.score_raw = score
+    session_seconds = 0
+    if finish:
+        session_seconds = parse_session_time(values.get("cmi.session_time", values.get("cmi.core.session_time")))
+        attempt.total_time_seconds = (attempt.total_time_seconds or 0) + session_seconds
+    completed_now = status in COMPLETE_STATUSES and attempt.completed_at is None
+    if completed_now:
+        attempt.completed_at = datetime.utcnow()
+    try:
+        db.commit()
+    except DataError:
+        # Retrying can never succeed, so the delta is dropped rather than put back
+        db.rollback()
+        logger.error("Dropped SCORM changes to attempt %s the database rejected: %r", attempt_id, delta)
+        return None
+
+    if completed_now or session_seconds:
+        _sync_content_progress(db, attempt, completed_now)
+    return attempt
+
+
+def _sync_content_progress(db: Session, attempt: ScormAttempt, completed_now: bool) -> None:
+    """Carry the attempt's time and completion into the package's content item. Commits."""
+    package = db.execute(
+        select(ScormPackage.course_id, ScormPackage.content_item_id).where(ScormPackage.id == attempt.package_id)
+    ).one_or_none()
+    if package is None or package.course_id is None or package.content_item_id is None:
+        return
+    enrollment = db.execute(
+        select(Enrollment).where(Enrollment.user_id == attempt.user_id, Enrollment.course_id == package.course_id)
+    ).scalar_one_or_none()
+    if enrollment is None:
+        return
+
+    progress = db.execute(
+        select(ContentProgress).where(
+            (ContentProgress.enrollment_id == enrollment.id) &
+            (ContentProgress.content_item_id == package.content_item_id)
+        )
+    ).scalar_one_or_none()
+    if progress is None:
+        progress = ContentProgress(
+            enrollment_id=enrollment.id,
+            content_item_id=package.content_item_id,
+            progress_percentage=0,
+            started_at=attempt.created_at
+        )
+        db.add(progress)
+    progress.time_spent_seconds = max(progress.time_spent_seconds or 0, attempt.total_time_seconds or 0)
+    if attempt.completed_at is not None and not progress.is_completed:
+        progress.is_completed = True
+        progress.completed_at = attempt.completed_at
+        progress.progress_percentage = 100
+    db.commit()
+
+    if completed_now:
+        update_enrollment_progress(db, enrollment.id, package.course_id)
+
+
+@periodic(settings.SCORM_PERSIST_INTERVAL_SECONDS)
+def run_scorm_persist() -> int:
+    """Persist every session with pending changes; returns sessions written."""
+    db = SessionLocal()
+    written = 0
+    try:
+        while True:
+            session_ids = _store.dirty_sessions(PERSIST_BATCH_SIZE)
+            failed = False
+            for session_id in session_ids:
+                try:
+                    if flush(db, UUID(session_id)) is not None:
+                        written += 1
+                except Exception:
+                    # Its delta is back in the store; retry on the next run, not in this loop
+                    logger.exception("Persisting SCORM session %s failed", session_id)
+                    failed = True
+            if failed or len(session_ids) < PERSIST_BATCH_SIZE:
+                return written
+    except redis.RedisError as e:
+        logger.warning("SCORM session store unavailable, persisting later: %s", e)
+        return written
+    finally:
+        db.close()
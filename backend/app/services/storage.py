@@ -0,0 +1,370 @@
+"""Object storage backends.
+
+``LocalStorage`` keeps objects under ``STORAGE_LOCAL_ROOT`` and is what
+development and tests use; ``MinioStorage`` talks to the configured MinIO
+bucket. Both expose the same small interface so callers never care where
+bytes live.
+
+Presigned URLs let clients read and write objects without the API proxying
+the bytes. MinIO signs them natively; ``LocalStorage`` stands in with
+short-lived signed tokens for the ``/files/blob/{token}`` endpoint.
+"""
+import io
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+import jwt
+from minio import Minio
+from minio.commonconfig import ComposeSource, CopySource
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+# Smallest part S3/MinIO accept in a multipart upload or compose (except the last)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str
+    content_type: Optional[str] = None
+    last_modified: Optional[datetime] = None
+
+
+class ObjectStorage:
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Metadata for an object, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        raise NotImplementedError
+
+    def put_stream(
+        self, key: str, chunks: Iterable[bytes], content_type: str = "application/octet-stream"
+    ) -> ObjectInfo:
+        """Store an object of unknown length from an iterable of chunks, without buffering it.
+
+        Exceptions raised by ``chunks`` abort the write and leave no object behind.
+        """
+        raise NotImplementedError
+
+    def compose(self, key: str, sources: List[str], content_type: str = "application/octet-stream") -> ObjectInfo:
+        """Concatenate existing objects into a new one. Sources are left in place."""
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes of ``[start, end]`` (inclusive) in chunks."""
+        raise NotImplementedError
+
+    def move(self, source: str, key: str) -> None:
+        """Rename an object, replacing any object already at ``key``."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Delete every object whose key starts with ``prefix/``."""
+        raise NotImplementedError
+
+    def presigned_get_url(
+        self,
+        key: str,
+        expires: timedelta,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        inline: bool = False
+    ) -> str:
+        """A URL that downloads the object without credentials until it expires."""
+        raise NotImplementedError
+
+    def presigned_put_url(self, key: str, expires: timedelta) -> str:
+        """A URL the client can PUT the object's bytes to until it expires."""
+        raise NotImplementedError
+
+
+def content_disposition(filename: Optional[str], inline: bool = False) -> str:
+    disposition = "inline" if inline else "attachment"
+    if not filename:
+        return disposition
+    fallback = filename.encode("ascii", "replace").decode().replace('"', "")
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def sign_local_token(claims: Dict[str, Any], expires: timedelta) -> str:
+    return jwt.encode(
+        {**claims, "aud": "storage", "exp": datetime.utcnow() + expires},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def read_local_token(token: str, method: str) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired local presigned token for ``method``, else None."""
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM], audience="storage")
+    except jwt.InvalidTokenError:
+        return None
+    return claims if claims.get("method") == method else None
+
+
+class LocalStorage(ObjectStorage):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(
+            key=key,
+            size=st.st_size,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            last_modified=datetime.utcfromtimestamp(st.st_mtime),
+        )
+
+    def _write(self, key: str, write) -> ObjectInfo:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial object
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return self.stat(key)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        return self._write(key, lambda f: f.write(data))
+
+    def put_stream(
+        self, key: str, chunks: Iterable[bytes], content_type: str = "application/octet-stream"
+    ) -> ObjectInfo:
+        def write(f):
+            for chunk in chunks:
+                f.write(chunk)
+        return self._write(key, write)
+
+    def compose(self, key: str, sources: List[str], content_type: str = "application/octet-stream") -> ObjectInfo:
+        def write(f):
+            for source in sources:
+                with open(self.path(source), "rb") as src:
+                    shutil.copyfileobj(src, f, CHUNK_SIZE)
+        return self._write(key, write)
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def move(self, source: str, key: str) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path(source), path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        shutil.rmtree(self.path(prefix), ignore_errors=True)
+
+    def presigned_get_url(
+        self,
+        key: str,
+        expires: timedelta,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        inline: bool = False
+    ) -> str:
+        token = sign_local_token(
+            {
+                "method": "GET",
+                "key": key,
+                "content_type": content_type,
+                "disposition": content_disposition(filename, inline)
+            },
+            expires
+        )
+        return f"{settings.API_V1_STR}/files/blob/{token}"
+
+    def presigned_put_url(self, key: str, expires: timedelta) -> str:
+        token = sign_local_token({"method": "PUT", "key": key}, expires)
+        return f"{settings.API_V1_STR}/files/blob/{token}"
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of an iterable of byte chunks, for APIs that want ``read()``."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+
+class MinioStorage(ObjectStorage):
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+        )
+        # Presigning is done offline, against the host clients will use
+        self.signer = Minio(
+            settings.MINIO_PUBLIC_ENDPOINT or settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+            region=settings.MINIO_REGION,
+        )
+        self._bucket_checked = False
+
+    def _ensure_bucket(self) -> None:
+        if not self._bucket_checked:
+            if not self.client.bucket_exists(self.bucket):
+                self.client.make_bucket(self.bucket)
+            self._bucket_checked = True
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            obj = self.client.stat_object(self.bucket, key)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchBucket", "NoSuchObject"):
+                return None
+            raise
+        return ObjectInfo(
+            key=key,
+            size=obj.size,
+            etag=obj.etag,
+            content_type=obj.content_type,
+            last_modified=obj.last_modified,
+        )
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        self._ensure_bucket()
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+        return self.stat(key)
+
+    def put_stream(
+        self, key: str, chunks: Iterable[bytes], content_type: str = "application/octet-stream"
+    ) -> ObjectInfo:
+        self._ensure_bucket()
+        # Unknown length: the client sends a multipart upload and aborts it on error
+        self.client.put_object(
+            self.bucket, key, _ChunkReader(chunks), -1,
+            content_type=content_type, part_size=MIN_PART_SIZE * 2
+        )
+        return self.stat(key)
+
+    def compose(self, key: str, sources: List[str], content_type: str = "application/octet-stream") -> ObjectInfo:
+        self._ensure_bucket()
+        self.client.compose_object(
+            self.bucket, key, [ComposeSource(self.bucket, source) for source in sources],
+            metadata={"Content-Type": content_type}
+        )
+        return self.stat(key)
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        length = 0 if end is None else end - start + 1
+        response = self.client.get_object(self.bucket, key, offset=start, length=length)
+        try:
+            yield from response.stream(CHUNK_SIZE)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def move(self, source: str, key: str) -> None:
+        # Server-side copy; the bytes never leave MinIO
+        self.client.copy_object(self.bucket, key, CopySource(self.bucket, source))
+        self.client.remove_object(self.bucket, source)
+
+    def delete(self, key: str) -> None:
+        self.client.remove_object(self.bucket, key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        objects = self.client.list_objects(self.bucket, prefix=prefix.rstrip("/") + "/", recursive=True)
+        errors = self.client.remove_objects(self.bucket, (DeleteObject(o.object_name) for o in objects))
+        # remove_objects is lazy: the deletes happen while the errors are read
+        for error in errors:
+            raise RuntimeError(f"Could not delete {error.name}: {error.message}")
+
+    def presigned_get_url(
+        self,
+        key: str,
+        expires: timedelta,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        inline: bool = False
+    ) -> str:
+        response_headers = {"response-content-disposition": content_disposition(filename, inline)}
+        if content_type:
+            response_headers["response-content-type"] = content_type
+        return self.signer.presigned_get_object(
+            self.bucket, key, expires=expires, response_headers=response_headers
+        )
+
+    def presigned_put_url(self, key: str, expires: timedelta) -> str:
+        self._ensure_bucket()
+        return self.signer.presigned_put_object(self.bucket, key, expires=expires)
+
+
+_storage: Optional[ObjectStorage] = None
+
+
+def get_storage() -> ObjectStorage:
+    """Get the configured storage backend."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "minio":
+            _storage = MinioStorage(settings.MINIO_BUCKET)
+        else:
+            _storage = LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    return _storage
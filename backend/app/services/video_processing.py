@@ -0,0 +1,487 @@
+"""Video transcoding into adaptive HLS.
+
+Uploaded videos are probed with ffprobe and transcoded by a local ffmpeg into
+an HLS ladder: the source is decoded once and scaled to every rung no taller
+than itself, each rung segmented into ``VIDEO_HLS_SEGMENT_SECONDS`` pieces
+with aligned keyframes, under one master playlist. Three thumbnails are
+grabbed along the way. Everything is stored under ``files/video/<id>/`` next
+to the original, progress is written to the file record while ffmpeg runs,
+and the duration is copied to the content items that show the video.
+
+Jobs run on a bounded pool: ``VIDEO_PROCESSING_WORKERS`` concurrent
+transcodes (half the cores by default), each ffmpeg given an equal share of
+the cores as threads. A job is claimed with a conditional UPDATE, so API
+workers sweeping the same queue never transcode a file twice, and the sweep
+requeues jobs whose worker died mid-run.
+
+``python -m app.services.video_processing --self-test`` generates a tiny
+clip with ffmpeg's test sources and runs the transcode and thumbnail steps on
+it, without touching the database or storage.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.response_cache import invalidate_tags
+from app.db.session import SessionLocal
+from app.db.models.course import Module, ContentItem
+from app.db.models.file import StoredFile, ProcessingStatus
+from app.services.scheduler import periodic
+from app.services.storage import get_storage, LocalStorage, CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rendition:
+    name: str
+    height: int
+    video_bitrate: int  # kbit/s
+    audio_bitrate: int  # kbit/s
+
+
+LADDER = (
+    Rendition("1080p", 1080, 5000, 192),
+    Rendition("720p", 720, 2800, 128),
+    Rendition("480p", 480, 1400, 128),
+    Rendition("360p", 360, 800, 96),
+)
+THUMBNAIL_POSITIONS = (0.1, 0.5, 0.9)
+THUMBNAIL_WIDTH = 640
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+}
+
+
+class ProcessingError(Exception):
+    pass
+
+
+def asset_prefix(file_id: UUID) -> str:
+    """Storage prefix of a video's HLS renditions and thumbnails."""
+    return f"files/video/{file_id}"
+
+
+def _run(cmd: List[str], timeout: Optional[float] = None) -> str:
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except FileNotFoundError:
+        raise ProcessingError(f"{cmd[0]} is not installed")
+    except subprocess.TimeoutExpired:
+        raise ProcessingError(f"{os.path.basename(cmd[0])} timed out")
+    if result.returncode != 0:
+        raise ProcessingError(result.stderr.strip()[-2000:] or f"{cmd[0]} exited with {result.returncode}")
+    return result.stdout
+
+
+def probe(path: str) -> Dict[str, Any]:
+    """Duration, dimensions, bitrate and codecs of a media file."""
+    output = _run([
+        settings.VIDEO_FFPROBE_PATH, "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", path
+    ], timeout=120)
+    data = json.loads(output)
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise ProcessingError("No video stream found")
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), None)
+    fmt = data.get("format", {})
+    duration = float(fmt.get("duration") or video.get("duration") or 0)
+    return {
+        "duration": duration,
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "bitrate": int(fmt.get("bit_rate") or 0),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "has_audio": audio is not None
+    }
+
+
+def ladder_for(height: int) -> List[Rendition]:
+    """The rungs no taller than the source; a single source-sized rung for tiny videos."""
+    rungs = [r for r in LADDER if r.height <= height]
+    if not rungs:
+        even = max(2, height - height % 2)
+        rungs = [Rendition(f"{even}p", even, 600, 96)]
+    return rungs
+
+
+def worker_count() -> int:
+    return settings.VIDEO_PROCESSING_WORKERS or max(1, (os.cpu_count() or 1) // 2)
+
+
+def ffmpeg_threads() -> int:
+    return max(1, (os.cpu_count() or 1) // worker_count())
+
+
+def hls_command(source: str, out_dir: str, rungs: List[Rendition], has_audio: bool) -> List[str]:
+    """One ffmpeg run that decodes once and encodes every rung as segmented HLS."""
+    segment = settings.VIDEO_HLS_SEGMENT_SECONDS
+    outputs = "".join(f"[v{i}]" for i in range(len(rungs)))
+    scales = ";".join(f"[v{i}]scale=-2:{r.height}[v{i}out]" for i, r in enumerate(rungs))
+    cmd = [
+        settings.VIDEO_FFMPEG_PATH, "-hide_banner", "-nostdin", "-y", "-i", source,
+        "-threads", str(ffmpeg_threads()),
+        "-filter_complex", f"[0:v]split={len(rungs)}{outputs};{scales}"
+    ]
+    for i, rung in enumerate(rungs):
+        cmd += [
+            "-map", f"[v{i}out]",
+            f"-c:v:{i}", "libx264",
+            f"-b:v:{i}", f"{rung.video_bitrate}k",
+            f"-maxrate:v:{i}", f"{int(rung.video_bitrate * 1.07)}k",
+            f"-bufsize:v:{i}", f"{rung.video_bitrate * 2}k",
+        ]
+        if has_audio:
+            cmd += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", f"{rung.audio_bitrate}k"]
+    stream_map = " ".join(
+        f"v:{i},a:{i},name:{r.name}" if has_audio else f"v:{i},name:{r.name}" for i, r in enumerate(rungs)
+    )
+    cmd += [
+        "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        # Keyframes on segment boundaries so every rung switches cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment})", "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(segment),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(out_dir, "%v", "seg_%05d.ts"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", stream_map,
+        "-progress", "pipe:1", "-nostats",
+        os.path.join(out_dir, "%v", "index.m3u8")
+    ]
+    return cmd
+
+
+_processes: set = set()
+_processes_lock = threading.Lock()
+_shutting_down = threading.Event()
+
+
+def run_with_progress(cmd: List[str], duration: float, on_progress: Callable[[int], None]) -> None:
+    """Run ffmpeg, reporting percent done from its ``-progress`` output.
+
+    A watchdog kills it at the timeout, even if it hangs without writing.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        except FileNotFoundError:
+            raise ProcessingError(f"{cmd[0]} is not installed")
+        with _processes_lock:
+            _processes.add(process)
+        timed_out = threading.Event()
+
+        def expire() -> None:
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(settings.VIDEO_PROCESSING_TIMEOUT_SECONDS, expire)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            # Ends when ffmpeg exits or is killed, either way closing its stdout
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                if key == "out_time_us" and value.isdigit() and duration > 0:
+                    on_progress(min(99, int(int(value) / 1e6 / duration * 100)))
+            process.wait()
+        finally:
+            watchdog.cancel()
+            with _processes_lock:
+                _processes.discard(process)
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if timed_out.is_set():
+            raise ProcessingError("ffmpeg timed out")
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip()[-2000:]
+            raise ProcessingError(message or f"ffmpeg exited with {process.returncode}")
+
+
+def make_thumbnails(source: str, out_dir: str, duration: float) -> List[str]:
+    """Grab a JPEG at each of THUMBNAIL_POSITIONS; returns their paths."""
+    paths = []
+    for i, position in enumerate(THUMBNAIL_POSITIONS):
+        path = os.path.join(out_dir, f"thumb_{i}.jpg")
+        _run([
+            settings.VIDEO_FFMPEG_PATH, "-hide_banner", "-nostdin", "-y",
+            "-ss", f"{duration * position:.3f}", "-i", source,
+            "-frames:v", "1", "-vf", f"scale={THUMBNAIL_WIDTH}:-2", "-q:v", "3", path
+        ], timeout=120)
+        paths.append(path)
+    return paths
+
+
+def transcode(source: str, work_dir: str, on_progress: Callable[[int], None]) -> Dict[str, Any]:
+    """Probe, transcode and thumbnail ``source`` into ``work_dir``; returns the media info."""
+    info = probe(source)
+    rungs = ladder_for(info["height"])
+    hls_dir = os.path.join(work_dir, "hls")
+    os.makedirs(hls_dir, exist_ok=True)
+    run_with_progress(hls_command(source, hls_dir, rungs, info["has_audio"]), info["duration"], on_progress)
+
+    thumbnail_dir = os.path.join(work_dir, "thumbnails")
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    make_thumbnails(source, thumbnail_dir, info["duration"])
+    return {**info, "renditions": [asdict(r) for r in rungs]}
+
+
+def _upload_outputs(work_dir: str, prefix: str) -> List[str]:
+    storage = get_storage()
+    keys = []
+    for folder in ("hls", "thumbnails"):
+        for root, _, names in os.walk(os.path.join(work_dir, folder)):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                key = f"{prefix}/{os.path.relpath(path, work_dir)}"
+                with open(path, "rb") as f:
+                    storage.put_stream(
+                        key,
+                        iter(lambda: f.read(CHUNK_SIZE), b""),
+                        CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+                    )
+                keys.append(key)
+    return keys
+
+
+def _local_source(record: StoredFile, work_dir: str) -> str:
+    """A filesystem path to the original; downloaded first unless storage is local."""
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        return storage.path(record.storage_key)
+    path = os.path.join(work_dir, "source" + os.path.splitext(record.filename)[1])
+    with open(path, "wb") as f:
+        for chunk in storage.iter_range(record.storage_key):
+            f.write(chunk)
+    return path
+
+
+class _ProgressWriter:
+    """Writes progress to the file record, at most every PROGRESS_INTERVAL_SECONDS."""
+
+    def __init__(self, db: Session, file_id: UUID):
+        self.db = db
+        self.file_id = file_id
+        self.progress = 0
+        self.written_at = 0.0
+
+    def __call__(self, progress: int) -> None:
+        now = time.monotonic()
+        if progress <= self.progress or now - self.written_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.progress, self.written_at = progress, now
+        self.db.execute(
+            update(StoredFile).where(StoredFile.id == self.file_id).values(processing_progress=progress)
+        )
+        self.db.commit()
+
+
+def _claim(db: Session, file_id: UUID) -> bool:
+    result = db.execute(
+        update(StoredFile)
+        .where(StoredFile.id == file_id, StoredFile.processing_status == ProcessingStatus.queued)
+        .values(
+            processing_status=ProcessingStatus.processing,
+            processing_started_at=datetime.utcnow(),
+            processing_progress=0,
+            processing_error=None
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def update_content_durations(db: Session, file_id: UUID, duration_seconds: float) -> List[UUID]:
+    """Set ``duration_minutes`` on content items that play this video. Does not commit.
+
+    Returns the ids of the courses those items belong to.
+    """
+    module_ids = db.execute(
+        update(ContentItem)
+        .where(ContentItem.content_url.like(f"%/files/video/{file_id}%"))
+        .values(duration_minutes=max(1, math.ceil(duration_seconds / 60)))
+        .returning(ContentItem.module_id)
+    ).scalars().all()
+    if not module_ids:
+        return []
+    return db.execute(
+        select(Module.course_id).where(Module.id.in_(set(module_ids))).distinct()
+    ).scalars().all()
+
+
+def process_video(file_id: UUID) -> None:
+    """Transcode one queued video. Does nothing if another worker already claimed it."""
+    db = SessionLocal()
+    try:
+        if not _claim(db, file_id):
+            return
+        record = db.get(StoredFile, file_id)
+        prefix = asset_prefix(file_id)
+        with tempfile.TemporaryDirectory(prefix="video-") as work_dir:
+            info = transcode(_local_source(record, work_dir), work_dir, _ProgressWriter(db, file_id))
+            keys = _upload_outputs(work_dir, prefix)
+
+        record.processing_status = ProcessingStatus.completed
+        record.processing_progress = 100
+        record.duration_seconds = int(round(info["duration"]))
+        record.media_info = {
+            **info,
+            "hls_master": f"{prefix}/hls/master.m3u8",
+            "thumbnails": [key for key in keys if key.startswith(f"{prefix}/thumbnails/")]
+        }
+        course_ids = update_content_durations(db, file_id, info["duration"])
+        db.commit()
+        invalidate_tags(*(f"course:{course_id}" for course_id in course_ids))
+        logger.info("Transcoded video %s (%d renditions)", file_id, len(info["renditions"]))
+    except Exception as e:
+        db.rollback()
+        interrupted = _shutting_down.is_set()
+        if not interrupted:
+            logger.exception("Transcoding video %s failed", file_id)
+        db.execute(
+            update(StoredFile).where(StoredFile.id == file_id).values(
+                # A job cut short by shutdown is picked up again by the next sweep
+                processing_status=ProcessingStatus.queued if interrupted else ProcessingStatus.failed,
+                processing_error=None if interrupted else str(e)[:2000]
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_flight: set = set()
+
+
+def _run_job(file_id: UUID) -> None:
+    try:
+        process_video(file_id)
+    finally:
+        with _pool_lock:
+            _in_flight.discard(file_id)
+
+
+def submit(file_id: UUID) -> None:
+    """Run a queued video's job on this worker's pool, unless it is already running here."""
+    global _pool
+    with _pool_lock:
+        if file_id in _in_flight or _shutting_down.is_set():
+            return
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix="video")
+        _in_flight.add(file_id)
+        _pool.submit(_run_job, file_id)
+
+
+def enqueue(db: Session, record: StoredFile) -> None:
+    """Queue a video for transcoding and start it on this worker. Commits."""
+    record.processing_status = ProcessingStatus.queued
+    record.processing_progress = 0
+    record.processing_error = None
+    db.commit()
+    submit(record.id)
+
+
+@periodic(settings.VIDEO_QUEUE_SWEEP_SECONDS)
+def run_video_queue_sweep() -> None:
+    db = SessionLocal()
+    try:
+        # A job still "processing" past the timeout lost its worker; ffmpeg itself is killed at the timeout
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=settings.VIDEO_PROCESSING_TIMEOUT_SECONDS + settings.VIDEO_QUEUE_SWEEP_SECONDS
+        )
+        requeued = db.execute(
+            update(StoredFile)
+            .where(
+                StoredFile.processing_status == ProcessingStatus.processing,
+                StoredFile.processing_started_at < cutoff
+            )
+            .values(processing_status=ProcessingStatus.queued)
+        ).rowcount
+        db.commit()
+        if requeued:
+            logger.warning("Requeued %d stalled video jobs", requeued)
+
+        queued = db.execute(
+            select(StoredFile.id)
+            .where(StoredFile.processing_status == ProcessingStatus.queued)
+            .order_by(StoredFile.created_at)
+            .limit(worker_count() * 2)
+        ).scalars().all()
+        for file_id in queued:
+            submit(file_id)
+    finally:
+        db.close()
+
+
+def shutdown() -> None:
+    """Stop the pool; running ffmpeg processes are killed and their jobs requeued."""
+    global _pool
+    _shutting_down.set()
+    with _processes_lock:
+        for process in list(_processes):
+            process.kill()
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def generate_test_clip(path: str, seconds: int = 2) -> None:
+    """Write a tiny H.264/AAC clip from ffmpeg's lavfi test sources."""
+    _run([
+        settings.VIDEO_FFMPEG_PATH, "-hide_banner", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path
+    ], timeout=120)
+
+
+def self_test() -> Dict[str, Any]:
+    """Transcode a generated clip in a temporary directory and check the outputs."""
+    with tempfile.TemporaryDirectory(prefix="video-self-test-") as work_dir:
+        source = os.path.join(work_dir, "clip.mp4")
+        generate_test_clip(source)
+        progress: List[int] = []
+        info = transcode(source, work_dir, progress.append)
+        master = os.path.join(work_dir, "hls", "master.m3u8")
+        if not os.path.exists(master):
+            raise ProcessingError("No master playlist was written")
+        for rendition in info["renditions"]:
+            if not os.path.exists(os.path.join(work_dir, "hls", rendition["name"], "index.m3u8")):
+                raise ProcessingError(f"Missing playlist for {rendition['name']}")
+        return {**info, "progress_updates": len(progress)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--self-test", action="store_true", help="transcode a generated test clip")
+    args = parser.parse_args()
+    if args.self_test:
+        print(json.dumps(self_test(), indent=2))
+    else:
+        parser.print_help()
@@ -0,0 +1,119 @@
+"""Exam-start burst benchmark.
+
+Simulates a cohort starting a timed exam at the same moment: every learner
+fetches the assessment and then starts an attempt, all released together.
+Reports latency percentiles and status codes for both requests.
+
+Tokens come from a file (one bearer token per line) or are minted for the
+first N active learners in the database, which needs the server's
+DATABASE_URL and SECRET_KEY:
+
+    python benchmarks/exam_start_burst.py --assessment-id <uuid> --mint 2000
+    python benchmarks/exam_start_burst.py --assessment-id <uuid> --tokens tokens.txt
+
+Minted users really start attempts; use a throwaway assessment.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def mint_tokens(count: int) -> List[str]:
+    from sqlalchemy import select
+    from app.core.security import create_access_token
+    from app.db.session import SessionLocal
+    from app.db.models.user import User, UserRole
+
+    db = SessionLocal()
+    try:
+        user_ids = db.execute(
+            select(User.id)
+            .where(User.role == UserRole.learner, User.is_active == True)
+            .limit(count)
+        ).scalars().all()
+    finally:
+        db.close()
+    if len(user_ids) < count:
+        print(f"Only {len(user_ids)} active learners available", file=sys.stderr)
+    return [create_access_token({"sub": str(user_id)}, timedelta(hours=1)) for user_id in user_ids]
+
+
+async def learner(
+    client: httpx.AsyncClient, token: str, assessment_id: str, gate: asyncio.Event, timings: Dict[str, list]
+) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    await gate.wait()
+    for name, method, path in (
+        ("get", "GET", f"/assessments/{assessment_id}"),
+        ("start", "POST", f"/assessments/{assessment_id}/start"),
+    ):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        timings[name].append((time.perf_counter() - started, status))
+
+
+def report(name: str, results: list) -> None:
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    statuses = Counter(status for _, status in results)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(
+        f"{name:>5}: n={len(latencies)} p50={quantiles[49]:.1f}ms p95={quantiles[94]:.1f}ms "
+        f"p99={quantiles[98]:.1f}ms max={latencies[-1]:.1f}ms statuses={dict(statuses)}"
+    )
+
+
+async def run(args) -> None:
+    if args.tokens:
+        tokens = [line.strip() for line in Path(args.tokens).read_text().splitlines() if line.strip()]
+    else:
+        tokens = mint_tokens(args.mint)
+    if not tokens:
+        sys.exit("No tokens to run with")
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    timings: Dict[str, list] = {"get": [], "start": []}
+    gate = asyncio.Event()
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        tasks = [
+            asyncio.create_task(learner(client, token, args.assessment_id, gate, timings))
+            for token in tokens
+        ]
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        gate.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(tokens)} learners in {elapsed:.2f}s ({2 * len(tokens) / elapsed:.0f} req/s)")
+    report("get", timings["get"])
+    report("start", timings["start"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--assessment-id", required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--tokens", help="file with one bearer token per line")
+    source.add_argument("--mint", type=int, help="mint tokens for this many learners from the database")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Response serialization benchmark.
+
+Times how long turning a handler's return value into response bytes takes,
+the way FastAPI did it before and the way it is done now, for payloads shaped
+like these endpoints' responses:
+
+    course_modules        GET /courses/{id}/modules
+    submissions           GET /assignments/{id}/submissions
+    submissions_ndjson    GET /assignments/{id}/submissions?format=ndjson
+    assessment            GET /assessments/{id}
+
+"Before" is ``jsonable_encoder`` plus the stdlib encoder for handlers that
+return dicts, and ``response_model`` validation plus Pydantic's serialisation
+for the cached assessment. "After" is ``app.core.serialization``. Needs no
+database or server:
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --size 2 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.serialization import dumps, json_response  # noqa: E402
+from app.db.models.course import ContentType  # noqa: E402
+from app.schemas.assessment import AssessmentWithQuestions  # noqa: E402
+from app.services.assignment_submissions import submission_dict  # noqa: E402
+
+
+def _render_stdlib(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def course_modules(size: float) -> Tuple[Callable, Callable]:
+    now = datetime.utcnow()
+    modules = [
+        SimpleNamespace(
+            id=uuid4(), course_id=uuid4(), title=f"Module {m}", description="Module description " * 4,
+            order_index=m, is_locked=False, created_at=now, updated_at=now,
+            items=[
+                SimpleNamespace(
+                    id=uuid4(), module_id=uuid4(), title=f"Lesson {i}", description="Lesson description " * 6,
+                    content_type=ContentType.video, content_url=f"/api/v1/files/video/{uuid4()}",
+                    content_data={"transcript": "x" * 200, "chapters": list(range(10))},
+                    duration_minutes=12, order_index=i, is_mandatory=True, created_at=now
+                )
+                for i in range(int(20 * size))
+            ]
+        )
+        for m in range(int(30 * size))
+    ]
+
+    def module_dict(module, convert: bool) -> Dict[str, Any]:
+        # The handler's dict, with (before) or without (after) converting values by hand
+        text = (lambda value: str(value)) if convert else (lambda value: value)
+        iso = (lambda value: value.isoformat()) if convert else (lambda value: value)
+        return {
+            "id": text(module.id), "course_id": text(module.course_id), "title": module.title,
+            "description": module.description, "order_index": module.order_index,
+            "is_locked": module.is_locked, "created_at": iso(module.created_at),
+            "updated_at": iso(module.updated_at),
+            "content_items": [
+                {
+                    "id": text(item.id), "module_id": text(item.module_id), "title": item.title,
+                    "description": item.description,
+                    "content_type": item.content_type.value if convert else item.content_type,
+                    "content_url": item.content_url, "content_data": item.content_data,
+                    "duration_minutes": item.duration_minutes, "order_index": item.order_index,
+                    "is_mandatory": item.is_mandatory, "created_at": iso(item.created_at)
+                }
+                for item in module.items
+            ]
+        }
+
+    def before() -> bytes:
+        return _render_stdlib({"modules": [module_dict(module, True) for module in modules]})
+
+    def after() -> bytes:
+        return json_response({"modules": [module_dict(module, False) for module in modules]}).body
+
+    return before, after
+
+
+def _submission_rows(size: float) -> List[SimpleNamespace]:
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(
+            id=uuid4(), assignment_id=uuid4(), user_id=uuid4(), submission_text="Answer text " * 40,
+            attachment_urls=[f"/api/v1/files/download/{uuid4()}"], score=Decimal("87.50") if n % 2 else None,
+            feedback="Feedback " * 10 if n % 2 else None, graded_by=uuid4() if n % 2 else None,
+            submitted_at=now - timedelta(minutes=n), graded_at=now if n % 2 else None,
+            first_name="Ada", last_name="Lovelace", email=f"learner{n}@example.com"
+        )
+        for n in range(int(500 * size))
+    ]
+
+
+def submissions(size: float) -> Tuple[Callable, Callable]:
+    rows = _submission_rows(size)
+
+    def page() -> Dict[str, Any]:
+        return {"submissions": [submission_dict(row) for row in rows], "next_cursor": "cursor"}
+
+    def before() -> bytes:
+        return _render_stdlib(page())
+
+    def after() -> bytes:
+        return json_response(page()).body
+
+    return before, after
+
+
+def submissions_ndjson(size: float) -> Tuple[Callable, Callable]:
+    rows = _submission_rows(size)
+
+    def default(value):
+        return float(value) if isinstance(value, Decimal) else str(value)
+
+    def before() -> bytes:
+        return "".join(json.dumps(submission_dict(row), default=default) + "\n" for row in rows).encode()
+
+    def after() -> bytes:
+        return b"".join(dumps(submission_dict(row)) + b"\n" for row in rows)
+
+    return before, after
+
+
+def assessment(size: float) -> Tuple[Callable, Callable]:
+    now = datetime.utcnow()
+    assessment_id = uuid4()
+    exam = AssessmentWithQuestions(
+        id=assessment_id, course_id=uuid4(), title="Final exam", description="Covers everything",
+        instructions="Answer all questions", pass_percentage=Decimal("60.00"), created_at=now, updated_at=now,
+        questions=[
+            {
+                "id": uuid4(), "assessment_id": assessment_id, "order_index": q, "created_at": now,
+                "question_text": f"Question {q}: " + "text " * 30, "question_type": "multiple_choice",
+                "points": Decimal("1.00"),
+                "options": {"choices": [f"Choice {c} " * 5 for c in range(5)]}, "explanation": "Because " * 10
+            }
+            for q in range(int(100 * size))
+        ]
+    ).model_dump(mode="json")
+    # What FastAPI does with a response_model: validate the returned value, then dump it
+    adapter = TypeAdapter(AssessmentWithQuestions)
+
+    def before() -> bytes:
+        return adapter.dump_json(adapter.validate_python(exam))
+
+    def after() -> bytes:
+        return json_response(exam).body
+
+    return before, after
+
+
+BENCHMARKS = {
+    "course_modules": course_modules,
+    "submissions": submissions,
+    "submissions_ndjson": submissions_ndjson,
+    "assessment": assessment,
+}
+
+
+def _decode(data: bytes) -> List[Any]:
+    # Line by line, so NDJSON compares too
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def measure(func: Callable[[], bytes], repeat: int) -> Tuple[float, int]:
+    """Median milliseconds per call, and the size of the output."""
+    size = len(func())
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=1.0, help="scale every payload by this factor")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<20} {'before':>10} {'after':>10} {'speedup':>8} {'bytes':>10}")
+    for name in args.only or BENCHMARKS:
+        before, after = BENCHMARKS[name](args.size)
+        if _decode(before()) != _decode(after()):
+            print(f"{name}: before and after produce different JSON", file=sys.stderr)
+        before_ms, _ = measure(before, args.repeat)
+        after_ms, size = measure(after, args.repeat)
+        print(f"{name:<20} {before_ms:>8.2f}ms {after_ms:>8.2f}ms {before_ms / after_ms:>7.1f}x {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
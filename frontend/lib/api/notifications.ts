@@ -56,5 +56,57 @@ export const notificationsApi = {
       headers: getAuthHeader()
     });
     return response.data;
+  },
+
+  getUnreadCount: async () => {
+    const response = await axios.get(`${API_URL}/notifications/count`, {
+      headers: getAuthHeader()
+    });
+    return response.data;
+  },
+
+  // Subscribe to pushed notifications and unread-count changes over SSE.
+  // While the stream is down (EventSource retries automatically) the unread
+  // count is polled so the bell stays roughly current. Returns an unsubscribe.
+  subscribe: (handlers: {
+    onNotification?: (notification: any) => void;
+    onUnreadCount?: (count: number) => void;
+  }, fallbackPollMs = 30000) => {
+    const token = localStorage.getItem('token');
+    const source = new EventSource(
+      `${API_URL}/notifications/stream?token=${encodeURIComponent(token || '')}`
+    );
+    let pollTimer: ReturnType<typeof setInterval> | null = null;
+
+    const stopPolling = () => {
+      if (pollTimer) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+      }
+    };
+
+    source.addEventListener('notification', (event) => {
+      handlers.onNotification?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('unread_count', (event) => {
+      handlers.onUnreadCount?.(JSON.parse((event as MessageEvent).data).unread_count);
+    });
+    source.onopen = stopPolling;
+    source.onerror = () => {
+      if (pollTimer) return;
+      pollTimer = setInterval(async () => {
+        try {
+          const data = await notificationsApi.getUnreadCount();
+          handlers.onUnreadCount?.(data.unread_count);
+        } catch {
+          // Keep waiting for the stream to reconnect
+        }
+      }, fallbackPollMs);
+    };
+
+    return () => {
+      stopPolling();
+      source.close();
+    };
   }
 };